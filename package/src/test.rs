@@ -176,8 +176,14 @@ pub(crate) fn run_integration_tests(
     }
 
     test_self_update(scie_pants_scie);
+    #[cfg(unix)]
+    test_self_update_past_backports(scie_pants_scie);
     test_self_downgrade(scie_pants_scie);
 
+    #[cfg(unix)]
+    test_pikesquares_bootstrap_exports(scie_pants_scie);
+    test_boot_cache_invalidation(scie_pants_scie);
+
     Ok(())
 }
 
@@ -796,6 +802,46 @@ fn test_self_update(scie_pants_scie: &Path) {
     execute(Command::new(scie_pants_scie).env("SCIE_BOOT", "update")).unwrap();
 }
 
+#[cfg(unix)]
+fn test_self_update_past_backports(scie_pants_scie: &Path) {
+    integration_test!("Verifying self update finds the latest release listed after a backport");
+    // Releases are listed by when they were published, not by version; so a backport of an old
+    // version can be listed ahead of newer releases and must not end the search for them.
+    let tmpdir = create_tempdir().unwrap();
+    let binary_name = format!(
+        "scie-pants-{platform}{exe}",
+        platform = CURRENT_PLATFORM.to_str(),
+        exe = env::consts::EXE_SUFFIX
+    );
+    let release = |tag: &str| {
+        serde_json::json!({
+            "tag_name": tag,
+            "assets": [{"name": binary_name}, {"name": format!("{binary_name}.sha256")}],
+        })
+    };
+    let releases = serde_json::json!([release("v0.0.1"), release("v999.0.0"), release("v998.0.0")]);
+    write_file(
+        &tmpdir.path().join("releases.json"),
+        false,
+        serde_json::to_vec(&releases).unwrap(),
+    )
+    .unwrap();
+
+    let output = execute(
+        Command::new(scie_pants_scie)
+            .env("SCIE_BOOT", "update")
+            .env(
+                "PIKESQUARES_UPDATE_MIRROR_URL",
+                format!("file://{}", tmpdir.path().display()),
+            )
+            .arg("--check-only")
+            .stdout(Stdio::piped()),
+    )
+    .unwrap();
+    let check: serde_json::Value = serde_json::from_slice(&output.stdout).unwrap();
+    assert_eq!(serde_json::json!("999.0.0"), check["release"]["version"]);
+}
+
 fn test_self_downgrade(scie_pants_scie: &Path) {
     integration_test!("Verifying downgrade works");
     // Additionally, we exercise using a relative path to the scie-jump binary which triggered
@@ -1224,3 +1270,103 @@ fn test_pants_bootstrap_urls(scie_pants_scie: &Path) {
     let stdout = decode_output(output.stdout).unwrap();
     assert!(stdout.contains(pants_release));
 }
+
+#[cfg(unix)]
+fn test_pikesquares_bootstrap_exports(scie_pants_scie: &Path) {
+    integration_test!(
+        "Verifying .pikesquares.bootstrap exports are applied both with and without bash"
+    );
+    let tmpdir = create_tempdir().unwrap();
+    touch(&tmpdir.path().join("pikesquares.toml")).unwrap();
+    let bootstrap = tmpdir.path().join(".pikesquares.bootstrap");
+
+    // N.B.: Both files redirect the boot to the bootstrap tools and ask them for a version newer
+    // than any that exists; so the exports having been applied is observable in the failure.
+    let assert_exports_applied = |contents: &str, sourced_by_bash: bool| {
+        write_file(&bootstrap, false, contents).unwrap();
+        let (_, stderr) = assert_stderr_output(
+            Command::new(scie_pants_scie)
+                .arg("bootstrap-cache-key")
+                .env("RUST_LOG", "debug")
+                .current_dir(tmpdir.path()),
+            vec!["PIKESQUARES_BOOTSTRAP_TOOLS=99999"],
+            ExpectedResult::Failure,
+        );
+        assert_eq!(
+            sourced_by_bash,
+            stderr.contains("it will be sourced by bash"),
+            "Expected the bootstrap file to be sourced by bash: {sourced_by_bash}:\n{contents}\n\
+            STDERR:\n{stderr}"
+        );
+    };
+
+    assert_exports_applied(
+        r#"
+        # Only simple assignments and exports.
+        export SCIE_BOOT=bootstrap-tools
+        BASE='9999'
+        export PIKESQUARES_BOOTSTRAP_TOOLS
+        PIKESQUARES_BOOTSTRAP_TOOLS="${BASE}9"
+        "#,
+        false,
+    );
+    assert_exports_applied(
+        r#"
+        # A command substitution requires bash.
+        export SCIE_BOOT=bootstrap-tools
+        BASE="$(echo 9999)"
+        export PIKESQUARES_BOOTSTRAP_TOOLS="${BASE}9"
+        "#,
+        true,
+    );
+}
+
+fn test_boot_cache_invalidation(scie_pants_scie: &Path) {
+    integration_test!("Verifying the boot cache notices edits to pikesquares.toml");
+    let tmpdir = create_tempdir().unwrap();
+    let pikesquares_toml = tmpdir.path().join("pikesquares.toml");
+    let subdir = tmpdir.path().join("src").join("app");
+    ensure_directory(&subdir, false).unwrap();
+
+    let boot = |expected_messages: Vec<&str>| {
+        assert_stderr_output(
+            Command::new(scie_pants_scie)
+                .arg("bootstrap-cache-key")
+                .env("PIKESQUARES_BOOTSTRAP_TOOLS", "1")
+                .env("RUST_LOG", "trace")
+                .current_dir(&subdir),
+            expected_messages,
+            ExpectedResult::Success,
+        )
+        .1
+    };
+
+    write_file(
+        &pikesquares_toml,
+        false,
+        "[GLOBAL]\npikesquares_version = \"0.1.0\"\n",
+    )
+    .unwrap();
+    boot(vec![r#"The required PikeSquares version is Some("0.1.0")"#]);
+    let stderr = boot(vec![r#"The required PikeSquares version is Some("0.1.0")"#]);
+    assert!(
+        stderr.contains("Boot cache hit"),
+        "Expected the second boot from {subdir} to hit the boot cache:\n{stderr}",
+        subdir = subdir.display()
+    );
+
+    // N.B.: The edit keeps the file the same size; so only its mtime tells the entry is stale.
+    write_file(
+        &pikesquares_toml,
+        false,
+        "[GLOBAL]\npikesquares_version = \"0.2.0\"\n",
+    )
+    .unwrap();
+    let stderr = boot(vec![r#"The required PikeSquares version is Some("0.2.0")"#]);
+    assert!(
+        !stderr.contains("Boot cache hit"),
+        "Expected the edit to {pikesquares_toml} to invalidate the boot cache:\n{stderr}",
+        pikesquares_toml = pikesquares_toml.display()
+    );
+    boot(vec![r#"The required PikeSquares version is Some("0.2.0")"#]);
+}
@@ -0,0 +1,200 @@
+use std::collections::hash_map::DefaultHasher;
+use std::env;
+use std::fs::Metadata;
+use std::hash::{Hash, Hasher};
+use std::io::Write;
+use std::path::{Path, PathBuf};
+use std::time::UNIX_EPOCH;
+
+use anyhow::{Context, Result};
+use log::{debug, trace};
+use logging_timer::time;
+
+use crate::config::PikeSquaresConfig;
+
+/// The facts the launcher needs from the build root and its `pikesquares.toml`.
+#[derive(Clone, Debug)]
+pub(crate) struct Installation {
+    pub(crate) build_root: PathBuf,
+    pub(crate) pikesquares_version: Option<String>,
+    pub(crate) debugpy_version: Option<String>,
+    pub(crate) delegate_bootstrap: bool,
+}
+
+impl From<&PikeSquaresConfig> for Installation {
+    fn from(pikesquares_config: &PikeSquaresConfig) -> Self {
+        Installation {
+            build_root: pikesquares_config.build_root().to_path_buf(),
+            pikesquares_version: pikesquares_config.package_version(),
+            debugpy_version: pikesquares_config.debugpy_version(),
+            delegate_bootstrap: pikesquares_config.delegate_bootstrap(),
+        }
+    }
+}
+
+struct Entry {
+    // N.B.: Entries are stored per launcher version so an upgrade never reads an older layout.
+    launcher_version: String,
+    cwd: PathBuf,
+    toml_mtime_secs: u64,
+    toml_mtime_nanos: u32,
+    toml_size: u64,
+    installation: Installation,
+}
+
+impl Entry {
+    // N.B.: An entry is read on every boot; so it is stored one field per line rather than as TOML,
+    // whose parser costs more than the build root walk and config parse a hit saves.
+    fn serialize(&self) -> Option<String> {
+        let field = |value: &Option<String>| value.clone().unwrap_or_default();
+        Some(
+            [
+                self.launcher_version.clone(),
+                self.cwd.to_str()?.to_string(),
+                format!(
+                    "{} {} {}",
+                    self.toml_mtime_secs, self.toml_mtime_nanos, self.toml_size
+                ),
+                self.installation.build_root.to_str()?.to_string(),
+                field(&self.installation.pikesquares_version),
+                field(&self.installation.debugpy_version),
+                self.installation.delegate_bootstrap.to_string(),
+            ]
+            .join("\n"),
+        )
+    }
+
+    fn parse(contents: &str) -> Option<Entry> {
+        let field = |value: &str| (!value.is_empty()).then(|| value.to_string());
+        let mut lines = contents.split('\n');
+        let launcher_version = lines.next()?.to_string();
+        let cwd = PathBuf::from(lines.next()?);
+        let mut stamp = lines.next()?.split(' ');
+        let toml_mtime_secs = stamp.next()?.parse().ok()?;
+        let toml_mtime_nanos = stamp.next()?.parse().ok()?;
+        let toml_size = stamp.next()?.parse().ok()?;
+        let build_root = PathBuf::from(lines.next()?);
+        let pikesquares_version = field(lines.next()?);
+        let debugpy_version = field(lines.next()?);
+        let delegate_bootstrap = lines.next()?.parse().ok()?;
+        if stamp.next().is_some() || lines.next().is_some() {
+            return None;
+        }
+        Some(Entry {
+            launcher_version,
+            cwd,
+            toml_mtime_secs,
+            toml_mtime_nanos,
+            toml_size,
+            installation: Installation {
+                build_root,
+                pikesquares_version,
+                debugpy_version,
+                delegate_bootstrap,
+            },
+        })
+    }
+}
+
+fn stamp(metadata: &Metadata) -> Option<(u64, u32, u64)> {
+    let mtime = metadata.modified().ok()?.duration_since(UNIX_EPOCH).ok()?;
+    Some((mtime.as_secs(), mtime.subsec_nanos(), metadata.len()))
+}
+
+/// An on-disk cache of the `Installation` found from a given working directory.
+///
+/// An entry is trusted as long as the `pikesquares.toml` it was read from has the same mtime and
+/// size; so a hit costs a single stat instead of walking up to the build root and parsing the
+/// config. A new `pikesquares.toml` created between the working directory and the cached build root
+/// is not noticed until the cached one changes or the cache is cleared.
+pub(crate) struct BootCache {
+    cache_dir: PathBuf,
+    launcher_version: &'static str,
+}
+
+impl BootCache {
+    pub(crate) fn new(launcher_version: &'static str) -> Option<BootCache> {
+        // N.B.: The boot command is pointed at the scie bindings dir; running the launcher binary
+        // directly falls back to the user cache dir.
+        let cache_dir = match env::var_os("PIKESQUARES_BOOT_CACHE_DIR") {
+            Some(cache_dir) if !cache_dir.is_empty() => PathBuf::from(cache_dir),
+            _ => dirs::cache_dir()?.join("scie-pikesquares"),
+        };
+        Some(BootCache {
+            cache_dir: cache_dir.join("boot_cache"),
+            launcher_version,
+        })
+    }
+
+    fn entry_path(&self, cwd: &Path) -> PathBuf {
+        let mut hasher = DefaultHasher::new();
+        cwd.hash(&mut hasher);
+        self.cache_dir.join(format!("{:016x}", hasher.finish()))
+    }
+
+    #[time("debug", "BootCache::{}")]
+    pub(crate) fn load(&self, cwd: &Path) -> Option<Installation> {
+        let entry_path = self.entry_path(cwd);
+        let contents = std::fs::read_to_string(&entry_path).ok()?;
+        let Some(entry) = Entry::parse(&contents) else {
+            debug!("Ignoring unreadable boot cache entry {entry_path:?}.");
+            return None;
+        };
+        // N.B.: The cwd check guards against hash collisions between working directories.
+        if entry.launcher_version != self.launcher_version || entry.cwd != cwd {
+            return None;
+        }
+        let toml = entry.installation.build_root.join("pikesquares.toml");
+        let current = std::fs::metadata(&toml)
+            .ok()
+            .and_then(|metadata| stamp(&metadata));
+        if current
+            != Some((
+                entry.toml_mtime_secs,
+                entry.toml_mtime_nanos,
+                entry.toml_size,
+            ))
+        {
+            debug!("The boot cache entry for {cwd:?} is stale: {toml:?} has changed.");
+            return None;
+        }
+        trace!("Boot cache hit for {cwd:?}.");
+        Some(entry.installation)
+    }
+
+    #[time("debug", "BootCache::{}")]
+    pub(crate) fn store(&self, cwd: &Path, installation: &Installation) -> Result<()> {
+        let toml = installation.build_root.join("pikesquares.toml");
+        let metadata = std::fs::metadata(&toml)
+            .with_context(|| format!("Failed to stat {toml}", toml = toml.display()))?;
+        let Some((toml_mtime_secs, toml_mtime_nanos, toml_size)) = stamp(&metadata) else {
+            // Without a usable mtime there is nothing to validate an entry against.
+            return Ok(());
+        };
+        let entry = Entry {
+            launcher_version: self.launcher_version.to_string(),
+            cwd: cwd.to_path_buf(),
+            toml_mtime_secs,
+            toml_mtime_nanos,
+            toml_size,
+            installation: installation.clone(),
+        };
+        let Some(contents) = entry.serialize() else {
+            // Entries only hold paths that are valid UTF-8.
+            return Ok(());
+        };
+
+        std::fs::create_dir_all(&self.cache_dir).with_context(|| {
+            format!(
+                "Failed to create boot cache dir {cache_dir}",
+                cache_dir = self.cache_dir.display()
+            )
+        })?;
+        // N.B.: Concurrent launchers race to write the same entry; the rename makes the last one
+        // win whole rather than leaving a torn file behind.
+        let mut tmp = tempfile::NamedTempFile::new_in(&self.cache_dir)?;
+        tmp.write_all(contents.as_bytes())?;
+        tmp.persist(self.entry_path(cwd))?;
+        Ok(())
+    }
+}
@@ -0,0 +1,400 @@
+use std::collections::HashMap;
+use std::env;
+use std::ffi::OsString;
+use std::path::Path;
+
+use log::debug;
+use logging_timer::time;
+
+/// Reads the environment variables a `.pikesquares.bootstrap` file exports without running bash.
+///
+/// Only the simple subset of bash these files are typically written in is understood: comments,
+/// `NAME=value` assignments, `export NAME=value` and `export NAME`, where values may be single or
+/// double quoted and may reference variables as `$NAME` or `${NAME}`. Anything else (command
+/// substitution, functions, conditionals, parameter expansion operators, etc.) yields `None` and
+/// the file must be sourced by bash instead.
+///
+/// Variable references are resolved against the file's own assignments, then `env`, then the
+/// environment of this process; so the result matches what sourcing the file in a shell with `env`
+/// exported would produce.
+///
+/// A file that can't be read as UTF-8 also yields `None`; bash is left to read it, or to report
+/// why it can't.
+#[time("debug", "bootstrap_env::{}")]
+pub(crate) fn load(
+    bootstrap: &Path,
+    env: &[(OsString, OsString)],
+) -> Option<Vec<(OsString, OsString)>> {
+    let contents = match std::fs::read_to_string(bootstrap) {
+        Ok(contents) => contents,
+        Err(err) => {
+            debug!(
+                "Failed to read the bootstrap file {bootstrap}; it will be sourced by bash: {err}",
+                bootstrap = bootstrap.display()
+            );
+            return None;
+        }
+    };
+    let exports = parse(&contents, |name| {
+        env.iter()
+            .rev()
+            .find(|(key, _)| key == name)
+            .map(|(_, value)| value.clone())
+            .or_else(|| env::var_os(name))
+    });
+    if exports.is_none() {
+        debug!(
+            "The bootstrap file {bootstrap} uses shell constructs beyond simple exports; it will \
+            be sourced by bash.",
+            bootstrap = bootstrap.display()
+        );
+    }
+    exports.map(|exports| {
+        exports
+            .into_iter()
+            .map(|(name, value)| (name.into(), value.into()))
+            .collect()
+    })
+}
+
+fn is_name(name: &str) -> bool {
+    let mut chars = name.chars();
+    matches!(chars.next(), Some(c) if c == '_' || c.is_ascii_alphabetic())
+        && chars.all(|c| c == '_' || c.is_ascii_alphanumeric())
+}
+
+struct Shell<F> {
+    vars: HashMap<String, String>,
+    exported: Vec<String>,
+    environ: F,
+}
+
+impl<F: Fn(&str) -> Option<OsString>> Shell<F> {
+    fn lookup(&self, name: &str) -> Option<String> {
+        match self.vars.get(name) {
+            Some(value) => Some(value.clone()),
+            None => (self.environ)(name)?.into_string().ok(),
+        }
+    }
+
+    fn export(&mut self, name: &str) {
+        if !self.exported.iter().any(|exported| exported == name) {
+            self.exported.push(name.to_string());
+        }
+    }
+
+    fn expand(&self, chars: &mut std::iter::Peekable<std::str::Chars>) -> Option<String> {
+        let mut name = String::new();
+        if chars.peek() == Some(&'{') {
+            chars.next();
+            loop {
+                match chars.next()? {
+                    '}' => break,
+                    c => name.push(c),
+                }
+            }
+        } else {
+            while let Some(&c) = chars.peek() {
+                if c != '_' && !c.is_ascii_alphanumeric() {
+                    break;
+                }
+                name.push(c);
+                chars.next();
+            }
+        }
+        // N.B.: Special parameters like `$1` or `$$` and operators like `${NAME:-default}` are not
+        // names; and an unset name is left to bash, which the boot runs with `set -u`, to report.
+        if !is_name(&name) {
+            return None;
+        }
+        self.lookup(&name)
+    }
+
+    fn value(&self, raw: &str) -> Option<String> {
+        let mut value = String::new();
+        let mut chars = raw.chars().peekable();
+        while let Some(c) = chars.next() {
+            match c {
+                '\'' => loop {
+                    match chars.next()? {
+                        '\'' => break,
+                        c => value.push(c),
+                    }
+                },
+                '"' => loop {
+                    match chars.next()? {
+                        '"' => break,
+                        '$' => value.push_str(&self.expand(&mut chars)?),
+                        '\\' | '`' => return None,
+                        c => value.push(c),
+                    }
+                },
+                '$' => value.push_str(&self.expand(&mut chars)?),
+                c if c.is_whitespace() || "\\`;&|<>(){}[]*?~#!".contains(c) => return None,
+                c => value.push(c),
+            }
+        }
+        Some(value)
+    }
+
+    fn statement(&mut self, line: &str) -> Option<()> {
+        let (export, statement) = match line.strip_prefix("export") {
+            Some(rest) if rest.starts_with(char::is_whitespace) => (true, rest.trim_start()),
+            _ => (false, line),
+        };
+        let (name, value) = match statement.split_once('=') {
+            Some((name, raw_value)) => (name, Some(self.value(raw_value)?)),
+            None if export => (statement, None),
+            None => return None,
+        };
+        if !is_name(name) {
+            return None;
+        }
+        let already_exported = (self.environ)(name).is_some();
+        if let Some(value) = value {
+            self.vars.insert(name.to_string(), value);
+        }
+        // N.B.: Assigning to a variable that is already in the environment updates it there too.
+        if export || (already_exported && self.vars.contains_key(name)) {
+            self.export(name);
+        }
+        Some(())
+    }
+}
+
+/// Returns the variables `contents` exports, in order, or `None` if it is not simple enough.
+fn parse(
+    contents: &str,
+    environ: impl Fn(&str) -> Option<OsString>,
+) -> Option<Vec<(String, String)>> {
+    let mut shell = Shell {
+        vars: HashMap::new(),
+        exported: vec![],
+        environ,
+    };
+    for line in contents.lines().map(str::trim) {
+        if line.is_empty() || line.starts_with('#') {
+            continue;
+        }
+        shell.statement(line)?;
+    }
+    let Shell {
+        mut vars, exported, ..
+    } = shell;
+    Some(
+        exported
+            .into_iter()
+            .filter_map(|name| {
+                let value = vars.remove(&name)?;
+                Some((name, value))
+            })
+            .collect(),
+    )
+}
+
+#[cfg(test)]
+mod tests {
+    use std::ffi::OsString;
+
+    use super::parse;
+
+    fn environ(name: &str) -> Option<OsString> {
+        match name {
+            "HOME" => Some("/home/user".into()),
+            "PATH" => Some("/usr/bin:/bin".into()),
+            _ => None,
+        }
+    }
+
+    fn exports(contents: &str) -> Option<Vec<(String, String)>> {
+        parse(contents, environ)
+    }
+
+    fn assert_exports(contents: &str, expected: &[(&str, &str)]) {
+        let expected = expected
+            .iter()
+            .map(|(name, value)| (name.to_string(), value.to_string()))
+            .collect::<Vec<_>>();
+        assert_eq!(Some(expected), exports(contents), "For:\n{contents}");
+    }
+
+    fn assert_bash(contents: &str) {
+        assert_eq!(
+            None,
+            exports(contents),
+            "Expected bash to be needed for:\n{contents}"
+        );
+    }
+
+    #[test]
+    fn empty() {
+        assert_exports("", &[]);
+        assert_exports("\n  \n# Just a comment.\n", &[]);
+    }
+
+    #[test]
+    fn unexported_assignments() {
+        assert_exports("FOO=bar\n", &[]);
+    }
+
+    #[test]
+    fn exports_in_order() {
+        assert_exports(
+            "# Comments and blank lines are skipped.\n\
+            export FOO=bar\n\
+            \n\
+            export BAZ=1\n",
+            &[("FOO", "bar"), ("BAZ", "1")],
+        );
+    }
+
+    #[test]
+    fn quoting() {
+        assert_exports(
+            r#"
+            export SINGLE='a b $HOME "c"'
+            export DOUBLE="a b 'c' $HOME"
+            export MIXED=a'b c'"d e"f
+            export EMPTY=
+            export EMPTY_QUOTES=""
+            "#,
+            &[
+                ("SINGLE", r#"a b $HOME "c""#),
+                ("DOUBLE", "a b 'c' /home/user"),
+                ("MIXED", "ab cd ef"),
+                ("EMPTY", ""),
+                ("EMPTY_QUOTES", ""),
+            ],
+        );
+    }
+
+    #[test]
+    fn variable_references() {
+        assert_exports(
+            r#"
+            BASE=/opt
+            export BARE=$BASE/bin
+            export BRACED=${BASE}bin
+            export QUOTED="${BASE}/lib:$BASE/lib64"
+            export FROM_ENV=$HOME/.cache
+            export CHAINED=$BRACED/tool
+            "#,
+            &[
+                ("BARE", "/opt/bin"),
+                ("BRACED", "/optbin"),
+                ("QUOTED", "/opt/lib:/opt/lib64"),
+                ("FROM_ENV", "/home/user/.cache"),
+                ("CHAINED", "/optbin/tool"),
+            ],
+        );
+    }
+
+    #[test]
+    fn reassignment() {
+        assert_exports("export FOO=1\nFOO=\"$FOO 2\"\n", &[("FOO", "1 2")]);
+    }
+
+    #[test]
+    fn environment_variables_are_re_exported() {
+        assert_exports(
+            r#"
+            PATH="/opt/bin:$PATH"
+            NOT_IN_ENV=1
+            "#,
+            &[("PATH", "/opt/bin:/usr/bin:/bin")],
+        );
+    }
+
+    #[test]
+    fn export_before_assignment() {
+        assert_exports("export FOO\nFOO=bar\n", &[("FOO", "bar")]);
+        assert_exports("FOO=bar\nexport FOO\n", &[("FOO", "bar")]);
+    }
+
+    #[test]
+    fn export_without_assignment() {
+        assert_exports("export FOO\n", &[]);
+        // N.B.: The variable is already exported with this value; there is nothing to apply.
+        assert_exports("export HOME\n", &[]);
+    }
+
+    #[test]
+    fn export_prefix_requires_whitespace() {
+        assert_exports("exported=1\n", &[]);
+        assert_exports("export\tFOO=1\n", &[("FOO", "1")]);
+    }
+
+    #[test]
+    fn command_substitution() {
+        assert_bash("export FOO=$(pwd)\n");
+        assert_bash("export FOO=\"$(pwd)\"\n");
+        assert_bash("export FOO=`pwd`\n");
+        assert_bash("export FOO=\"`pwd`\"\n");
+    }
+
+    #[test]
+    fn functions() {
+        assert_bash("foo() {\n  echo foo\n}\n");
+        assert_bash("function foo {\n  echo foo\n}\n");
+    }
+
+    #[test]
+    fn conditionals_and_loops() {
+        assert_bash("if [ -n \"$HOME\" ]; then\n  export FOO=1\nfi\n");
+        assert_bash("[[ -n $HOME ]] && export FOO=1\n");
+        assert_bash("for x in a b; do export FOO=$x; done\n");
+    }
+
+    #[test]
+    fn commands() {
+        assert_bash("echo hi\n");
+        assert_bash("source other.sh\n");
+        assert_bash("export FOO=1; export BAR=2\n");
+        assert_bash("export FOO=1 BAR=2\n");
+        assert_bash("export FOO=1 # trailing comment\n");
+        assert_bash("export FOO=1 >/dev/null\n");
+    }
+
+    #[test]
+    fn parameter_expansion_operators() {
+        assert_bash("export FOO=${BAR:-default}\n");
+        assert_bash("export FOO=\"${HOME%/*}\"\n");
+        assert_bash("export FOO=${#HOME}\n");
+    }
+
+    #[test]
+    fn special_parameters() {
+        assert_bash("export FOO=$1\n");
+        assert_bash("export FOO=$$\n");
+        assert_bash("export FOO=\"$@\"\n");
+    }
+
+    #[test]
+    fn unset_references() {
+        // N.B.: Bash reports these under `set -u`.
+        assert_bash("export FOO=$UNSET\n");
+        assert_bash("export FOO=\"${UNSET}\"\n");
+    }
+
+    #[test]
+    fn escapes_globs_and_tildes() {
+        assert_bash("export FOO=a\\ b\n");
+        assert_bash("export FOO=\"a\\\"b\"\n");
+        assert_bash("export FOO=*.txt\n");
+        assert_bash("export FOO=~/bin\n");
+    }
+
+    #[test]
+    fn unterminated_quotes() {
+        assert_bash("export FOO='bar\n");
+        assert_bash("export FOO=\"bar\n");
+        assert_bash("export FOO=${BAR\n");
+    }
+
+    #[test]
+    fn invalid_names() {
+        assert_bash("export 1FOO=bar\n");
+        assert_bash("export FOO-BAR=baz\n");
+        assert_bash("FOO[0]=bar\n");
+    }
+}
@@ -4,13 +4,16 @@ use std::fmt::Debug;
 use std::path::PathBuf;
 
 use anyhow::{anyhow, Context, Result};
+use boot_cache::{BootCache, Installation};
 use build_root::BuildRoot;
-use log::{info, trace};
+use log::{debug, info, trace};
 use logging_timer::{time, timer, Level};
 use uuid::Uuid;
 
 use crate::config::PikeSquaresConfig;
 
+mod boot_cache;
+mod bootstrap_env;
 mod build_root;
 mod config;
 
@@ -85,10 +88,27 @@ fn env_version(env_var_name: &str) -> Result<Option<String>> {
     }
 }
 
-fn find_pikesquares_installation() -> Result<Option<PikeSquaresConfig>> {
-    if let Ok(build_root) = BuildRoot::find(None) {
+#[time("debug", "scie-pikesquares::{}")]
+fn find_pikesquares_installation() -> Result<Option<Installation>> {
+    // N.B.: An explicit PIKESQUARES_TOML is not tied to the build root; so it is always re-read.
+    let boot_cache = if env::var_os("PIKESQUARES_TOML").is_none() {
+        BootCache::new(SCIE_PIKESQUARES_VERSION)
+    } else {
+        None
+    };
+    let cwd = env::current_dir()?;
+    if let Some(installation) = boot_cache.as_ref().and_then(|cache| cache.load(&cwd)) {
+        return Ok(Some(installation));
+    }
+    if let Ok(build_root) = BuildRoot::find(Some(cwd.clone())) {
         let pikesquares_config = PikeSquaresConfig::parse(build_root)?;
-        return Ok(Some(pikesquares_config));
+        let installation = Installation::from(&pikesquares_config);
+        if let Some(boot_cache) = boot_cache {
+            if let Err(err) = boot_cache.store(&cwd, &installation) {
+                debug!("Failed to update the boot cache for {cwd:?}: {err:#}");
+            }
+        }
+        return Ok(Some(installation));
     }
     Ok(None)
 }
@@ -129,6 +149,17 @@ impl ScieBoot {
     ) -> Result<Process> {
         Ok(match build_root.map(|br| br.join(".pikesquares.bootstrap")) {
             Some(pikesquares_bootstrap) if self != Self::BootstrapTools && pikesquares_bootstrap.is_file() => {
+                // N.B.: Most bootstrap files just export a few variables; applying those directly
+                // saves a bash startup on every run. Bash is only needed for anything fancier.
+                if let Some(exports) = bootstrap_env::load(&pikesquares_bootstrap, &env) {
+                    let mut env = env;
+                    env.extend(exports);
+                    return Ok(Process {
+                        exe: scie.into(),
+                        env,
+                        ..Default::default()
+                    });
+                }
                 Process {
                     exe: "/usr/bin/env".into(),
                     args: vec![
@@ -157,12 +188,12 @@ impl ScieBoot {
 fn get_pikesquares_process() -> Result<Process> {
     let pikesquares_installation = find_pikesquares_installation()?;
     let (build_root, configured_pikesquares_version, debugpy_version, delegate_bootstrap) =
-        if let Some(ref pikesquares_config) = pikesquares_installation {
+        if let Some(installation) = pikesquares_installation {
             (
-                Some(pikesquares_config.build_root().to_path_buf()),
-                pikesquares_config.package_version(),
-                pikesquares_config.debugpy_version(),
-                pikesquares_config.delegate_bootstrap(),
+                Some(installation.build_root),
+                installation.pikesquares_version,
+                installation.debugpy_version,
+                installation.delegate_bootstrap,
             )
         } else {
             (None, None, None, false)
@@ -2,4 +2,13 @@ INSTALL_URL = "https://pikesquares.com/docs/installation"
 
 # An arbitrary number: bump when there's a change that someone might want to query for
 # (e.g. checking $(PANTS_BOOTSTRAP_TOOLS=1 ./pants version) >= ...).
-VERSION = 3
+VERSION = 7
+
+# The tools.pex console scripts and the functions they run.
+ENTRY_POINTS = {
+    "bootstrap-tools": "scie_pikesquares.bootstrap_tools:main",
+    "configure-pikesquares": "scie_pikesquares.configure_pikesquares:main",
+    "install-pikesquares": "scie_pikesquares.install_pikesquares:main",
+    "update-scie-pikesquares": "scie_pikesquares.update_scie_pikesquares:main",
+    "record-scie-pikesquares-info": "scie_pikesquares.record_scie_pikesquares_info:main",
+}
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import IO, Any, Collection, Iterable, cast
+
+from scie_pikesquares.lazy import lazy_import
+from scie_pikesquares.log import fatal
+from scie_pikesquares.partial_download import PartialDownload
+from scie_pikesquares.ptex import DEFAULT_FETCH_CONCURRENCY, Fetch, FetchResult, Ptex, file_sha256
+
+bindings_gc = lazy_import("scie_pikesquares.bindings_gc")
+platformdirs = lazy_import("platformdirs")
+
+log = logging.getLogger(__name__)
+
+# Both the PikeSquares platform PEXes and scie-pikesquares binaries weigh in at tens of MB; so this
+# holds a handful of versions of each.
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Partial downloads older than this are assumed to be abandoned rather than worth resuming.
+STALE_TMP_SECS = 24 * 60 * 60
+
+# Each entry's sha256 is recorded beside it in a file with this suffix; so a hit needn't re-hash it.
+DIGEST_SUFFIX = ".sha256"
+
+
+def _parse_max_bytes(value: str) -> int:
+    try:
+        return bindings_gc.parse_size(value)
+    except ValueError:
+        fatal(
+            f"PIKESQUARES_ARTIFACT_CACHE_MAX_BYTES must be a size like 1073741824, 512M or 2GiB; "
+            f"given: {value!r}"
+        )
+
+
+def _parse_segments(value: str) -> int:
+    try:
+        segments = int(value)
+    except ValueError:
+        segments = 0
+    if segments < 1:
+        fatal(f"PIKESQUARES_DOWNLOAD_SEGMENTS must be a positive integer; given: {value!r}")
+    return segments
+
+
+@dataclass(frozen=True)
+class ArtifactCache:
+    """A content-addressed, size-bounded LRU cache of fetched artifacts shared across bindings.
+
+    Entries are keyed by URL and expected sha256 (when known); so only URLs whose content never
+    changes (e.g.: GitHub release assets) should be fetched through the cache. The sha256 of each
+    entry, computed as it downloaded, is kept alongside it in `{entry}.sha256`.
+    """
+
+    @classmethod
+    def from_env(cls, ptex: Ptex) -> ArtifactCache:
+        cache_dir = os.environ.get("PIKESQUARES_ARTIFACT_CACHE")
+        max_bytes = os.environ.get("PIKESQUARES_ARTIFACT_CACHE_MAX_BYTES")
+        segments = os.environ.get("PIKESQUARES_DOWNLOAD_SEGMENTS")
+        return cls(
+            ptex=ptex,
+            cache_dir=(
+                Path(cache_dir)
+                if cache_dir
+                else platformdirs.user_cache_path("pikesquares") / "artifacts"
+            ),
+            max_bytes=_parse_max_bytes(max_bytes) if max_bytes else DEFAULT_MAX_BYTES,
+            segments=_parse_segments(segments) if segments else 1,
+        )
+
+    ptex: Ptex
+    cache_dir: Path
+    max_bytes: int = DEFAULT_MAX_BYTES
+    # The number of ranges to fetch large artifacts in concurrently; 1 fetches them in one stream.
+    segments: int = 1
+
+    def _entry(self, url: str, expected_sha256: str | None) -> Path:
+        key = hashlib.sha256(f"{url}\n{expected_sha256 or ''}".encode()).hexdigest()
+        return self.cache_dir / key[:2] / key
+
+    @staticmethod
+    def _digest_path(entry: Path) -> Path:
+        return entry.with_name(f"{entry.name}{DIGEST_SUFFIX}")
+
+    def _store_digest(self, entry: Path, sha256: str) -> None:
+        digest_path = self._digest_path(entry)
+        tmp = digest_path.with_name(f".{digest_path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp.write_text(sha256)
+        os.replace(tmp, digest_path)
+
+    def _load_digest(self, entry: Path) -> str:
+        try:
+            return self._digest_path(entry).read_text()
+        except FileNotFoundError:
+            # N.B.: The entry predates digest records, or its fetch died before recording one.
+            sha256 = file_sha256(entry)
+            self._store_digest(entry, sha256)
+            return sha256
+
+    def fetch(
+        self,
+        url: str,
+        expected_sha256: str | None = None,
+        expected_size: int | None = None,
+        **headers: str,
+    ) -> Path:
+        """Returns the path of a local copy of `url`, fetching it only on a cache miss.
+
+        The returned path is owned by the cache and must not be modified.
+        """
+        entry = self._entry(url, expected_sha256)
+        try:
+            # Bumping the mtime is what makes eviction LRU instead of FIFO.
+            os.utime(entry)
+            log.debug(f"Artifact cache hit for {url} at {entry}")
+            return entry
+        except FileNotFoundError:
+            pass
+
+        log.debug(f"Artifact cache miss for {url}; fetching to {entry}")
+        # Readers only ever see complete entries since the download is renamed into place.
+        sha256 = PartialDownload(
+            dest=entry, url=url, expected_sha256=expected_sha256, expected_size=expected_size
+        ).fetch(self.ptex, segments=self.segments, **headers)
+        self._store_digest(entry, sha256)
+        self.evict(keep=[entry])
+        return entry
+
+    def fetch_many(
+        self, fetches: Iterable[Fetch], max_workers: int = DEFAULT_FETCH_CONCURRENCY
+    ) -> list[FetchResult]:
+        """Like `Ptex.fetch_many`, but through the cache; each result's `path` is its entry.
+
+        The `dest` of each fetch is ignored. Cache hits are returned without fetching and the misses
+        are fetched concurrently.
+        """
+        results: list[FetchResult | None] = []
+        misses: list[tuple[int, Fetch]] = []
+        for fetch in fetches:
+            entry = self._entry(fetch.url, fetch.expected_sha256)
+            try:
+                os.utime(entry)
+            except FileNotFoundError:
+                misses.append((len(results), replace(fetch, dest=entry)))
+                results.append(None)
+                continue
+            log.debug(f"Artifact cache hit for {fetch.url} at {entry}")
+            # N.B.: An entry keyed by its digest was verified when it was stored.
+            sha256 = fetch.expected_sha256 or self._load_digest(entry)
+            results.append(FetchResult(fetch=fetch, path=entry, sha256=sha256))
+
+        if misses:
+            fetched = self.ptex.fetch_many([fetch for _, fetch in misses], max_workers=max_workers)
+            for (index, _), result in zip(misses, fetched):
+                if result.path is not None and result.sha256 is not None:
+                    self._store_digest(result.path, result.sha256)
+                results[index] = result
+            self.evict(keep=[fetch.dest for _, fetch in misses if fetch.dest])
+        return cast(list[FetchResult], results)
+
+    def discard(self, url: str, expected_sha256: str | None = None) -> None:
+        entry = self._entry(url, expected_sha256)
+        entry.unlink(missing_ok=True)
+        self._digest_path(entry).unlink(missing_ok=True)
+
+    def fetch_to_fp(
+        self, url: str, fp: IO[bytes], expected_sha256: str | None = None, **headers: str
+    ) -> None:
+        with self.fetch(url, expected_sha256=expected_sha256, **headers).open("rb") as entry_fp:
+            shutil.copyfileobj(entry_fp, fp)
+
+    def fetch_text(self, url: str, expected_sha256: str | None = None, **headers: str) -> str:
+        return self.fetch(url, expected_sha256=expected_sha256, **headers).read_text()
+
+    def fetch_json(self, url: str, expected_sha256: str | None = None, **headers: str) -> Any:
+        return json.loads(self.fetch(url, expected_sha256=expected_sha256, **headers).read_bytes())
+
+    def evict(self, keep: Collection[Path] = ()) -> int:
+        """Removes least recently used entries until the cache fits in `max_bytes`.
+
+        Returns the number of bytes freed.
+        """
+        entries: list[tuple[float, int, Path]] = []
+        total = 0
+        now = time.time()
+        for shard in self.cache_dir.glob("??"):
+            for path in shard.iterdir():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if path.name.startswith("."):
+                    if now - stat.st_mtime > STALE_TMP_SECS:
+                        path.unlink(missing_ok=True)
+                    continue
+                if path.name.endswith(DIGEST_SUFFIX):
+                    if not path.with_name(path.name[: -len(DIGEST_SUFFIX)]).exists():
+                        path.unlink(missing_ok=True)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        freed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            log.debug(f"Evicting {path} ({size} bytes) from the artifact cache.")
+            path.unlink(missing_ok=True)
+            self._digest_path(path).unlink(missing_ok=True)
+            freed += size
+        return freed
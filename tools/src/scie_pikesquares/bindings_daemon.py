@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Callable, NoReturn, TypeVar
+
+from scie_pikesquares import ENTRY_POINTS
+from scie_pikesquares.lazy import lazy_import
+
+fcntl = lazy_import("fcntl")
+socket = lazy_import("socket")
+
+log = logging.getLogger(__name__)
+
+ENABLE_ENV_VAR = "PIKESQUARES_BINDINGS_DAEMON"
+
+# Long enough to span the configure, install and scie-pikesquares-info bindings of a single boot.
+DEFAULT_IDLE_TIMEOUT_SECS = 30.0
+
+_LENGTH = struct.Struct("!I")
+_EXIT_CODE = struct.Struct("!i")
+# The `struct ucred` reported for SO_PEERCRED: pid, uid and gid.
+_PEERCRED = struct.Struct("3i")
+
+# Set in the daemon so that entry points it runs do not try to delegate back to it.
+_serving = False
+
+
+def _runtime_dir() -> Path | None:
+    """Returns a directory only the current user can reach, or `None` if it cannot be trusted."""
+    uid = os.getuid()
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    runtime_dir = Path(base) / f"scie-pikesquares-{uid}"
+    try:
+        runtime_dir.mkdir(mode=0o700, exist_ok=True)
+        # N.B.: The directory may have been planted by someone else before we got to create it; so
+        # it must not be a symlink and must be ours alone.
+        st = runtime_dir.lstat()
+    except OSError as e:
+        log.debug(f"Cannot use {runtime_dir} for the bindings daemon: {e}")
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != uid or st.st_mode & 0o077:
+        log.debug(f"Not using {runtime_dir} for the bindings daemon; it is not private to us.")
+        return None
+    return runtime_dir
+
+
+def _socket_path() -> Path | None:
+    runtime_dir = _runtime_dir()
+    if runtime_dir is None:
+        return None
+    # N.B.: The daemon's preloaded code must match the caller's; so key on the interpreter and the
+    # tools.pex (or source tree) it runs. The daemon is told this path rather than re-deriving it.
+    key = hashlib.sha256(
+        f"{sys.executable}\0{os.environ.get('PEX', '')}\0{os.pathsep.join(sys.path)}".encode()
+    ).hexdigest()[:16]
+    return runtime_dir / f"{key}.sock"
+
+
+def _peer_uid(conn: Any) -> int | None:
+    """Returns the uid of the process at the other end of `conn` where the platform reports it."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    _pid, uid, _gid = _PEERCRED.unpack(
+        conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size)
+    )
+    return int(uid)
+
+
+def _recv_exactly(conn: Any, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise EOFError("The bindings daemon connection closed early.")
+        data += chunk
+    return data
+
+
+def _delegate(entry_point: str) -> int | None:
+    """Runs `entry_point` in the daemon, returning its exit code or `None` if there is no daemon."""
+    path = _socket_path()
+    if path is None:
+        return None
+    try:
+        # Never hand our environment and stdio to a socket some other user planted.
+        if path.stat().st_uid != os.getuid():
+            return None
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(str(path))
+    except OSError:
+        return None
+
+    with conn:
+        request = json.dumps(
+            {
+                "entry_point": entry_point,
+                "argv": sys.argv,
+                "env": dict(os.environ),
+                "cwd": os.getcwd(),
+            }
+        ).encode()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(conn, [_LENGTH.pack(len(request))], [0, 1, 2])
+        conn.sendall(request)
+        try:
+            (exit_code,) = _EXIT_CODE.unpack(_recv_exactly(conn, _EXIT_CODE.size))
+        except EOFError:
+            return 1
+        return int(exit_code)
+
+
+def _spawn_daemon(idle_timeout: float) -> None:
+    path = _socket_path()
+    if path is None:
+        return
+    subprocess.Popen(
+        args=[
+            sys.executable,
+            "-c",
+            "from scie_pikesquares.bindings_daemon import main; main()",
+            "--socket",
+            str(path),
+            "--idle-timeout",
+            str(idle_timeout),
+        ],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _idle_timeout() -> float | None:
+    value = os.environ.get(ENABLE_ENV_VAR, "")
+    if not value or value.lower() in ("0", "false", "no"):
+        return None
+    try:
+        return float(value) if float(value) > 1 else DEFAULT_IDLE_TIMEOUT_SECS
+    except ValueError:
+        return DEFAULT_IDLE_TIMEOUT_SECS
+
+
+_F = TypeVar("_F", bound=Callable[[], Any])
+
+
+def delegating(entry_point: str) -> Callable[[_F], _F]:
+    """Decorates an entry point `main` to run in a warm bindings daemon when one is enabled.
+
+    Setting PIKESQUARES_BINDINGS_DAEMON to 1 (or to an idle timeout in seconds) turns the mode on.
+    The first entry point run starts the daemon in the background and runs locally; subsequent ones
+    are forked off the daemon's already warm interpreter.
+    """
+
+    def decorator(func: _F) -> _F:
+        @functools.wraps(func)
+        def wrapper() -> Any:
+            idle_timeout = _idle_timeout()
+            if not _serving and idle_timeout is not None:
+                exit_code = _delegate(entry_point)
+                if exit_code is not None:
+                    sys.exit(exit_code)
+                _spawn_daemon(idle_timeout)
+            return func()
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def _run_entry_point(entry_point: str) -> int:
+    module_name, func_name = ENTRY_POINTS[entry_point].split(":", 1)
+    # N.B.: Reloading re-evaluates any module level state derived from the environment or argv of
+    # the request; the module's dependencies stay warm.
+    module = importlib.reload(sys.modules[module_name])
+    try:
+        getattr(module, func_name)()
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        try:
+            sys.excepthook(*sys.exc_info())
+        except SystemExit:
+            pass
+        return 1
+
+
+def _watch_for_hangup(conn: Any) -> None:
+    # The caller never sends anything after its request; so a read returning means it went away
+    # (e.g.: it was interrupted with Ctrl-C) and there is nobody left to run for.
+    conn.recv(1)
+    os._exit(130)
+
+
+def _handle(conn: Any) -> NoReturn:
+    exit_code = 1
+    try:
+        header, fds, _, _ = socket.recv_fds(conn, _LENGTH.size, 3)
+        (length,) = _LENGTH.unpack(header + _recv_exactly(conn, _LENGTH.size - len(header)))
+        request = json.loads(_recv_exactly(conn, length))
+
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = request["argv"]
+        threading.Thread(target=_watch_for_hangup, args=(conn,), daemon=True).start()
+
+        exit_code = _run_entry_point(request["entry_point"])
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        conn.sendall(_EXIT_CODE.pack(exit_code))
+    finally:
+        os._exit(exit_code)
+
+
+def serve(path: Path, idle_timeout: float) -> None:
+    global _serving
+    _serving = True
+
+    # N.B.: The lock is held for the life of the daemon; O_NOFOLLOW refuses a planted symlink.
+    lock = os.open(
+        path.with_suffix(".lock"), os.O_WRONLY | os.O_CREAT | os.O_NOFOLLOW | os.O_CLOEXEC, 0o600
+    )
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # Another daemon is already serving.
+        os.close(lock)
+        return
+
+    # Pre-import all the entry points and force their lazy imports so that forked requests start
+    # warm.
+    for target in ENTRY_POINTS.values():
+        importlib.import_module(target.split(":", 1)[0])
+    for module in list(sys.modules.values()):
+        try:
+            getattr(module, "__file__", None)
+        except ImportError as e:
+            log.debug(f"Failed to preload {module.__spec__}: {e}")
+
+    path.unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    path.chmod(0o600)
+    server.listen()
+    server.settimeout(idle_timeout)
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except TimeoutError:
+                break
+            # Requests carry our caller's environment and stdio and run as us; so only serve our
+            # own user.
+            peer_uid = _peer_uid(conn)
+            if peer_uid is not None and peer_uid != os.getuid():
+                log.warning(f"Refusing a bindings daemon request from uid {peer_uid}.")
+                conn.close()
+                continue
+            if os.fork() == 0:
+                server.close()
+                conn.settimeout(None)
+                _handle(conn)
+            conn.close()
+            try:
+                while os.waitpid(-1, os.WNOHANG) != (0, 0):
+                    pass
+            except ChildProcessError:
+                pass
+    finally:
+        server.close()
+        path.unlink(missing_ok=True)
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description="Serves tools entry points from a warm interpreter.")
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        required=True,
+        help="The path of the Unix socket to serve on.",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT_SECS,
+        help="Exit after this many seconds without a request.",
+    )
+    options = parser.parse_args()
+    serve(options.socket, idle_timeout=options.idle_timeout)
+    sys.exit(0)
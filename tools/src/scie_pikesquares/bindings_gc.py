@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import fcntl
+import glob
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, Hashable, Iterable
+
+from scie_pikesquares.venv_store import collect_garbage
+
+log = logging.getLogger(__name__)
+
+DEFAULT_KEEP = 3
+
+# Touched each time a venv is handed to a boot; see `last_used`.
+LAST_USED_MARKER = ".pikesquares-last-used"
+
+_LOG_ROTATION_GLOBS = ("*.log.[0-9]*", "*.jsonl.[0-9]*")
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def mark_used(venv_dir: Path) -> None:
+    (venv_dir / LAST_USED_MARKER).touch()
+
+
+def last_used(venv_dir: Path) -> float:
+    """Returns when the venv was last used, as a timestamp.
+
+    Besides the marker the install binding touches, the access time of `pyvenv.cfg` is consulted:
+    every start of the venv's interpreter reads it, so on the usual `relatime` mounts it records use
+    to within a day without the launcher having to do anything.
+    """
+    stamps = [0.0]
+    for name, attr in ((LAST_USED_MARKER, "st_mtime"), ("pyvenv.cfg", "st_atime")):
+        try:
+            stamps.append(getattr((venv_dir / name).stat(), attr))
+        except OSError:
+            pass
+    try:
+        stamps.append(venv_dir.stat().st_mtime)
+    except OSError:
+        pass
+    return max(stamps)
+
+
+@dataclass(frozen=True)
+class Removal:
+    path: Path
+    # One of: "venv", "pex_root", "log", "backup" or "boot_cache".
+    kind: str
+    # The bytes freed; hard links shared with what is kept are not counted.
+    size: int
+
+
+@dataclass(frozen=True)
+class Report:
+    removed: tuple[Removal, ...]
+    skipped: tuple[Path, ...]
+    # The bytes used by the bindings dir before collection.
+    total: int
+
+    @property
+    def freed(self) -> int:
+        return sum(removal.size for removal in self.removed)
+
+
+def _scandir(path: str) -> tuple[list[tuple[str, os.stat_result]], list[str]]:
+    files = []
+    dirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                else:
+                    files.append((entry.path, entry.stat(follow_symlinks=False)))
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files, dirs
+
+
+def _walk(
+    root: Path, executor: Executor, tags: dict[str, Hashable] | None = None
+) -> tuple[list[tuple[Hashable, str, os.stat_result]], list[str]]:
+    """Walks `root`, scanning its directories concurrently.
+
+    Returns every non-directory under `root` with its tag and stat, along with every directory in
+    an order that visits parents before their children. A directory takes its tag from `tags`, or
+    else inherits its parent's.
+    """
+    tags = tags or {}
+    files: list[tuple[Hashable, str, os.stat_result]] = []
+    dirs: list[str] = []
+    running = {executor.submit(_scandir, str(root)): tags.get(str(root))}
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            tag = running.pop(future)
+            dir_files, subdirs = future.result()
+            files.extend((tag, path, st) for path, st in dir_files)
+            for subdir in subdirs:
+                dirs.append(subdir)
+                running[executor.submit(_scandir, subdir)] = tags.get(subdir, tag)
+    return files, dirs
+
+
+def _empty_dir(path: str) -> list[str]:
+    """Unlinks everything in `path` but its subdirectories, which are returned."""
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            else:
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+    return subdirs
+
+
+def remove_tree(root: Path, executor: Executor) -> None:
+    """Removes `root` like `shutil.rmtree`, but emptying its directories concurrently."""
+    dirs = [str(root)]
+    running = {executor.submit(_empty_dir, str(root))}
+    while running:
+        done, running = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            for subdir in future.result():
+                dirs.append(subdir)
+                running.add(executor.submit(_empty_dir, subdir))
+    # N.B.: Parents were found before their children; so this removes children first.
+    for directory in reversed(dirs):
+        os.rmdir(directory)
+
+
+class _Usage:
+    """The disk usage of a tree, accounting for files hard linked between its parts.
+
+    A file is only freed once every one of its links is removed; links in the venv store don't
+    count since the store drops files no venv links to anymore.
+    """
+
+    def __init__(self, files: Iterable[tuple[Hashable, str, os.stat_result]], store: Hashable):
+        self._sizes: dict[tuple[int, int], int] = {}
+        self._remaining: Counter[tuple[int, int]] = Counter()
+        self._links: dict[Hashable, Counter[tuple[int, int]]] = {}
+        for tag, _, st in files:
+            inode = (st.st_dev, st.st_ino)
+            if inode not in self._sizes:
+                self._sizes[inode] = st.st_size
+                self._remaining[inode] = st.st_nlink
+            if tag == store:
+                self._remaining[inode] -= 1
+            elif tag is not None:
+                self._links.setdefault(tag, Counter())[inode] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self._sizes.values())
+
+    def remove(self, tag: Hashable) -> int:
+        """Accounts for removing everything tagged `tag` and returns the bytes that frees."""
+        freed = 0
+        for inode, links in self._links.pop(tag, Counter()).items():
+            self._remaining[inode] -= links
+            if self._remaining[inode] <= 0:
+                freed += self._sizes[inode]
+        return freed
+
+
+def _in_use_paths() -> list[Path]:
+    paths = [Path(sys.prefix), Path(sys.executable), Path(__file__)]
+    paths.extend(Path(entry) for entry in sys.path if entry)
+    resolved = []
+    for path in paths:
+        try:
+            resolved.append(path.resolve())
+        except OSError:
+            pass
+    return resolved
+
+
+def _pex_root_entries(pex_root: Path) -> list[Path]:
+    """Returns the PEX cache entries not used by the running tools."""
+    in_use = _in_use_paths()
+    entries = [entry for entry in pex_root.glob("*/*") if entry.is_dir() and not entry.is_symlink()]
+    unused = [
+        entry
+        for entry in entries
+        if not any(path.is_relative_to(entry.resolve()) for path in in_use)
+    ]
+    return sorted(unused, key=lambda entry: entry.stat().st_mtime)
+
+
+def _abandoned_updates(scie: Path) -> list[Path]:
+    abandoned = []
+    for path in scie.parent.glob(f".{glob.escape(scie.name)}.*.update"):
+        pid = path.name[len(scie.name) + 2 : -len(".update")]
+        if not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            abandoned.append(path)
+        except PermissionError:
+            # The process exists; it's just not ours.
+            pass
+    return abandoned
+
+
+def _stale_boot_cache_entry(entry: Path) -> bool:
+    """Returns whether a launcher boot cache entry can no longer be hit.
+
+    Entries are written by the launcher's `BootCache`, one per working directory booted from. An
+    entry is dead once its working directory is gone or the `pikesquares.toml` it was read from has
+    changed; a boot from there would re-read the config and rewrite it.
+    """
+    try:
+        lines = entry.read_text().split("\n")
+        _, cwd, stamp, build_root = lines[:4]
+        mtime_secs, mtime_nanos, size = (int(field) for field in stamp.split(" "))
+    except (OSError, UnicodeDecodeError, ValueError):
+        # N.B.: This includes the temporary files of writes that were interrupted.
+        return True
+    if not os.path.isdir(cwd):
+        return True
+    try:
+        st = os.stat(os.path.join(build_root, "pikesquares.toml"))
+    except OSError:
+        return True
+    return (st.st_mtime_ns, st.st_size) != (mtime_secs * 1_000_000_000 + mtime_nanos, size)
+
+
+def _lock_venv(venv_dir: Path) -> int | None:
+    # N.B.: This is the lock installs hold; so an install in progress is never collected.
+    fd = os.open(venv_dir.parent / f".{venv_dir.name}.lock", os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def collect(
+    base_dir: Path,
+    keep: int = DEFAULT_KEEP,
+    max_bytes: int | None = None,
+    protected_versions: Collection[str] = (),
+    scie: Path | None = None,
+    dry_run: bool = False,
+    max_workers: int | None = None,
+) -> Report:
+    """Prunes the bindings dir at `base_dir`.
+
+    Rotated logs, stale boot cache entries and the files updates of `scie` leave behind are always
+    removed, as are all but the `keep` most recently used venvs. If the bindings dir still uses more
+    than `max_bytes`, unused PEX cache entries and then the remaining venvs are removed, least
+    recently used first, until it fits. The venvs of `protected_versions` are never removed.
+    """
+    venvs_dir = base_dir / "venvs"
+    store_dir = base_dir / "venv_store"
+
+    always: list[tuple[Path, str]] = []
+    for pattern in _LOG_ROTATION_GLOBS:
+        always.extend((path, "log") for path in (base_dir / "logs").glob(pattern))
+    always.extend(
+        (path, "boot_cache")
+        for path in (base_dir / "boot_cache").glob("*")
+        if path.is_file() and _stale_boot_cache_entry(path)
+    )
+    if scie:
+        # N.B.: Older updates left the replaced scie behind as a backup; current ones stage the new
+        # scie beside it, leaving it behind only if killed.
+        backup = scie.with_suffix(".bak")
+        if backup.is_file():
+            always.append((backup, "backup"))
+        always.extend((path, "backup") for path in _abandoned_updates(scie))
+    # N.B.: These are venvs a prior collection was interrupted removing.
+    always.extend((path, "venv") for path in venvs_dir.glob(".*.gc-*") if path.is_dir())
+
+    venvs = sorted(
+        (
+            path
+            for path in venvs_dir.glob("*")
+            if path.is_dir()
+            and not path.name.startswith(".")
+            and path.name not in protected_versions
+        ),
+        key=last_used,
+        reverse=True,
+    )
+    excess = [(path, "venv") for path in venvs[keep:]]
+    # Least recently used first.
+    evictable = [(path, "pex_root") for path in _pex_root_entries(base_dir / "pex_root")]
+    evictable.extend((path, "venv") for path in reversed(venvs[:keep]))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gc") as executor:
+        tags: dict[str, Hashable] = {str(store_dir): store_dir}
+        tags.update((str(path), path) for path, _ in (*always, *excess, *evictable))
+        files, _ = _walk(base_dir, executor, tags=tags)
+        usage = _Usage(files, store=store_dir)
+        total = usage.total
+        used = total
+
+        victims: list[tuple[Path, str, int]] = []
+        for path, kind in (*always, *excess):
+            size = usage.remove(path) if path.is_dir() else _file_size(path)
+            victims.append((path, kind, size))
+            used -= size
+        if max_bytes is not None:
+            for path, kind in evictable:
+                if used <= max_bytes:
+                    break
+                size = usage.remove(path)
+                victims.append((path, kind, size))
+                used -= size
+            if used > max_bytes:
+                log.warning(
+                    f"Could not bring {base_dir} under {max_bytes} bytes; it still uses {used}."
+                )
+
+        removed: list[Removal] = []
+        skipped: list[Path] = []
+        for path, kind, size in victims:
+            if dry_run:
+                removed.append(Removal(path, kind, size))
+            elif _remove(path, kind, executor):
+                log.debug(f"Removed {path}, freeing {size} bytes.")
+                removed.append(Removal(path, kind, size))
+            else:
+                skipped.append(path)
+
+    if not dry_run and any(removal.kind == "venv" for removal in removed) and store_dir.is_dir():
+        collect_garbage(store_dir)
+    return Report(removed=tuple(removed), skipped=tuple(skipped), total=total)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return 0
+    return st.st_size if st.st_nlink == 1 else 0
+
+
+def _remove(path: Path, kind: str, executor: Executor) -> bool:
+    if not path.is_dir():
+        path.unlink(missing_ok=True)
+        return True
+    if kind != "venv" or ".gc-" in path.name:
+        remove_tree(path, executor)
+        return True
+
+    lock = _lock_venv(path)
+    if lock is None:
+        log.info(f"Skipping {path}; it is being installed.")
+        return False
+    try:
+        # N.B.: Moving the venv aside first means an interrupted removal never leaves a venv that
+        # looks installed behind.
+        doomed = path.with_name(f".{path.name}.gc-{os.getpid()}")
+        path.rename(doomed)
+    finally:
+        os.close(lock)
+    remove_tree(doomed, executor)
+    return True
+
+
+def parse_size(value: str) -> int:
+    """Parses a byte count like `1073741824`, `512M` or `2GiB`."""
+    match = re.fullmatch(r"(\d+)\s*([KMG]?)(?:i?B)?", value.strip(), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+
+
+def format_bytes(size: int) -> str:
+    if size < 1024:
+        return f"{size}B"
+    value = size / 1024
+    for unit in ("KiB", "MiB"):
+        if value < 1024:
+            return f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GiB"
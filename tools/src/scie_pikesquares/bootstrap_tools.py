@@ -2,10 +2,20 @@ import argparse
 import os
 import sys
 from argparse import ArgumentParser, Namespace
+from pathlib import Path
 from typing import Any, Callable, NoReturn
 
-from scie_pikesquares import INSTALL_URL, VERSION
-from scie_pikesquares.log import fatal
+from scie_pikesquares import ENTRY_POINTS, INSTALL_URL, VERSION
+from scie_pikesquares.bindings_daemon import delegating
+from scie_pikesquares.lazy import lazy_import
+from scie_pikesquares.log import fatal, info, init_logging
+from scie_pikesquares.ptex import Ptex
+
+bindings_gc = lazy_import("scie_pikesquares.bindings_gc")
+import_profile = lazy_import("scie_pikesquares.import_profile")
+packaging_version = lazy_import("packaging.version")
+prefetch = lazy_import("scie_pikesquares.prefetch")
+timings = lazy_import("scie_pikesquares.timings")
 
 PROG = os.environ.get("SCIE", sys.argv[0])
 
@@ -38,6 +48,11 @@ def versioned(func) -> Callable:
     return wrapper
 
 
+def size(value: str) -> int:
+    # N.B.: Named for argparse, which reports a ValueError as an "invalid size value".
+    return bindings_gc.parse_size(value)
+
+
 @versioned
 def bootstrap_cache_key(options: Namespace) -> None:
     def require(option: str) -> str:
@@ -56,6 +71,105 @@ def bootstrap_cache_key(options: Namespace) -> None:
     print(" ".join(cache_key))
 
 
+@versioned
+def profile_entry_point_imports(options: Namespace) -> None:
+    entry_points = options.entry_points or list(ENTRY_POINTS)
+    over_budget = []
+    for entry_point in entry_points:
+        if entry_point not in ENTRY_POINTS:
+            fatal(f"Unknown entry point {entry_point}; choose from: {', '.join(ENTRY_POINTS)}")
+        module = ENTRY_POINTS[entry_point].split(":", 1)[0]
+        import_times = import_profile.profile_imports(module)
+        total_us = next(
+            (it.cumulative_us for it in import_times if it.module == module and it.depth == 0), 0
+        )
+        print(f"{entry_point}: {total_us / 1000:.1f}ms")
+
+        # N.B.: -X importtime reports imports in post-order; so the dependencies of the entry point
+        # module are the entries directly preceding it.
+        end = next(i for i, it in enumerate(import_times) if it.module == module and it.depth == 0)
+        start = end
+        while start > 0 and import_times[start - 1].depth > 0:
+            start -= 1
+        direct = [it for it in import_times[start:end] if it.depth == 1]
+        for it in sorted(direct, key=lambda it: it.cumulative_us, reverse=True)[: options.top]:
+            print(f"    {it.cumulative_us / 1000:6.1f}ms {it.module}")
+
+        if options.budget_ms is not None and total_us > options.budget_ms * 1000:
+            over_budget.append(f"{entry_point} ({total_us / 1000:.1f}ms)")
+
+    if over_budget:
+        fatal(
+            f"The following entry points exceeded the {options.budget_ms}ms import budget: "
+            f"{', '.join(over_budget)}"
+        )
+
+
+@versioned
+def profile_bootstrap(options: Namespace) -> None:
+    if not options.base_dir:
+        fatal("The --base-dir option is required for the profile command.")
+    stats = timings.summarize(timings.load_spans(options.base_dir), last_runs=options.last)
+    if not stats:
+        fatal(f"No bootstrap timings have been recorded under {options.base_dir} yet.")
+    for line in timings.render(stats):
+        print(line)
+
+
+@versioned
+def prefetch_versions(options: Namespace) -> None:
+    if not options.base_dir or not options.ptex_path:
+        fatal("The prefetch command must be run via the scie-pikesquares bootstrap-tools command.")
+    try:
+        versions = [packaging_version.Version(version) for version in options.versions]
+    except packaging_version.InvalidVersion as e:
+        fatal(f"Invalid PikeSquares version: {e}")
+
+    if options.background:
+        argv = [arg for arg in sys.argv[1:] if arg != "--background"]
+        log_file = options.base_dir / "logs" / "prefetch.log"
+        pid = prefetch.spawn_in_background(argv, log_file=log_file)
+        info(f"Prefetching in the background (pid {pid}); progress is logged to {log_file}")
+        return
+
+    results = prefetch.prefetch(
+        versions,
+        base_dir=options.base_dir,
+        ptex=Ptex.from_exe(options.ptex_path),
+        compile_mode=options.compile_mode,
+        jobs=options.jobs,
+    )
+    failed = [f"{version} ({error})" for version, error in results.items() if error]
+    if failed:
+        fatal(f"Failed to prefetch PikeSquares {', '.join(failed)}")
+    info(f"Prefetched PikeSquares {', '.join(map(str, results))}")
+
+
+@versioned
+def collect_garbage(options: Namespace) -> None:
+    if not options.base_dir:
+        fatal("The gc command must be run via the scie-pikesquares bootstrap-tools command.")
+    scie = os.environ.get("SCIE")
+    report = bindings_gc.collect(
+        options.base_dir,
+        keep=bindings_gc.DEFAULT_KEEP if options.keep is None else options.keep,
+        max_bytes=options.max_bytes,
+        protected_versions=[options.pikesquares_version] if options.pikesquares_version else [],
+        scie=Path(scie) if scie else None,
+        dry_run=options.dry_run,
+    )
+    for removal in report.removed:
+        print(f"{removal.path} ({bindings_gc.format_bytes(removal.size)})")
+    for path in report.skipped:
+        print(f"{path} (skipped: in use)")
+    verb = "Would free" if options.dry_run else "Freed"
+    info(
+        f"{verb} {bindings_gc.format_bytes(report.freed)} of the "
+        f"{bindings_gc.format_bytes(report.total)} used by {options.base_dir}"
+    )
+
+
+@delegating("bootstrap-tools")
 def main() -> NoReturn:
     parser = ArgumentParser(prog=PROG)
     parser.add_argument("-V", "--version", action="version", version=f"{VERSION}")
@@ -69,6 +183,18 @@ def main() -> NoReturn:
         # The version of PikeSquares being used.
         help=argparse.SUPPRESS,
     )
+    parser.add_argument(
+        "--base-dir",
+        type=Path,
+        # The base directory of this scie's bindings.
+        help=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        "--ptex-path",
+        # The path of a ptex binary. N.B.: Only the subcommands that fetch build a Ptex from it;
+        # the in-process backend pulls in the HTTP stack.
+        help=argparse.SUPPRESS,
+    )
 
     sub_commands = parser.add_subparsers()
     cache_key_parser = sub_commands.add_parser(
@@ -80,12 +206,120 @@ def main() -> NoReturn:
     )
     cache_key_parser.set_defaults(func=bootstrap_cache_key)
 
+    import_profile_parser = sub_commands.add_parser(
+        "import-profile",
+        help=(
+            "Report how long each tools entry point takes to import, along with its heaviest "
+            "imports. (Added in bootstrap version 4.)"
+        ),
+    )
+    import_profile_parser.add_argument(
+        "--budget-ms",
+        type=float,
+        help="Fail if any entry point takes longer than this many milliseconds to import.",
+    )
+    import_profile_parser.add_argument(
+        "--top",
+        type=int,
+        default=5,
+        help="The number of heaviest imports to report per entry point.",
+    )
+    import_profile_parser.add_argument(
+        "entry_points",
+        nargs="*",
+        metavar="entry-point",
+        help="The entry points to profile; all of them by default.",
+    )
+    import_profile_parser.set_defaults(func=profile_entry_point_imports)
+
+    profile_parser = sub_commands.add_parser(
+        "profile",
+        help=(
+            "Report how long each phase of the bootstrap tools took, aggregated across runs. "
+            "(Added in bootstrap version 5.)"
+        ),
+    )
+    profile_parser.add_argument(
+        "--last",
+        type=int,
+        help="Only aggregate the last this many runs of each tool.",
+    )
+    profile_parser.set_defaults(func=profile_bootstrap)
+
+    prefetch_parser = sub_commands.add_parser(
+        "prefetch",
+        help=(
+            "Install the given PikeSquares versions ahead of time so that a later switch to any of "
+            "them boots an already warm environment. (Added in bootstrap version 6.)"
+        ),
+    )
+    prefetch_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=2,
+        help="The maximum number of versions to install concurrently.",
+    )
+    prefetch_parser.add_argument(
+        "--background",
+        action="store_true",
+        help="Detach and install in the background, logging progress to logs/prefetch.log.",
+    )
+    prefetch_parser.add_argument(
+        "--compile-mode",
+        # N.B.: Mirrors bytecode.COMPILE_MODES without importing it (and its process pool) for
+        # every bootstrap-tools invocation.
+        choices=("all", "hot", "none"),
+        default=os.environ.get("PIKESQUARES_COMPILE_MODE") or "all",
+        help="How to byte-compile the venvs; see install-pikesquares --compile-mode.",
+    )
+    prefetch_parser.add_argument(
+        "versions",
+        nargs="+",
+        metavar="version",
+        help="The PikeSquares versions to install.",
+    )
+    prefetch_parser.set_defaults(func=prefetch_versions, logs=True)
+
+    gc_parser = sub_commands.add_parser(
+        "gc",
+        help=(
+            "Remove rotated logs, update backups, least recently used PikeSquares venvs and unused "
+            "PEX caches from the bootstrap directories. (Added in bootstrap version 7.)"
+        ),
+    )
+    gc_parser.add_argument(
+        "--keep",
+        type=int,
+        # N.B.: argparse only converts this when the gc command runs; so a bad value fails just gc.
+        default=os.environ.get("PIKESQUARES_GC_KEEP") or None,
+        help=(
+            "The number of most recently used PikeSquares venvs to keep, besides the one for the "
+            "current version. Defaults to $PIKESQUARES_GC_KEEP, if set."
+        ),
+    )
+    gc_parser.add_argument(
+        "--max-bytes",
+        type=size,
+        default=os.environ.get("PIKESQUARES_GC_MAX_BYTES") or None,
+        help=(
+            "Also remove unused PEX caches and then older venvs, even ones --keep would keep, "
+            "until the bootstrap directories use at most this much disk; e.g.: 2G or 512M."
+        ),
+    )
+    gc_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report what would be removed.",
+    )
+    gc_parser.set_defaults(func=collect_garbage, logs=True)
+
     version_parser = sub_commands.add_parser(
         "bootstrap-version",
         help=(
             "Print a version number for the bootstrap script itself. Distributed scripts (such as "
-            "reusable CI formulae) that use these bootstrap tools should set PIKESQUARES_BOOTSTRAP_TOOLS "
-            "to the minimum script version for the features they require. For example, if "
+            "reusable CI formulae) that use these bootstrap tools should set "
+            "PIKESQUARES_BOOTSTRAP_TOOLS to the minimum script version for the features they "
+            "require. For example, if "
             "'some-tool' was added in version 123: "
             "PIKESQUARES_BOOTSTRAP_TOOLS=123 ./pikesquares some-tool"
         ),
@@ -97,9 +331,12 @@ def main() -> NoReturn:
         help="Show this help.",
     )
     help_parser.set_defaults(func=lambda _: parser.print_help())
-    parser.set_defaults(func=lambda _: parser.print_help())
+    # N.B.: Only the subcommands that log set up logging; the rest needn't pay for it.
+    parser.set_defaults(func=lambda _: parser.print_help(), logs=False)
 
     options = parser.parse_args()
+    if options.logs and options.base_dir:
+        init_logging(base_dir=options.base_dir, log_name="bootstrap-tools")
     subcommand = options.func
     subcommand(options)
 
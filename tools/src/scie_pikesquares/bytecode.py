@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import compileall
+import importlib.util
+import logging
+import multiprocessing
+import os
+import py_compile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePath
+
+log = logging.getLogger(__name__)
+
+COMPILE_MODES = ("all", "hot", "none")
+
+# The modules a venv's Python imported, recorded by the hook below as it exits; one path per line.
+IMPORT_TRACE = "pikesquares-import-trace.txt"
+
+_TRACE_HOOK_MODULE = "_pikesquares_import_trace"
+
+# N.B.: This runs at the exit of every Python process started from the venv; so it does as little
+# as it can and never fails the process. Only the first process to import a module grows the trace.
+_TRACE_HOOK = f"""\
+import atexit
+import os
+import sys
+
+
+def _record():
+    trace = os.path.join(sys.prefix, {IMPORT_TRACE!r})
+    try:
+        paths = (getattr(module, "__file__", None) for module in list(sys.modules.values()))
+        imported = {{path for path in paths if path and path.endswith(".py")}}
+        try:
+            with open(trace) as fp:
+                recorded = set(fp.read().splitlines())
+        except OSError:
+            recorded = set()
+        if imported <= recorded:
+            return
+        tmp = f"{{trace}}.{{os.getpid()}}"
+        with open(tmp, "w") as fp:
+            fp.write("\\n".join(sorted(recorded | imported)))
+        os.replace(tmp, trace)
+    except Exception:
+        pass
+
+
+atexit.register(_record)
+"""
+
+
+def _site_packages(venv_dir: Path) -> list[Path]:
+    return sorted(venv_dir.glob("lib/python*/site-packages"))
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    # N.B.: Forking a process with threads (e.g.: the log queue listener) can deadlock the child; so
+    # workers come from a fork server, which has no threads to inherit. This is what `compileall`
+    # does too.
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("forkserver"))
+
+
+def install_import_trace_hook(venv_dir: Path) -> None:
+    """Has the venv record the modules each run of its Python imports to `IMPORT_TRACE`.
+
+    Later venvs compiled in "hot" mode compile just the modules in that trace. The hook costs every
+    process the venv runs some work at exit; so only venvs compiled in "hot" mode get it.
+    """
+    for site_packages in _site_packages(venv_dir):
+        (site_packages / f"{_TRACE_HOOK_MODULE}.py").write_text(_TRACE_HOOK)
+        (site_packages / f"{_TRACE_HOOK_MODULE}.pth").write_text(f"import {_TRACE_HOOK_MODULE}\n")
+
+
+def compile_all(venv_dir: Path) -> None:
+    """Compiles every module in the venv's site-packages using a process per core."""
+    for site_packages in _site_packages(venv_dir):
+        # N.B.: workers=0 means use os.cpu_count() processes, which `compileall` starts with a fork
+        # server where available.
+        if not compileall.compile_dir(site_packages, quiet=1, workers=0):
+            log.warning(f"Some modules in {site_packages} failed to compile.")
+
+
+def import_trace(venv_dir: Path) -> list[PurePath]:
+    """Returns the site-packages relative paths of the modules runs of a venv have imported."""
+    try:
+        recorded = (venv_dir / IMPORT_TRACE).read_text().splitlines()
+    except FileNotFoundError:
+        return []
+    site_packages_dirs = [os.path.realpath(path) for path in _site_packages(venv_dir)]
+    modules = []
+    for path in recorded:
+        real_path = os.path.realpath(path)
+        for site_packages in site_packages_dirs:
+            if real_path.startswith(f"{site_packages}{os.sep}"):
+                modules.append(PurePath(os.path.relpath(real_path, site_packages)))
+                break
+    return modules
+
+
+def _compile_file(source: Path) -> bool:
+    try:
+        py_compile.compile(
+            str(source), cfile=importlib.util.cache_from_source(str(source)), doraise=True
+        )
+        return True
+    except py_compile.PyCompileError as e:
+        log.warning(f"Failed to compile {source}: {e.msg}")
+        return False
+
+
+def compile_hot(venv_dir: Path, trace_venv_dir: Path) -> int:
+    """Compiles only the modules `trace_venv_dir` has imported and returns how many there were.
+
+    Everything else is left for CPython to compile lazily on first import.
+    """
+    trace = import_trace(trace_venv_dir)
+    sources = [
+        site_packages / module
+        for site_packages in _site_packages(venv_dir)
+        for module in trace
+        if (site_packages / module).is_file()
+    ]
+    if sources:
+        with _process_pool() as executor:
+            list(executor.map(_compile_file, sources, chunksize=64))
+    return len(sources)
+
+
+def find_trace_venv(venvs_dir: Path, exclude: Path) -> Path | None:
+    """Returns the sibling venv with the most recently recorded import trace, if any."""
+    traces = [
+        venv / IMPORT_TRACE
+        for venv in venvs_dir.iterdir()
+        if venv.is_dir() and venv != exclude and (venv / IMPORT_TRACE).is_file()
+    ]
+    trace = max(traces, key=lambda path: path.stat().st_mtime, default=None)
+    return trace.parent if trace else None
+
+
+def compile_venv(venv_dir: Path, mode: str) -> None:
+    if mode == "none":
+        return
+    if mode == "hot":
+        install_import_trace_hook(venv_dir)
+        trace_venv_dir = find_trace_venv(venv_dir.parent, exclude=venv_dir)
+        if trace_venv_dir:
+            count = compile_hot(venv_dir, trace_venv_dir)
+            log.info(f"Compiled {count} hot modules in {venv_dir} traced from {trace_venv_dir}.")
+            return
+        log.info(f"No import trace is available for {venv_dir}; compiling all modules.")
+    compile_all(venv_dir)
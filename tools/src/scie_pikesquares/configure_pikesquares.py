@@ -4,29 +4,28 @@ import os
 import pwd
 import sys
 import subprocess
-import shutil
 #import subprocess
 from argparse import ArgumentParser
 from pathlib import Path
-from typing import NoReturn
+from functools import cache
+from typing import Any, NoReturn
 
-import questionary
-
-from tinydb import TinyDB, Query
-import platformdirs 
-from packaging.version import Version
-
-from scie_pikesquares.log import fatal, info, init_logging, warn, debug
+from scie_pikesquares.bindings_daemon import delegating
+from scie_pikesquares.lazy import lazy_import
+from scie_pikesquares.log import fatal, info, init_logging, span, warn, debug
+from scie_pikesquares.metadata_cache import MetadataCache
 from scie_pikesquares.pikesquares_version import (
     ResolveInfo,
     determine_latest_stable_version,
     #determine_tag_version,
 )
 from scie_pikesquares.ptex import Ptex
+from scie_pikesquares.uwsgi_build import BuildCache, UWSGIBuildError, build_uwsgi
 
-
-class UWSGIBuildError(Exception):
-    pass
+packaging_version = lazy_import("packaging.version")
+platformdirs = lazy_import("platformdirs")
+questionary = lazy_import("questionary")
+tinydb = lazy_import("tinydb")
 
 
 def prompt(message: str, default: bool) -> bool:
@@ -58,22 +57,24 @@ def prompt_for_localdev_dir() -> Path | None:
 
 """
 
-custom_style_dope = questionary.Style(
-    [
-        ("separator", "fg:#6C6C6C"),
-        ("qmark", "fg:#FF9D00 bold"),
-        ("question", ""),
-        ("selected", "fg:#5F819D"),
-        ("pointer", "fg:#FF9D00 bold"),
-        ("answer", "fg:#5F819D bold"),
-    ]
-)
+@cache
+def custom_style_dope() -> Any:
+    return questionary.Style(
+        [
+            ("separator", "fg:#6C6C6C"),
+            ("qmark", "fg:#FF9D00 bold"),
+            ("question", ""),
+            ("selected", "fg:#5F819D"),
+            ("pointer", "fg:#FF9D00 bold"),
+            ("answer", "fg:#5F819D bold"),
+        ]
+    )
 
 def get_latest_config(db_path):
     if (db_path).exists():
-        with TinyDB(db_path) as db:
+        with tinydb.TinyDB(db_path) as db:
             return db.table("configs").get(
-                Query().version == max([c.get('version') for c in db.table("configs").all()])
+                tinydb.Query().version == max([c.get('version') for c in db.table("configs").all()])
             )[0]
 
 def init_submodules():
@@ -101,67 +102,43 @@ def init_submodules():
     print(compl.stderr.decode())
     print(compl.stdout.decode())
 
-def build_plugin(plugin:str, python_bin: Path, plugins_dir: Path):
-    plugin_name = plugin
-    if plugin == "python":
-        py_version = "312"
-        plugin_name = f"python{py_version}"
-    
-    try:
-        compl = subprocess.run(
-            f"{python_bin.resolve()} ./uwsgiconfig.py --plugin plugins/{plugin} pikesquares {plugin_name}",
-            env=os.environ,
-            shell=True,
-            cwd=Path.cwd() / "uwsgi",
-            capture_output=True,
-            check=True,
-        )
-    except subprocess.CalledProcessError as cperr:
-        print(f"failed to build uWSGI plugin '{plugin}': {cperr.stderr.decode()}")
-        return
-
-    if compl.returncode != 0:
-        print(f"unable to build uWSGI plugin '{plugin}'")
 
-    print(compl.stderr.decode())
-    print(compl.stdout.decode())
-
-    dest = Path(f"uwsgi/{plugin_name}_plugin.so").resolve()
-    src = (Path(plugins_dir) / f"{plugin_name}_plugin.so").resolve()
-    try:
-        src.symlink_to(dest)
-    except FileExistsError:
-        pass
+def build_localdev_uwsgi(data_dir: Path, plugins_dir: Path) -> None:
+    """Builds uWSGI and its plugins from the uwsgi submodule of a scie-pikesquares checkout.
 
+    This only applies when configuring from the root of a checkout with its submodules initialized;
+    otherwise the uWSGI the scie ships is used.
+    """
+    uwsgi_dir = Path("uwsgi")
+    buildconf = Path("pikesquares.ini")
+    if not (uwsgi_dir / "uwsgiconfig.py").exists() or not buildconf.exists():
+        debug(f"No uWSGI checkout found in {Path.cwd()}; using the uWSGI the scie ships.")
+        return
 
-def build_uwsgi(python_bin: Path):
-    shutil.copy(Path("pikesquares.ini"), Path("uwsgi/buildconf/pikesquares.ini"))
+    python_bin = Path(os.environ.get("PIKESQUARES_PYTHON_BIN") or "/usr/bin/python3")
+    if not python_bin.exists():
+        warn(f"Cannot locate python at {python_bin} to build uWSGI with; skipping the build.")
+        return
     try:
-        compl = subprocess.run(
-            f"{python_bin.resolve()} ./uwsgiconfig.py --build pikesquares",
-            env=os.environ,
-            shell=True,
-            cwd=Path.cwd() / "uwsgi",
-            capture_output=True,
-            check=True,
+        build_uwsgi(
+            uwsgi_dir=uwsgi_dir,
+            python_bin=python_bin,
+            buildconf=buildconf,
+            plugins_dir=plugins_dir,
+            cache=BuildCache(data_dir / "uwsgi_build_cache"),
         )
-    except subprocess.CalledProcessError as cperr:
-        print(f"failed to build uWSGI binary: {cperr.stderr.decode()}")
-        return
-
-    if compl.returncode != 0:
-        print("unable to build uWSGI binary")
-
-    print(compl.stderr.decode())
-    print(compl.stdout.decode())
-
+    except (UWSGIBuildError, OSError, subprocess.CalledProcessError) as e:
+        warn(f"Failed to build uWSGI from {uwsgi_dir.resolve()}: {e}")
 
 
+@delegating("configure-pikesquares")
 def main() -> NoReturn:
     parser = ArgumentParser()
     get_ptex = Ptex.add_options(parser)
     parser.add_argument("--pikesquares-version", help="The PikeSquares version to install")
-    parser.add_argument("base_dir", nargs=1, help="The base directory to create PikeSquares venvs in.")
+    parser.add_argument(
+        "base_dir", nargs=1, help="The base directory to create PikeSquares venvs in."
+    )
     options = parser.parse_args()
 
     base_dir = Path(options.base_dir[0])
@@ -290,42 +267,34 @@ def main() -> NoReturn:
 
     if options.pikesquares_version and "dev" in options.pikesquares_version:
         debug(f"configuring PikeSquares v{options.pikesquares_version} for Local Development ")
-        resolve_info = ResolveInfo(stable_version=Version(options.pikesquares_version), sha_version=None)
+        resolve_info = ResolveInfo(
+            stable_version=packaging_version.Version(options.pikesquares_version), sha_version=None
+        )
 
         localdev_dir_in_parent = None
         if (Path.cwd().parent / "pikesquares").exists():
             localdev_dir_in_parent = Path.cwd().parent / "pikesquares"
 
-        localdev_dir = questionary.path(
-            "Provide the path to local repo of PikeSquares: ", 
-            default=str(localdev_dir_in_parent) or os.getcwd(),
-            only_directories=True,
-            style=custom_style_dope,
-        ).ask()
+        # N.B.: Timed separately so that time spent waiting on the user can be told apart.
+        with span("prompt_localdev_dir"):
+            localdev_dir = questionary.path(
+                "Provide the path to local repo of PikeSquares: ", 
+                default=str(localdev_dir_in_parent) or os.getcwd(),
+                only_directories=True,
+                style=custom_style_dope(),
+            ).ask()
 
         if not localdev_dir:
             warn("could not read the PikeSquares local dev directory. exiting.")
             sys.exit(1)
 
-        if 0:
-            uwsgi_dir = Path("uwsgi")
-            if not uwsgi_dir.exists():
-                init_submodules()
-                print("unable to init git submodules")
-                #python_bin = os.environ.get('PIKESQUARES_PYTHON_BIN')
-                python_bin = Path("/usr/bin/python3")
-                if not python_bin.exists():
-                    raise UWSGIBuildError(f"cannot locate python at {python_bin}")
-                try:
-                    build_uwsgi(python_bin)
-                    build_plugin("corerouter", python_bin, PLUGINS_DIR)
-                    build_plugin("http", python_bin, PLUGINS_DIR)
-                    build_plugin("python", python_bin, PLUGINS_DIR)
-                    build_plugin("logfile", python_bin, PLUGINS_DIR)
-                except Exception as exc:
-                    raise UWSGIBuildError(f"unable to build uWSGI {str(exc)}")
+        with span("build_uwsgi"):
+            build_localdev_uwsgi(data_dir=DATA_DIR, plugins_dir=PLUGINS_DIR)
     else:
-        resolve_info = determine_latest_stable_version(ptex=get_ptex(options))
+        with span("resolve_version"):
+            resolve_info = determine_latest_stable_version(
+                ptex=get_ptex(options), metadata_cache=MetadataCache.from_base_dir(base_dir)
+            )
 
     version = resolve_info.stable_version
     #process_compose_config = "/home/pk/dev/eqb/pikesquares/process-compose.yml"
@@ -337,7 +306,7 @@ def main() -> NoReturn:
         if localdev_dir:
             print(f"PIKESQUARES_LOCALDEV_DIR={str(localdev_dir)}", file=fp)
     """
-    with TinyDB(DATA_DIR / 'device-db.json') as db:
+    with tinydb.TinyDB(DATA_DIR / 'device-db.json') as db:
         conf_db = db.table('configs')
         conf_db.upsert(
             {
@@ -356,7 +325,7 @@ def main() -> NoReturn:
                 "PKI_DIR": str(DATA_DIR / 'pki'),
                 "version": str(version),
             }, 
-            Query().version == str(version),
+            tinydb.Query().version == str(version),
         )
     """
     sys.exit(0)
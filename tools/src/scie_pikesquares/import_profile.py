@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+IMPORT_TIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<indent>\s*)(?P<module>\S+)$"
+)
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    module: str
+    depth: int
+    cumulative_us: int
+
+
+def profile_imports(module: str) -> list[ImportTime]:
+    """Imports `module` in a fresh interpreter and returns `-X importtime` data for it."""
+    result = subprocess.run(
+        args=[sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    import_times = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            import_times.append(
+                ImportTime(
+                    module=match["module"],
+                    depth=len(match["indent"]) // 2,
+                    cumulative_us=int(match["cumulative"]),
+                )
+            )
+    return import_times
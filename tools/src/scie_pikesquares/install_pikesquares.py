@@ -1,71 +1,160 @@
 from __future__ import annotations
 
+import fcntl
 import logging
 import os
 import json
 import pwd
+import shutil
 #import stat
 import subprocess
 import sys
-import tempfile
+import time
 from argparse import ArgumentParser
+from contextlib import contextmanager
 #from glob import glob
 from pathlib import Path
-from typing import NoReturn
+from typing import TYPE_CHECKING, Iterator, NoReturn
+
+from scie_pikesquares.artifact_cache import ArtifactCache
+from scie_pikesquares.bindings_daemon import delegating
+from scie_pikesquares.bindings_gc import DEFAULT_KEEP, collect, format_bytes, mark_used, parse_size
+from scie_pikesquares.bytecode import COMPILE_MODES, compile_venv
+from scie_pikesquares.lazy import lazy_import
+from scie_pikesquares.log import debug, fatal, info, init_logging, span, warn
+from scie_pikesquares.ptex import Ptex
+from scie_pikesquares.streaming import run_streaming
+from scie_pikesquares.venv_store import collect_garbage, link_into_store
 
-import questionary
-from tinydb import TinyDB, Query
-from packaging.version import Version
-import platformdirs
+if TYPE_CHECKING:
+    from packaging.version import Version
 
-from scie_pikesquares.log import debug, fatal, info, init_logging, warn
-from scie_pikesquares.ptex import Ptex
+packaging_version = lazy_import("packaging.version")
+platformdirs = lazy_import("platformdirs")
+tinydb = lazy_import("tinydb")
 
 log = logging.getLogger(__name__)
 
-custom_style_dope = questionary.Style(
-    [
-        ("separator", "fg:#6C6C6C"),
-        ("qmark", "fg:#FF9D00 bold"),
-        ("question", ""),
-        ("selected", "fg:#5F819D"),
-        ("pointer", "fg:#FF9D00 bold"),
-        ("answer", "fg:#5F819D bold"),
-    ]
-)
+# Written last into a venv installed from a PEX; a venv dir without it holds a partial install.
+INSTALL_COMPLETE_MARKER = ".pikesquares-install-complete"
 
 
-def install_pikesquares_from_pex(
-    venv_dir: Path,
-    prompt: str,
-    version: Version,
-    ptex: Ptex,
-) -> None:
-    """Installs PikeSquares into the venv using the platform-specific pre-built PEX."""
+@contextmanager
+def step(name: str) -> Iterator[None]:
+    """Times a step of the install, in both the install log and the spans log."""
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        log.info(f"Step {name} took {time.perf_counter() - start:.3f}s")
+
+
+def fetch_pikesquares_pex(version: Version, artifact_cache: ArtifactCache) -> Path:
+    """Fetches the platform-specific pre-built PikeSquares PEX."""
     uname = os.uname()
     OS = "macos" if uname.sysname.lower() == "darwin" else "linux"
     pex_name = f"pikesquares-{OS}-{uname.machine.lower()}.pex"
     pex_url = f"https://github.com/EloquentBits/pikesquares/releases/download/{version}/{pex_name}"
 
-    with tempfile.NamedTemporaryFile(suffix=".pex") as pikesquares_pex:
-        ptex.fetch_to_fp(pex_url, pikesquares_pex.file)
-        subprocess.run(
-            args=[
-                sys.executable,
-                pikesquares_pex.name,
-                "venv",
-                "--prompt",
-                prompt,
-                "--compile",
-                "--pip",
-                "--collisions-ok",
-                "--no-emit-warnings",  # Silence `PEXWarning: You asked for --pip ...`
-                "--disable-cache",
-                str(venv_dir),
-            ],
-            env={"PEX_TOOLS": "1"},
-            check=True,
+    # N.B.: Release assets are immutable; so the cached PEX can be re-used across bindings dirs.
+    pikesquares_pex = artifact_cache.fetch(pex_url)
+    # N.B.: No digest is published for the PEX; so check what was fetched is a working PEX (and
+    # not, e.g.: an error page) lest it be served from the cache to every later install.
+    result = subprocess.run(
+        args=[sys.executable, str(pikesquares_pex), "info"],
+        env={"PEX_TOOLS": "1"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        artifact_cache.discard(pex_url)
+        raise ValueError(
+            f"The PikeSquares PEX downloaded from {pex_url} is invalid:\n"
+            f"{result.stderr.decode(errors='replace')}"
         )
+    return pikesquares_pex
+
+
+def install_pikesquares_from_pex(
+    venv_dir: Path,
+    prompt: str,
+    pikesquares_pex: Path,
+) -> None:
+    """Installs PikeSquares into the venv using the platform-specific pre-built PEX."""
+    subprocess.run(
+        args=[
+            sys.executable,
+            str(pikesquares_pex),
+            "venv",
+            "--prompt",
+            prompt,
+            "--pip",
+            "--collisions-ok",
+            "--no-emit-warnings",  # Silence `PEXWarning: You asked for --pip ...`
+            "--disable-cache",
+            str(venv_dir),
+        ],
+        env={"PEX_TOOLS": "1"},
+        check=True,
+    )
+
+def share_venv_files(venv_dir: Path, store_dir: Path) -> None:
+    """Hard links the venv's site-packages into a store shared by all PikeSquares versions."""
+    try:
+        stats = link_into_store(venv_dir, store_dir)
+    except OSError as e:
+        # E.g.: The store and venv are on different devices. The venv is complete either way.
+        warn(f"Failed to share {venv_dir} files via {store_dir}: {e}")
+        return
+    debug(
+        f"Linked {stats.linked} of {stats.files} files in {venv_dir} into {store_dir}, "
+        f"saving {stats.bytes_saved} bytes."
+    )
+    freed = collect_garbage(store_dir)
+    if freed:
+        debug(f"Freed {freed} bytes of unreferenced files from {store_dir}.")
+
+
+def venv_is_complete(venv_dir: Path) -> bool:
+    return (venv_dir / INSTALL_COMPLETE_MARKER).exists()
+
+
+def install_venv_from_pex(
+    version: Version,
+    venv_dir: Path,
+    store_dir: Path,
+    artifact_cache: ArtifactCache,
+    compile_mode: str,
+) -> bool:
+    """Installs PikeSquares into `venv_dir` from its release PEX unless it is already installed.
+
+    Concurrent installs of the same venv (e.g.: a boot racing a prefetch) are serialized; so the
+    later one finds the venv complete. Returns whether an install was performed.
+    """
+    venv_dir.parent.mkdir(parents=True, exist_ok=True)
+    with open(venv_dir.parent / f".{venv_dir.name}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if venv_is_complete(venv_dir):
+            return False
+        if venv_dir.exists():
+            warn(f"Removing the partial PikeSquares {version} install at {venv_dir}.")
+            shutil.rmtree(venv_dir)
+
+        info(f"Installing pikesquares=={version} into a virtual environment at {venv_dir}")
+        with step("pikesquares_pex"):
+            pikesquares_pex = fetch_pikesquares_pex(version, artifact_cache)
+        with step("venv"):
+            install_pikesquares_from_pex(
+                venv_dir=venv_dir, prompt=f"PikeSquares {version}", pikesquares_pex=pikesquares_pex
+            )
+        with step("bytecode"):
+            compile_venv(venv_dir, mode=compile_mode)
+        with step("venv_store"):
+            share_venv_files(venv_dir, store_dir=store_dir)
+        (venv_dir / INSTALL_COMPLETE_MARKER).touch()
+        return True
+
 
 def get_uv_bin_from_lift(platform):
     # uv-macos-x86_64/uv-x86_64-apple-darwin/
@@ -84,11 +173,23 @@ def get_uv_bin_from_lift(platform):
         return uv_bin
 
 
-def install_pyuwsgi_wheel(
-    venv_dir: Path,
-    localdev_dir: Path | None,
-) -> None:
-    pass
+def find_pyuwsgi_wheel(localdev_dir: Path, pyuwsgi_wheel_path: Path | None = None) -> Path:
+    if pyuwsgi_wheel_path and Path(pyuwsgi_wheel_path).exists():
+        return Path(pyuwsgi_wheel_path)
+    return (
+        localdev_dir
+        / "pyuwsgi-2.0.28.post1-cp312-cp312-manylinux_2_17_x86_64.manylinux2014_x86_64.whl"
+    )
+
+
+def get_user_dirs(app_name: str) -> tuple[Path, Path, Path]:
+    """Returns the PikeSquares data, log and config dirs for the current user."""
+    current_user: str = pwd.getpwuid(os.getuid()).pw_name
+    return (
+        platformdirs.user_data_path(app_name, current_user),
+        platformdirs.user_log_path(app_name, current_user),
+        platformdirs.user_config_path(app_name, current_user),
+    )
 
 
 def get_uv_bin():
@@ -107,20 +208,18 @@ def install_pyuwsgi(
     venv_dir: Path,
     localdev_dir: Path,
     pyuwsgi_wheel_path: Path | None = None,
+    uv_bin: Path | None = None,
 ) -> None:
     py_bin = Path(os.environ.get("PIKESQUARES_PYTHON_BIN"))
     if not py_bin.exists():
         fatal(f"unable to locate python @ {py_bin}")
 
-    if pyuwsgi_wheel_path and Path(pyuwsgi_wheel_path).exists():
-        pyuwsgi_wheel = str(pyuwsgi_wheel_path) 
-    else:
-        pyuwsgi_wheel = localdev_dir / "pyuwsgi-2.0.28.post1-cp312-cp312-manylinux_2_17_x86_64.manylinux2014_x86_64.whl"
+    pyuwsgi_wheel = find_pyuwsgi_wheel(localdev_dir, pyuwsgi_wheel_path)
 
     try:
-        compl = subprocess.run(
+        compl = run_streaming(
             args=[
-                str(get_uv_bin()),
+                str(uv_bin or get_uv_bin()),
                 "pip",
                 "install",
                 str(pyuwsgi_wheel),
@@ -131,16 +230,11 @@ def install_pyuwsgi(
                 "UV_PROJECT_ENVIRONMENT": str(venv_dir),
             },
             cwd=localdev_dir if localdev_dir else None,
-            capture_output=True,
-            check=True,
+            label="uv pip install",
             #user="",
         )
-        print(compl.stdout.decode())
         print(" ".join(compl.args))
 
-        if compl.stderr:
-            print(compl.stderr.decode())
-
         #if compl.returncode != 0:
         #    print(compl.stderr.decode())
         #    fatal("unable to install pypuwsgi wheel")
@@ -154,6 +248,7 @@ def install_pyuwsgi(
 def install_pikesquares_localdev(
     venv_dir: Path,
     localdev_dir: Path | None,
+    uv_bin: Path | None = None,
 ) -> None:
 
     py_bin = Path(os.environ.get("PIKESQUARES_PYTHON_BIN"))
@@ -162,9 +257,9 @@ def install_pikesquares_localdev(
         return
 
     try:
-        compl = subprocess.run(
+        compl = run_streaming(
             args=[
-                str(get_uv_bin()),
+                str(uv_bin or get_uv_bin()),
                 'sync',
                 "--verbose",
             ],
@@ -172,15 +267,10 @@ def install_pikesquares_localdev(
                 "UV_PROJECT_ENVIRONMENT": str(venv_dir),
             },
             cwd=localdev_dir if localdev_dir else None,
-            capture_output=True,
-            check=True,
+            label="uv sync",
             #user="",
         )
-        print(compl.stdout.decode())
-        print(compl)
         print(" ".join(compl.args))
-        if compl.stderr:
-            print(compl.stderr.decode())
         #if compl.returncode != 0:
         #    print(compl.stderr.decode())
         #    fatal("unable to install deps")
@@ -202,15 +292,51 @@ def install_pikesquares_localdev(
     #    uv_add_pikesquares_editable(venv_dir, uv_bin, py_bin, localdev_dir)
 
 
+def auto_gc(base_dir: Path, current_version: str) -> None:
+    """Prunes the bindings dir per the PIKESQUARES_GC_* settings now that an install is done."""
+    try:
+        max_bytes = os.environ.get("PIKESQUARES_GC_MAX_BYTES")
+        with step("gc"):
+            report = collect(
+                base_dir,
+                keep=int(os.environ.get("PIKESQUARES_GC_KEEP") or DEFAULT_KEEP),
+                max_bytes=parse_size(max_bytes) if max_bytes else None,
+                protected_versions=[current_version],
+                scie=Path(os.environ["SCIE"]) if os.environ.get("SCIE") else None,
+            )
+    except (OSError, ValueError) as e:
+        # N.B.: The install itself succeeded; a failed cleanup must not fail the boot.
+        warn(f"Failed to garbage collect {base_dir}: {e}")
+        return
+    if report.removed:
+        info(f"Freed {format_bytes(report.freed)} from {base_dir}.")
+
+
+@delegating("install-pikesquares")
 def main() -> NoReturn:
     parser = ArgumentParser()
     get_ptex = Ptex.add_options(parser)
     parser.add_argument(
-        "--pikesquares-version", type=Version, required=True, help="The PikeSquares version to install"
+        "--pikesquares-version",
+        type=packaging_version.Version,
+        required=True,
+        help="The PikeSquares version to install",
     )
     parser.add_argument("--debug", type=bool, help="Install with debug capabilities.")
     parser.add_argument("--localdev-dir", type=str, help="PikeSquares repo as editable install.")
-    parser.add_argument("base_dir", nargs=1, help="The base directory to create PikeSquares venvs in.")
+    parser.add_argument(
+        "--compile-mode",
+        choices=COMPILE_MODES,
+        default=os.environ.get("PIKESQUARES_COMPILE_MODE") or "all",
+        help=(
+            "How to byte-compile the venv: `all` modules in parallel, only the `hot` modules a "
+            "previously used venv imported, or `none`. In `hot` mode, the venv also records the "
+            "modules its processes import as they exit, for later installs to compile."
+        ),
+    )
+    parser.add_argument(
+        "base_dir", nargs=1, help="The base directory to create PikeSquares venvs in."
+    )
     options = parser.parse_args()
 
     ptex = get_ptex(options)
@@ -231,43 +357,48 @@ def main() -> NoReturn:
 
     APP_NAME="pikesquares"
     venv_dir = venvs_dir / str(version)
-    current_user: str = pwd.getpwuid(os.getuid()).pw_name
-    data_dir = platformdirs.user_data_path(APP_NAME, current_user)
-    log_dir = platformdirs.user_log_path(APP_NAME, current_user)
-    config_dir = platformdirs.user_config_path(APP_NAME, current_user)
+
+    data_dir, log_dir, config_dir = get_user_dirs(APP_NAME)
 
     #if "dev" in str(version):
     #    localdev_dir = os.environ.get("PIKESQUARES_LOCALDEV_DIR")
+    installed = True
     if options.localdev_dir and Path(options.localdev_dir).exists():
-        install_pikesquares_localdev(
-            venv_dir=venv_dir,
-            localdev_dir=Path(options.localdev_dir)
-        )
-        install_pyuwsgi(
-            venv_dir=venv_dir,
-            localdev_dir=Path(options.localdev_dir)
-        )
-
+        localdev_dir = Path(options.localdev_dir)
+        uv_bin = get_uv_bin()
+        with step("uv_sync"):
+            install_pikesquares_localdev(
+                venv_dir=venv_dir, localdev_dir=localdev_dir, uv_bin=uv_bin
+            )
+        with step("pyuwsgi"):
+            install_pyuwsgi(venv_dir=venv_dir, localdev_dir=localdev_dir, uv_bin=uv_bin)
+        with step("bytecode"):
+            compile_venv(venv_dir, mode=options.compile_mode)
     else:
-        install_pikesquares_from_pex(
-            venv_dir=venv_dir,
-            prompt=f"PikeSquares {version}",
-            version=version,
-            ptex=ptex,
-        )
-        info(
-            f"Installing pikesquares=={version} into a virtual environment at {venv_dir}"
-        )
-    info(f"New virtual environment successfully created at {venv_dir}")
+        artifact_cache = ArtifactCache.from_env(ptex)
+        with step("pikesquares_venv"):
+            installed = install_venv_from_pex(
+                version,
+                venv_dir=venv_dir,
+                store_dir=base_dir / "venv_store",
+                artifact_cache=artifact_cache,
+                compile_mode=options.compile_mode,
+            )
+    if installed:
+        info(f"New virtual environment successfully created at {venv_dir}")
+    else:
+        info(f"Using the already installed virtual environment at {venv_dir}")
 
     # pyuwsgi_bin = venv_dir / "bin" / "pyuwsgi"
     # if not (pyuwsgi_bin).exists():
     #    fatal(f"could not locate pyuwsgi @ {str(pyuwsgi_bin)}")
 
     uwsgi_bin = venv_dir / "bin" / "uwsgi"
-    if not (uwsgi_bin).exists():
-        fatal(f"could not locate uWSGI binary @ {str(uwsgi_bin)}")
+    with step("verify_uwsgi"):
+        if not (uwsgi_bin).exists():
+            fatal(f"could not locate uWSGI binary @ {str(uwsgi_bin)}")
 
+    mark_used(venv_dir)
     pikesquares_server_exe = str(venv_dir / "bin" / "pikesquares")
 
     with open(env_file, "a") as fp:
@@ -279,14 +410,17 @@ def main() -> NoReturn:
         print(f"PIKESQUARES_CONFIG_DIR={config_dir}", file=fp)
         print(f"PIKESQUARES_VERSION={version}", file=fp)
 
+    if os.environ.get("PIKESQUARES_AUTO_GC"):
+        auto_gc(base_dir, current_version=str(version))
+
     """
-    with TinyDB(data_dir / "device-db.json") as db:
+    with tinydb.TinyDB(data_dir / "device-db.json") as db:
         conf_db = db.table('configs')
         conf_db.upsert(
             {
                 'VIRTUAL_ENV': str(venv_dir),
             },
-            Query().version == str(version),
+            tinydb.Query().version == str(version),
         )
     """
 
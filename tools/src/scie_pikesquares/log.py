@@ -1,11 +1,79 @@
+from __future__ import annotations
+
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from textwrap import dedent
-from typing import NoReturn
+from typing import Iterator, NoReturn
+
+from scie_pikesquares.lazy import lazy_import
+
+colors = lazy_import("colors")
+logging_handlers = lazy_import("logging.handlers")
+
+# Spans are small and written rarely; so a single backup of this size holds many boots worth.
+SPANS_MAX_BYTES = 1_000_000
+
+# Enough to absorb a burst of verbose subprocess output while the log file is slow to write (or
+# rotating) without letting a stalled disk grow memory without bound.
+LOG_QUEUE_SIZE = 10_000
+
+_spans_file: Path | None = None
+_spans_lock = threading.Lock()
+_tool: str | None = None
+_run: str | None = None
+_failed = False
+
+
+class _LogQueue(queue.Queue):
+    """A bounded queue of log records that sheds DEBUG and INFO records instead of blocking.
+
+    Warnings and worse (and the listener's stop sentinel) are never dropped; they wait for room.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        super().__init__(maxsize=maxsize)
+        self.dropped = 0
+
+    def put_nowait(self, record: logging.LogRecord | None) -> None:
+        if record is None or record.levelno >= logging.WARNING:
+            self.put(record)
+            return
+        try:
+            super().put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# The queue handler on the root logger, the listener writing its records and their queue.
+_log_pipeline: tuple[logging.Handler, logging.handlers.QueueListener, _LogQueue] | None = None
 
-from colors import green, red, yellow
+
+def flush() -> None:
+    """Waits for all queued log records to be written and reverts to logging synchronously."""
+    global _log_pipeline
+
+    if _log_pipeline is None:
+        return
+    queue_handler, listener, log_queue = _log_pipeline
+    _log_pipeline = None
+    listener.stop()
+    # N.B.: Anything logged after this (e.g.: by later atexit hooks) goes straight to the file.
+    logging.root.removeHandler(queue_handler)
+    for handler in listener.handlers:
+        logging.root.addHandler(handler)
+    if log_queue.dropped:
+        logging.warning(
+            f"Dropped {log_queue.dropped} DEBUG and INFO log records while the log file fell "
+            "behind."
+        )
 
 
 def _log(message: str) -> None:
@@ -18,22 +86,97 @@ def debug(message: str) -> None:
 
 def info(message: str) -> None:
     logging.info(message)
-    _log(green(message))
+    _log(colors.green(message))
 
 
 def warn(message: str) -> None:
     logging.warning(message)
-    _log(yellow(message))
+    _log(colors.yellow(message))
 
 
 def fatal(message: str) -> NoReturn:
+    global _failed
+    _failed = True
     logging.critical(message)
-    sys.exit(red(message))
+    flush()
+    sys.exit(colors.red(message))
 
 
 def exception(message: str, exc_info=None) -> NoReturn:
+    global _failed
+    _failed = True
     logging.exception(message, exc_info=exc_info)
-    sys.exit(red(message))
+    flush()
+    sys.exit(colors.red(message))
+
+
+def spans_file(base_dir: Path) -> Path:
+    return base_dir / "logs" / "spans.jsonl"
+
+
+def _record_span(name: str, start: float, secs: float, ok: bool) -> None:
+    if _spans_file is None:
+        return
+    line = json.dumps(
+        {"run": _run, "tool": _tool, "span": name, "start": start, "secs": secs, "ok": ok}
+    )
+    with _spans_lock, open(_spans_file, "a") as fp:
+        print(line, file=fp)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the enclosed block, recording it as a JSON line in the spans log.
+
+    Nothing is recorded until `init_logging` has been called.
+    """
+    start = time.time()
+    perf_start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    except SystemExit as e:
+        ok = not e.code
+        raise
+    finally:
+        _record_span(name, start=start, secs=time.perf_counter() - perf_start, ok=ok)
+
+
+def _init_spans(base_dir: Path, log_name: str) -> None:
+    global _spans_file, _tool, _run
+
+    _spans_file = spans_file(base_dir)
+    try:
+        if _spans_file.stat().st_size > SPANS_MAX_BYTES:
+            os.replace(_spans_file, _spans_file.with_suffix(".jsonl.1"))
+    except FileNotFoundError:
+        pass
+    _tool = log_name
+    start = time.time()
+    perf_start = time.perf_counter()
+    _run = f"{log_name}-{os.getpid()}-{start:.6f}"
+    # N.B.: An atexit hook cannot see the exit code; so the total span is only marked failed for
+    # exits via `fatal` or the excepthook.
+    atexit.register(
+        lambda: _record_span(
+            "total", start=start, secs=time.perf_counter() - perf_start, ok=not _failed
+        )
+    )
+
+
+def _start_log_pipeline(handler: logging.Handler) -> None:
+    global _log_pipeline
+
+    # N.B.: Records are handed to a background thread to format and write; so bootstrap steps never
+    # wait on the disk (or on log rotation) to make progress.
+    log_queue = _LogQueue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = logging_handlers.QueueHandler(log_queue)
+    listener = logging_handlers.QueueListener(log_queue, handler)
+    logging.root.addHandler(queue_handler)
+    listener.start()
+    _log_pipeline = queue_handler, listener, log_queue
+    atexit.register(flush)
 
 
 def init_logging(base_dir: Path, log_name: str):
@@ -44,11 +187,14 @@ def init_logging(base_dir: Path, log_name: str):
 
     # This gets us ~5MB of logs max per version of scie-pants (since we're writing these under the
     # scie.bindings dir which is keyed to our lift manifest hash).
-    debug_handler = RotatingFileHandler(filename=log_file, maxBytes=1_000_000, backupCount=4)
+    debug_handler = logging_handlers.RotatingFileHandler(
+        filename=log_file, maxBytes=1_000_000, backupCount=4
+    )
     debug_handler.setFormatter(
         logging.Formatter(fmt="{asctime} {levelname}] {name}: {message}", style="{")
     )
-    logging.root.addHandler(debug_handler)
+    _start_log_pipeline(debug_handler)
+    _init_spans(base_dir, log_name)
 
     sys.excepthook = lambda exc_type, exc, tb: exception(
         dedent(
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Any
+
+from scie_pikesquares.log import warn
+from scie_pikesquares.ptex import HTTPStatusError, Ptex
+
+log = logging.getLogger(__name__)
+
+# Release metadata changes at most a few times a week; a short TTL is enough to collapse the
+# configure / install / update lookups of a single boot (or a fleet-wide rollout) into one request.
+DEFAULT_TTL_SECS = 5 * 60
+
+
+def _parse_ttl(value: str) -> float:
+    try:
+        ttl = float(value)
+    except ValueError:
+        ttl = math.nan
+    if not math.isfinite(ttl) or ttl < 0:
+        # N.B.: The cache only saves requests; so a bad setting is no reason to fail the boot.
+        warn(
+            f"Ignoring PIKESQUARES_METADATA_TTL={value!r}; it must be a number of seconds >= 0. "
+            f"Using the default of {DEFAULT_TTL_SECS} seconds."
+        )
+        return DEFAULT_TTL_SECS
+    return ttl
+
+
+@dataclass(frozen=True)
+class _Entry:
+    url: str
+    fetched_at: float
+    body: str
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+@dataclass(frozen=True)
+class MetadataCache:
+    """Caches JSON documents fetched from mutable URLs like GitHub release listings.
+
+    Within the TTL the stored document is served without any request at all. After that the
+    document is re-validated with a conditional request using the validators the server issued
+    (`ETag` and `Last-Modified`) and the stored body is served on a `304 Not Modified`, which
+    GitHub does not count against API rate limits. Without validators, the document is re-fetched.
+    """
+
+    @classmethod
+    def from_base_dir(cls, base_dir: Path) -> MetadataCache:
+        ttl = os.environ.get("PIKESQUARES_METADATA_TTL")
+        return cls(
+            cache_dir=base_dir / "metadata_cache",
+            ttl=_parse_ttl(ttl) if ttl else DEFAULT_TTL_SECS,
+        )
+
+    cache_dir: Path
+    ttl: float = DEFAULT_TTL_SECS
+
+    def _entry_path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def _load(self, url: str) -> _Entry | None:
+        try:
+            with self._entry_path(url).open() as fp:
+                entry = _Entry(**json.load(fp))
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry if entry.url == url else None
+
+    def _store(self, entry: _Entry) -> None:
+        entry_path = self._entry_path(entry.url)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=entry_path.parent, prefix=f".{entry_path.name}.", delete=False
+        ) as fp:
+            json.dump(asdict(entry), fp)
+        os.replace(fp.name, entry_path)
+
+    def fetch_json(self, ptex: Ptex, url: str, **headers: str) -> Any:
+        now = time.time()
+        entry = self._load(url)
+        if entry and now - entry.fetched_at < self.ttl:
+            log.debug(f"Using metadata for {url} cached {now - entry.fetched_at:.0f}s ago.")
+            return json.loads(entry.body)
+
+        try:
+            response = ptex.fetch_conditional(
+                url,
+                # N.B.: Only validators the server issued are sent back. Our own clock says nothing
+                # reliable about the server's modification times; a date made up from it can
+                # wrongly get a `304` for a document that changed.
+                etag=entry.etag if entry else None,
+                last_modified=entry.last_modified if entry else None,
+                **headers,
+            )
+        except (CalledProcessError, OSError) as e:
+            # N.B.: A server that is overloaded or rate limiting us asked to be retried; so that is
+            # left to the caller rather than hidden behind the stale copy.
+            if not entry or (isinstance(e, HTTPStatusError) and e.transient):
+                raise
+            log.warning(f"Failed to re-validate {url}, using the stale cached copy: {e}")
+            return json.loads(entry.body)
+
+        if response.body is None:
+            assert entry is not None
+            log.debug(f"The metadata for {url} was not modified.")
+            entry = _Entry(
+                url=url,
+                fetched_at=now,
+                body=entry.body,
+                etag=response.etag or entry.etag,
+                last_modified=response.last_modified or entry.last_modified,
+            )
+        else:
+            entry = _Entry(
+                url=url,
+                fetched_at=now,
+                body=response.body.decode(),
+                etag=response.etag,
+                last_modified=response.last_modified,
+            )
+        document = json.loads(entry.body)
+        self._store(entry)
+        return document
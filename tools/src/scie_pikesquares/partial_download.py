@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import Any, Iterator
+
+from scie_pikesquares.ptex import (
+    CHUNK_SIZE,
+    FingerprintMismatchError,
+    HTTPStatusError,
+    Ptex,
+    file_sha256,
+)
+
+log = logging.getLogger(__name__)
+
+# The number of times a download is resumed after the connection drops before giving up.
+DEFAULT_ATTEMPTS = 3
+
+# A resumed download re-fetches this much of what it already has and checks it matches; so a
+# server that ignores the Range header (sending the whole file again) or content that changed
+# underneath us is detected before anything is appended.
+RESUME_OVERLAP = CHUNK_SIZE
+
+# Smaller downloads are not worth splitting into concurrently fetched segments.
+SEGMENTED_MIN_BYTES = 16 << 20
+
+# How much a segment downloads between saves of its progress.
+_CHECKPOINT_BYTES = 4 << 20
+
+
+class _RangesUnsupportedError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class PartialDownload:
+    """A download of `url` to `dest` that can be resumed should it be interrupted.
+
+    The content is saved to `.{dest}.partial` as it arrives, with the URL, expected digest and
+    progress recorded alongside in `.{dest}.partial.json`; a later fetch of the same content picks
+    up where the last one stopped using HTTP Range requests. Fetches of the same download take
+    turns via a lock on `.{dest}.partial.lock`. Only complete, verified content is ever moved to
+    `dest`.
+    """
+
+    dest: Path
+    url: str
+    expected_sha256: str | None = None
+    expected_size: int | None = None
+
+    @property
+    def path(self) -> Path:
+        return self.dest.with_name(f".{self.dest.name}.partial")
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.path.with_name(f"{self.path.name}.json")
+
+    def _load_meta(self) -> dict[str, Any] | None:
+        try:
+            with self._meta_path.open() as fp:
+                meta = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if (meta.get("url"), meta.get("sha256"), meta.get("size")) != (
+            self.url,
+            self.expected_sha256,
+            self.expected_size,
+        ):
+            return None
+        return meta
+
+    def _save_meta(self, segments: list[list[int]] | None) -> None:
+        tmp = self._meta_path.with_name(f"{self._meta_path.name}.{threading.get_ident()}")
+        with tmp.open("w") as fp:
+            json.dump(
+                {
+                    "url": self.url,
+                    "sha256": self.expected_sha256,
+                    "size": self.expected_size,
+                    "segments": segments,
+                },
+                fp,
+            )
+        os.replace(tmp, self._meta_path)
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.path.with_name(f"{self.path.name}.lock")
+
+    def _lock(self) -> int:
+        """Blocks until this process holds the download's lock and returns the locked fd."""
+        while True:
+            fd = os.open(self._lock_path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # N.B.: The lock file is removed once the download completes; so a waiter can wake
+                # holding the lock on a file that is gone, and must then lock the current one.
+                lock_stat = os.fstat(fd)
+                path_stat = os.stat(self._lock_path)
+                if (lock_stat.st_dev, lock_stat.st_ino) == (path_stat.st_dev, path_stat.st_ino):
+                    return fd
+            except FileNotFoundError:
+                pass
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def _discard(self) -> None:
+        # N.B.: Only call this holding the lock; the partial is only ever open under it.
+        self.path.unlink(missing_ok=True)
+        self._meta_path.unlink(missing_ok=True)
+        self._lock_path.unlink(missing_ok=True)
+
+    def fetch(
+        self, ptex: Ptex, segments: int = 1, attempts: int = DEFAULT_ATTEMPTS, **headers: str
+    ) -> str:
+        """Completes the download, resuming any progress saved by an earlier fetch.
+
+        If `segments` is more than 1 and the download is large and of known size and digest, it is
+        split into that many ranges fetched concurrently. Returns the sha256 of the content once
+        `dest` holds it, verified against the expected digest and size when given.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # N.B.: Concurrent fetches of the same download wait their turn rather than clobber each
+        # other's progress.
+        lock_fd = self._lock()
+        try:
+            if self.dest.exists():
+                # N.B.: Another fetch completed the download while this one waited for the lock.
+                sha256 = self.expected_sha256 or file_sha256(self.dest)
+            else:
+                sha256 = self._fetch_locked(ptex, segments, attempts, **headers)
+            # N.B.: This happens under the lock so that waiters find `dest` rather than resuming
+            # an already completed download.
+            self._lock_path.unlink(missing_ok=True)
+        finally:
+            os.close(lock_fd)
+        return sha256
+
+    def _fetch_locked(self, ptex: Ptex, segments: int, attempts: int, **headers: str) -> str:
+        segmented = (
+            segments > 1
+            and self.expected_sha256 is not None
+            and self.expected_size is not None
+            and self.expected_size >= SEGMENTED_MIN_BYTES
+        )
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            for attempt in range(1, attempts + 1):
+                try:
+                    if segmented:
+                        try:
+                            sha256 = self._fetch_segmented(fd, ptex, segments, **headers)
+                        except _RangesUnsupportedError:
+                            log.info(f"{self.url} does not support ranges; fetching it whole.")
+                            segmented = False
+                            os.ftruncate(fd, 0)
+                            sha256 = self._fetch_stream(fd, ptex, **headers)
+                    else:
+                        sha256 = self._fetch_stream(fd, ptex, **headers)
+                    break
+                except FingerprintMismatchError:
+                    self._discard()
+                    raise
+                except (CalledProcessError, OSError) as e:
+                    # N.B.: Retrying won't make a missing or forbidden URL appear.
+                    if attempt == attempts or (isinstance(e, HTTPStatusError) and not e.transient):
+                        raise
+                    # N.B.: The jitter keeps many hosts that failed together from retrying together.
+                    delay = round(2 ** (attempt - 1) * random.uniform(0.5, 1.5), 1)
+                    log.warning(
+                        f"Fetching {self.url} was interrupted ({e}); resuming in {delay}s "
+                        f"(attempt {attempt + 1} of {attempts})."
+                    )
+                    time.sleep(delay)
+            os.fsync(fd)
+            os.replace(self.path, self.dest)
+            self._meta_path.unlink(missing_ok=True)
+        finally:
+            os.close(fd)
+        return sha256
+
+    def _expected(self) -> str:
+        return self.expected_sha256 or f"{self.expected_size} bytes"
+
+    def _check_size(self, size: int) -> None:
+        if self.expected_size is not None and size > self.expected_size:
+            raise FingerprintMismatchError(self.url, self._expected(), actual_sha256=None)
+
+    def _verify(self, digest: Any, size: int) -> str:
+        if self.expected_size is not None and size < self.expected_size:
+            # N.B.: Not a mismatch: the connection dropped without an error; so keep what we have.
+            raise OSError(
+                f"The download of {self.url} ended early at byte {size} of {self.expected_size}."
+            )
+        actual_sha256 = digest.hexdigest()
+        if (self.expected_sha256 and self.expected_sha256 != actual_sha256) or (
+            self.expected_size is not None and size != self.expected_size
+        ):
+            raise FingerprintMismatchError(self.url, self._expected(), actual_sha256)
+        return actual_sha256
+
+    @staticmethod
+    def _hash_prefix(fd: int, size: int) -> Any:
+        digest = hashlib.sha256()
+        offset = 0
+        while offset < size:
+            chunk = os.pread(fd, min(CHUNK_SIZE, size - offset), offset)
+            if not chunk:
+                break
+            digest.update(chunk)
+            offset += len(chunk)
+        return digest
+
+    def _fetch_stream(self, fd: int, ptex: Ptex, **headers: str) -> str:
+        meta = self._load_meta()
+        if meta is None or meta.get("segments") is not None:
+            os.ftruncate(fd, 0)
+            self._save_meta(segments=None)
+        offset = os.fstat(fd).st_size
+        if self.expected_size is not None and offset > self.expected_size:
+            os.ftruncate(fd, 0)
+            offset = 0
+
+        if offset:
+            log.info(f"Resuming the download of {self.url} at byte {offset}.")
+            offset, chunks = self._resume(fd, ptex, offset, **headers)
+        else:
+            chunks = ptex.fetch_chunks(self.url, **headers)
+        digest = self._hash_prefix(fd, offset)
+        try:
+            for chunk in chunks:
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+                self._check_size(offset)
+                digest.update(chunk)
+        finally:
+            chunks.close()
+        return self._verify(digest, offset)
+
+    def _resume(
+        self, fd: int, ptex: Ptex, offset: int, **headers: str
+    ) -> tuple[int, Iterator[bytes]]:
+        """Requests the content from `offset` on and returns the offset it actually starts at.
+
+        If the server sent the whole file instead of the range, the partial is truncated and the
+        returned offset is 0.
+        """
+        overlap = min(offset, RESUME_OVERLAP)
+        start = offset - overlap
+        have = os.pread(fd, overlap, start)
+        chunks = ptex.fetch_chunks(self.url, Range=f"bytes={start}-", **headers)
+        try:
+            head = b""
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= overlap:
+                    break
+            if head[:overlap] == have:
+                return offset, _prepend(head[overlap:], chunks)
+            if start > 0 and head[:overlap] == os.pread(fd, overlap, 0):
+                log.info(f"The server for {self.url} ignored the Range request; starting over.")
+                os.ftruncate(fd, 0)
+                return 0, _prepend(head, chunks)
+            os.ftruncate(fd, 0)
+            raise OSError(f"The content of {self.url} changed since its download started.")
+        except BaseException:
+            chunks.close()
+            raise
+
+    def _fetch_segmented(self, fd: int, ptex: Ptex, segments: int, **headers: str) -> str:
+        assert self.expected_size is not None
+        size = self.expected_size
+        meta = self._load_meta()
+        progress: list[list[int]] | None = meta.get("segments") if meta else None
+        if not progress:
+            step = -(-size // segments)
+            progress = [[start, min(start + step, size), 0] for start in range(0, size, step)]
+            os.ftruncate(fd, 0)
+            os.ftruncate(fd, size)
+            self._save_meta(progress)
+        else:
+            done = sum(segment[2] for segment in progress)
+            log.info(f"Resuming the segmented download of {self.url} with {done} bytes done.")
+
+        lock = threading.Lock()
+
+        def fetch_segment(segment: list[int]) -> None:
+            start, end, done = segment
+            if start + done >= end:
+                return
+            offset = start + done
+            unsaved = 0
+            chunks = ptex.fetch_chunks(self.url, Range=f"bytes={offset}-{end - 1}", **headers)
+            try:
+                for chunk in chunks:
+                    if offset + len(chunk) > end:
+                        # N.B.: The server replied with the whole file rather than the range.
+                        raise _RangesUnsupportedError()
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                    unsaved += len(chunk)
+                    with lock:
+                        segment[2] = offset - start
+                        if unsaved >= _CHECKPOINT_BYTES:
+                            self._save_meta(progress)
+                            unsaved = 0
+            finally:
+                chunks.close()
+                with lock:
+                    self._save_meta(progress)
+            if offset != end:
+                raise OSError(f"The range {start}-{end - 1} of {self.url} ended early at {offset}.")
+
+        with ThreadPoolExecutor(max_workers=len(progress), thread_name_prefix="segment") as pool:
+            for _ in pool.map(fetch_segment, progress):
+                pass
+        return self._verify(self._hash_prefix(fd, size), size)
+
+
+def _prepend(head: bytes, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    try:
+        if head:
+            yield head
+        yield from chunks
+    finally:
+        chunks.close()
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-import importlib.resources
-import json
 import logging
 #import urllib.parse
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
-from packaging.version import Version
-
+from scie_pikesquares import release_tags
+from scie_pikesquares.lazy import lazy_import
 from scie_pikesquares.log import fatal, info, warn
+from scie_pikesquares.metadata_cache import MetadataCache
 from scie_pikesquares.ptex import Ptex
 
+if TYPE_CHECKING:
+    from packaging.version import Version
+
+packaging_version = lazy_import("packaging.version")
+
 log = logging.getLogger(__name__)
 
 @dataclass(frozen=True)
@@ -22,27 +27,30 @@ class ResolveInfo:
 def determine_tag_version(
     pikesquares_version: str, 
 ) -> ResolveInfo:
-    tag = f"{pikesquares_version}"
     # N.B.: The tag database was created with the following in a Pants clone:
     # git tag --list release_* | \
     #   xargs -I@ bash -c 'jq --arg T @ --arg C $(git rev-parse @^{commit}) -n "{(\$T): \$C}"' | \
     #   jq -s 'add' > pants_release_tags.json
-    tags = json.loads(importlib.resources.read_text("scie_pikesquares", "pikesquares_release_tags.json"))
-    commit_sha = tags.get(tag, "")
+    # It is then compiled into the index loaded here with `just build-release-tags-index`.
+    commit_sha = release_tags.load().get(packaging_version.Version(pikesquares_version)) or ""
 
     return ResolveInfo(
-        stable_version=Version(pikesquares_version),
+        stable_version=packaging_version.Version(pikesquares_version),
         sha_version=commit_sha,
     )
 
+
 def determine_latest_stable_version(
-    ptex: Ptex, 
+    ptex: Ptex,
+    metadata_cache: MetadataCache,
 ) -> ResolveInfo:
     info("Fetching latest stable PikeSquares version.")
 
     try:
-        pikesquares_version = ptex.fetch_json(
-            "https://github.com/EloquentBits/pikesquares/releases/latest", Accept="application/json"
+        pikesquares_version = metadata_cache.fetch_json(
+            ptex,
+            "https://github.com/EloquentBits/pikesquares/releases/latest",
+            Accept="application/json",
         )["tag_name"]
     except Exception as e:
         fatal(
@@ -51,6 +59,6 @@ def determine_latest_stable_version(
         )
 
     return ResolveInfo(
-        stable_version=Version(pikesquares_version),
+        stable_version=packaging_version.Version(pikesquares_version),
         sha_version=None,
     )
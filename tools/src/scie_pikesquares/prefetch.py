@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from scie_pikesquares.artifact_cache import ArtifactCache
+from scie_pikesquares.install_pikesquares import install_venv_from_pex
+from scie_pikesquares.ptex import Ptex
+
+if TYPE_CHECKING:
+    from packaging.version import Version
+
+log = logging.getLogger(__name__)
+
+# Each install already fetches, byte-compiles across all cores and hashes files on its own pool;
+# so a couple of concurrent installs is enough to overlap one's network time with another's CPU.
+DEFAULT_JOBS = 2
+
+
+def prefetch(
+    versions: Iterable[Version],
+    base_dir: Path,
+    ptex: Ptex,
+    compile_mode: str,
+    jobs: int = DEFAULT_JOBS,
+) -> dict[Version, BaseException | None]:
+    """Installs a venv for each of `versions` under `base_dir`, at most `jobs` at a time.
+
+    Returns a mapping of each version to the error that failed its install, or `None` on success.
+    """
+    artifact_cache = ArtifactCache.from_env(ptex)
+
+    def install(version: Version) -> BaseException | None:
+        try:
+            installed = install_venv_from_pex(
+                version,
+                venv_dir=base_dir / "venvs" / str(version),
+                store_dir=base_dir / "venv_store",
+                artifact_cache=artifact_cache,
+                compile_mode=compile_mode,
+            )
+        except Exception as e:
+            log.exception(f"Failed to prefetch PikeSquares {version}.")
+            return e
+        log.info(f"PikeSquares {version} was {'installed' if installed else 'already installed'}.")
+        return None
+
+    unique_versions = list(dict.fromkeys(versions))
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="prefetch") as executor:
+        return dict(zip(unique_versions, executor.map(install, unique_versions)))
+
+
+def spawn_in_background(argv: list[str], log_file: Path) -> int:
+    """Re-runs the bootstrap tools with `argv` detached from this process; returns its pid."""
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with log_file.open("a") as fp:
+        process = subprocess.Popen(
+            args=[
+                sys.executable,
+                "-c",
+                "from scie_pikesquares.bootstrap_tools import main; main()",
+                *argv,
+            ],
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            stdin=subprocess.DEVNULL,
+            stdout=fp,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    return process.pid
@@ -1,26 +1,125 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import os
 import subprocess
 from argparse import ArgumentParser, Namespace
-from dataclasses import dataclass
-from subprocess import CompletedProcess
-from typing import IO, Any, Callable, cast
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from subprocess import CalledProcessError, CompletedProcess
+from typing import IO, Any, Callable, Iterable, Iterator, Mapping, cast
+
+from scie_pikesquares.lazy import lazy_import
+
+partial_download = lazy_import("scie_pikesquares.partial_download")
+ptex_http = lazy_import("scie_pikesquares.ptex_http")
+
+# Large enough to keep the per-chunk Python overhead negligible when streaming multi-MB artifacts.
+CHUNK_SIZE = 1 << 16
+
+# Bootstrap steps fetch a handful of artifacts at most; more fetches than this just queue.
+DEFAULT_FETCH_CONCURRENCY = 4
+
+
+class FingerprintMismatchError(ValueError):
+    def __init__(self, url: str, expected_sha256: str, actual_sha256: str | None) -> None:
+        self.url = url
+        self.expected_sha256 = expected_sha256
+        self.actual_sha256 = actual_sha256
+        eol = os.linesep
+        super().__init__(
+            f"The content downloaded from {url} is invalid.{eol}"
+            f"The expected fingerprint was:{eol}"
+            f"  {expected_sha256}{eol}"
+            f"The actual fingerprint of the downloaded content is:{eol}"
+            f"  {actual_sha256 or '<download aborted>'}"
+        )
+
+
+class HTTPStatusError(OSError):
+    def __init__(
+        self, url: str, status: int, reason: str, retry_after: float | None = None
+    ) -> None:
+        self.url = url
+        self.status = status
+        # The delay in seconds the server asked for before a retry, if any.
+        self.retry_after = retry_after
+        super().__init__(f"Fetching {url} failed with HTTP {status} {reason}")
+
+    @property
+    def transient(self) -> bool:
+        """Whether a retry may succeed; i.e.: the server is overloaded, rate limiting or failing."""
+        return self.status == 429 or self.status >= 500
+
+
+@dataclass(frozen=True)
+class ConditionalResponse:
+    # N.B.: A body of `None` indicates the server responded `304 Not Modified`.
+    body: bytes | None
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.body is None
+
+
+@dataclass(frozen=True)
+class Fetch:
+    url: str
+    # Where to save the content; when `None` the content is returned in memory instead.
+    dest: Path | None = None
+    expected_sha256: str | None = None
+    expected_size: int | None = None
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    fetch: Fetch
+    # Exactly one of `content` or `path` is set on success, per whether the fetch had a `dest`.
+    content: bytes | None = None
+    path: Path | None = None
+    # The sha256 of the fetched content; so it can be checked against a digest learned later.
+    sha256: str | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def result(self) -> FetchResult:
+        """Returns this result if the fetch succeeded and raises its error otherwise."""
+        if self.error is not None:
+            raise self.error
+        return self
+
+
+def file_sha256(path: Path) -> str:
+    with path.open("rb") as fp:
+        return hashlib.file_digest(fp, "sha256").hexdigest()
 
 
 @dataclass(frozen=True)
 class Ptex:
     @classmethod
     def from_exe(cls, exe: str) -> Ptex:
+        # N.B.: The in-process client is the default; PIKESQUARES_PTEX_BACKEND=subprocess opts out.
+        if cls is Ptex and ptex_http.http_ptex_enabled():
+            return ptex_http.HttpPtex(exe)
         return cls(exe)
 
     @classmethod
-    def add_options(cls, parser: ArgumentParser) -> Callable[[Namespace], Ptex]:
+    def add_options(
+        cls, parser: ArgumentParser, required: bool = True
+    ) -> Callable[[Namespace], Ptex]:
         parser.add_argument(
             "--ptex-path",
             dest="ptex",
-            required=True,
+            required=required,
             type=cls.from_exe,
             # The path of a ptex binary.
             help=argparse.SUPPRESS,
@@ -29,12 +128,36 @@ class Ptex:
 
     _exe: str
 
-    def _fetch(self, url: str, stdout: int, **headers: str) -> CompletedProcess:
+    def _args(self, url: str, **headers: str) -> list[str]:
         args = [self._exe]
         for header, value in headers.items():
             args.extend(("-H", f"{header}: {value}"))
         args.append(url)
-        return subprocess.run(args=args, stdout=stdout, check=True)
+        return args
+
+    def _fetch(self, url: str, stdout: int, **headers: str) -> CompletedProcess:
+        return subprocess.run(args=self._args(url, **headers), stdout=stdout, check=True)
+
+    def fetch_conditional(
+        self,
+        url: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        **headers: str,
+    ) -> ConditionalResponse:
+        """Fetches `url` unless the server reports it has not changed since the given validators.
+
+        N.B.: ptex does not expose response headers or status; so a `304 Not Modified` is detected
+        as an empty body in response to a conditional request and no new validators are returned.
+        """
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        body = self._fetch(url, stdout=subprocess.PIPE, **headers).stdout
+        if not body and (etag or last_modified):
+            return ConditionalResponse(body=None)
+        return ConditionalResponse(body=body)
 
     def fetch_json(self, url: str, **headers: str) -> Any:
         return json.loads(self._fetch(url, stdout=subprocess.PIPE, **headers).stdout)
@@ -44,3 +167,111 @@ class Ptex:
 
     def fetch_to_fp(self, url: str, fp: IO[bytes], **headers: str) -> None:
         self._fetch(url, stdout=fp.fileno(), **headers)
+
+    def fetch_chunks(self, url: str, **headers: str) -> Iterator[bytes]:
+        """Yields the content of `url` as it arrives.
+
+        Closing the iterator early kills the underlying ptex process; so callers can abort a
+        download by simply breaking out of iteration.
+        """
+        args = self._args(url, **headers)
+        process = subprocess.Popen(args=args, stdout=subprocess.PIPE)
+        stdout = process.stdout
+        assert stdout is not None
+        try:
+            for chunk in iter(lambda: stdout.read(CHUNK_SIZE), b""):
+                yield chunk
+        finally:
+            if process.poll() is None:
+                process.kill()
+            stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise CalledProcessError(returncode, args)
+
+    def fetch_verified_to_fp(
+        self,
+        url: str,
+        fp: IO[bytes],
+        expected_sha256: str,
+        expected_size: int | None = None,
+        **headers: str,
+    ) -> None:
+        """Writes the content of `url` to `fp` while hashing it in the same pass.
+
+        If `expected_size` is known, the download is aborted as soon as it overruns that size
+        instead of waiting for the full (invalid) content to arrive.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        chunks = self.fetch_chunks(url, **headers)
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                if expected_size is not None and size > expected_size:
+                    raise FingerprintMismatchError(url, expected_sha256, actual_sha256=None)
+                digest.update(chunk)
+                fp.write(chunk)
+        finally:
+            chunks.close()
+        actual_sha256 = digest.hexdigest()
+        if expected_sha256 != actual_sha256:
+            raise FingerprintMismatchError(url, expected_sha256, actual_sha256)
+
+    def fetch_many(
+        self, fetches: Iterable[Fetch], max_workers: int = DEFAULT_FETCH_CONCURRENCY
+    ) -> list[FetchResult]:
+        """Performs `fetches` concurrently, at most `max_workers` at a time.
+
+        Each fetch is verified against its expected digest and size, if any. A failed fetch does
+        not stop the others; its error is recorded in its result instead. The results are returned
+        in the order of `fetches`.
+        """
+        fetches = list(fetches)
+        if not fetches:
+            return []
+        workers = min(max_workers, len(fetches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as executor:
+            return list(executor.map(self._fetch_one, fetches))
+
+    def _fetch_one(self, fetch: Fetch) -> FetchResult:
+        try:
+            if fetch.dest is not None:
+                # N.B.: Saving via a partial download means a failed fetch resumes on the next try.
+                sha256 = partial_download.PartialDownload(
+                    dest=fetch.dest,
+                    url=fetch.url,
+                    expected_sha256=fetch.expected_sha256,
+                    expected_size=fetch.expected_size,
+                ).fetch(self, **fetch.headers)
+                return FetchResult(fetch=fetch, path=fetch.dest, sha256=sha256)
+
+            digest = hashlib.sha256()
+            chunks = []
+            size = 0
+            stream = self.fetch_chunks(fetch.url, **fetch.headers)
+            try:
+                for chunk in stream:
+                    size += len(chunk)
+                    if fetch.expected_size is not None and size > fetch.expected_size:
+                        break
+                    digest.update(chunk)
+                    chunks.append(chunk)
+            finally:
+                stream.close()
+            sha256 = digest.hexdigest()
+            if (fetch.expected_sha256 and fetch.expected_sha256 != sha256) or (
+                fetch.expected_size is not None and size != fetch.expected_size
+            ):
+                raise FingerprintMismatchError(
+                    fetch.url,
+                    fetch.expected_sha256 or f"{fetch.expected_size} bytes",
+                    actual_sha256=(
+                        None
+                        if fetch.expected_size is not None and size > fetch.expected_size
+                        else sha256
+                    ),
+                )
+            return FetchResult(fetch=fetch, content=b"".join(chunks), sha256=sha256)
+        except Exception as e:
+            return FetchResult(fetch=fetch, error=e)
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import IO, Any, Iterator
+from urllib.parse import unquote, urljoin, urlsplit
+
+from scie_pikesquares import VERSION
+from scie_pikesquares.lazy import lazy_import
+from scie_pikesquares.ptex import CHUNK_SIZE, ConditionalResponse, HTTPStatusError, Ptex
+
+http_client = lazy_import("http.client")
+ssl = lazy_import("ssl")
+
+log = logging.getLogger(__name__)
+
+# Generous enough for a slow mirror, but a stalled connection should not hang a boot forever.
+DEFAULT_TIMEOUT_SECS = 60.0
+
+# Idle connections kept per host; more concurrent fetches than this just open extra connections.
+MAX_IDLE_PER_HOST = 4
+
+_MAX_REDIRECTS = 10
+_REDIRECT_STATUSES = frozenset((301, 302, 303, 307, 308))
+_RANGE = re.compile(r"bytes=(?P<start>\d+)-(?P<end>\d*)")
+
+
+class _UnreachableError(Exception):
+    """A connection to the host could not be established at all, e.g.: DNS or TLS failed."""
+
+
+@contextmanager
+def _protocol_errors(url: str) -> Iterator[None]:
+    """Raises malformed or truncated responses as the `OSError`s fetch callers already handle.
+
+    N.B.: `http.client` raises these as `HTTPException`s, which are not `OSError`s; e.g.: a chunked
+    response cut short raises `IncompleteRead`.
+    """
+    try:
+        yield
+    except OSError:
+        # N.B.: Some are both; e.g.: `RemoteDisconnected` is also a `ConnectionResetError`.
+        raise
+    except http_client.HTTPException as e:
+        raise OSError(f"Fetching {url} failed: {e!r}") from e
+
+
+_Key = tuple[str, str, int]
+
+
+class ConnectionPool:
+    """Keeps idle keep-alive connections per scheme, host and port for re-use across fetches."""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT_SECS) -> None:
+        self._timeout = timeout
+        self._idle: dict[_Key, list[Any]] = {}
+        self._lock = threading.Lock()
+        self._ssl_context: Any = None
+
+    def _context(self) -> Any:
+        with self._lock:
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            return self._ssl_context
+
+    def acquire(self, key: _Key) -> tuple[Any, bool]:
+        """Returns a connection for `key` and whether it is a re-used one."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            return (
+                http_client.HTTPSConnection(
+                    host, port, timeout=self._timeout, context=self._context()
+                ),
+                False,
+            )
+        return http_client.HTTPConnection(host, port, timeout=self._timeout), False
+
+    def release(self, key: _Key, conn: Any) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < MAX_IDLE_PER_HOST:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+@dataclass(frozen=True)
+class _Response:
+    url: str
+    key: _Key
+    conn: Any
+    response: Any
+
+    @property
+    def status(self) -> int:
+        return int(self.response.status)
+
+    def header(self, name: str) -> str | None:
+        return self.response.getheader(name)
+
+
+@dataclass(frozen=True)
+class HttpPtex(Ptex):
+    """A Ptex that fetches over pooled keep-alive connections from within this process.
+
+    This saves a process spawn and, for repeat fetches from the same host, a TCP and TLS handshake
+    per fetch; and fetches may be issued from several threads at once. URLs that need a proxy or
+    whose host can't be reached directly (e.g.: no CA certificates are found for TLS) are fetched
+    with the ptex binary as before.
+    """
+
+    _pool: ConnectionPool = field(default_factory=ConnectionPool, compare=False, repr=False)
+    _fallback_hosts: set[_Key] = field(default_factory=set, compare=False, repr=False)
+
+    def _open(self, url: str, headers: dict[str, str]) -> _Response:
+        original_url = url
+        for _ in range(_MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise _UnreachableError(f"Unsupported URL {url}")
+            default_port = 443 if parts.scheme == "https" else 80
+            key = (parts.scheme, parts.hostname, parts.port or default_port)
+            if key in self._fallback_hosts:
+                raise _UnreachableError(f"{parts.netloc} was unreachable earlier")
+            path = parts.path or "/"
+            if parts.query:
+                path = f"{path}?{parts.query}"
+            response = self._request(key, path, headers, url)
+            if response.status not in _REDIRECT_STATUSES:
+                return response
+            location = response.header("Location")
+            self._finish(response)
+            if not location:
+                raise HTTPStatusError(url, response.status, "redirect without a Location")
+            next_url = urljoin(url, location)
+            if urlsplit(next_url).hostname != parts.hostname:
+                # N.B.: Credentials are for the original host only; e.g.: GitHub release assets
+                # redirect to a storage host that rejects requests carrying them.
+                headers = {k: v for k, v in headers.items() if k.lower() != "authorization"}
+            url = next_url
+        raise OSError(f"Fetching {original_url} failed after {_MAX_REDIRECTS} redirects.")
+
+    def _request(self, key: _Key, path: str, headers: dict[str, str], url: str) -> _Response:
+        request_headers = {"User-Agent": f"scie-pikesquares/{VERSION}", **headers}
+        while True:
+            conn, reused = self._pool.acquire(key)
+            try:
+                if conn.sock is None:
+                    try:
+                        conn.connect()
+                    except OSError as e:
+                        self._fallback_hosts.add(key)
+                        raise _UnreachableError(f"Failed to connect to {key[1]}: {e}")
+                with _protocol_errors(url):
+                    conn.request("GET", path, headers=request_headers)
+                    return _Response(url=url, key=key, conn=conn, response=conn.getresponse())
+            except ConnectionError:
+                conn.close()
+                # The server closed an idle keep-alive connection; a fresh one will do.
+                if not reused:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+    def _finish(self, response: _Response) -> None:
+        """Returns the response's connection to the pool once its body is fully read."""
+        try:
+            with _protocol_errors(response.url):
+                response.response.read()
+        except OSError:
+            response.conn.close()
+            raise
+        if response.response.will_close:
+            response.conn.close()
+        else:
+            self._pool.release(response.key, response.conn)
+
+    @staticmethod
+    def _check(response: _Response, *ok: int) -> None:
+        if response.status not in (ok or (200, 206)):
+            reason = response.response.reason
+            retry_after = response.header("Retry-After")
+            response.conn.close()
+            raise HTTPStatusError(
+                response.url,
+                response.status,
+                reason,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+
+    def _use_subprocess(self, url: str, e: Exception) -> None:
+        log.debug(f"Fetching {url} with the ptex binary: {e}")
+
+    def _fetch_file(self, url: str, **headers: str) -> Iterator[bytes]:
+        path = unquote(urlsplit(url).path)
+        with open(path, "rb") as fp:
+            remaining = None
+            match = _RANGE.fullmatch(headers.get("Range", ""))
+            if match:
+                fp.seek(int(match["start"]))
+                if match["end"]:
+                    remaining = int(match["end"]) + 1 - int(match["start"])
+            while remaining is None or remaining > 0:
+                chunk = fp.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def _read(self, url: str, **headers: str) -> bytes:
+        return b"".join(self.fetch_chunks(url, **headers))
+
+    def fetch_conditional(
+        self,
+        url: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        **headers: str,
+    ) -> ConditionalResponse:
+        request_headers = dict(headers)
+        if etag:
+            request_headers["If-None-Match"] = etag
+        if last_modified:
+            request_headers["If-Modified-Since"] = last_modified
+        try:
+            response = self._open(url, request_headers)
+        except _UnreachableError as e:
+            self._use_subprocess(url, e)
+            return super().fetch_conditional(url, etag=etag, last_modified=last_modified, **headers)
+        self._check(response, 200, 304)
+        # N.B.: Unlike the ptex binary, we see the response headers; so fresh validators are kept.
+        validators = dict(
+            etag=response.header("ETag"), last_modified=response.header("Last-Modified")
+        )
+        if response.status == 304:
+            self._finish(response)
+            return ConditionalResponse(body=None, **validators)
+        try:
+            with _protocol_errors(url):
+                body = response.response.read()
+        except OSError:
+            response.conn.close()
+            raise
+        self._finish(response)
+        return ConditionalResponse(body=body, **validators)
+
+    def fetch_json(self, url: str, **headers: str) -> Any:
+        return json.loads(self._read(url, **headers))
+
+    def fetch_text(self, url: str, **headers: str) -> str:
+        return self._read(url, **headers).decode()
+
+    def fetch_to_fp(self, url: str, fp: IO[bytes], **headers: str) -> None:
+        for chunk in self.fetch_chunks(url, **headers):
+            fp.write(chunk)
+
+    def fetch_chunks(self, url: str, **headers: str) -> Iterator[bytes]:
+        if url.startswith("file:"):
+            yield from self._fetch_file(url, **headers)
+            return
+        try:
+            response = self._open(url, headers)
+        except _UnreachableError as e:
+            self._use_subprocess(url, e)
+            yield from super().fetch_chunks(url, **headers)
+            return
+        self._check(response)
+        complete = False
+        try:
+            with _protocol_errors(url):
+                for chunk in iter(lambda: response.response.read(CHUNK_SIZE), b""):
+                    yield chunk
+            if response.response.length:
+                raise OSError(f"The connection for {url} closed before the response completed.")
+            complete = True
+        finally:
+            # N.B.: A response abandoned part way leaves unread bytes on the connection; so only
+            # complete ones can be re-used.
+            if complete:
+                self._finish(response)
+            else:
+                response.conn.close()
+
+
+def http_ptex_enabled() -> bool:
+    backend = os.environ.get("PIKESQUARES_PTEX_BACKEND", "http")
+    if backend == "subprocess":
+        return False
+    # N.B.: ptex handles proxies (and their many conventions); so defer to it when any are set.
+    proxy_vars = ("http_proxy", "https_proxy", "all_proxy")
+    return not any(os.environ.get(var) or os.environ.get(var.upper()) for var in proxy_vars)
@@ -5,9 +5,11 @@ from argparse import ArgumentParser
 from pathlib import Path
 from typing import NoReturn
 
-from scie_pikesquares.log import fatal, init_logging
+from scie_pikesquares.bindings_daemon import delegating
+from scie_pikesquares.log import fatal, init_logging, span
 
 
+@delegating("record-scie-pikesquares-info")
 def main() -> NoReturn:
     parser = ArgumentParser()
     parser.add_argument(
@@ -31,13 +33,14 @@ def main() -> NoReturn:
     if not env_file:
         fatal("Expected SCIE_BINDING_ENV to be set in the environment")
 
-    version = subprocess.run(
-        args=[options.scie],
-        env={"PIKESQUARES_BOOTSTRAP_VERSION": "report"},
-        stdout=subprocess.PIPE,
-        text=True,
-        check=True,
-    ).stdout.strip()
+    with span("report_version"):
+        version = subprocess.run(
+            args=[options.scie],
+            env={"PIKESQUARES_BOOTSTRAP_VERSION": "report"},
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        ).stdout.strip()
     with open(env_file, "a") as fp:
         print(f"VERSION={version}", file=fp)
 
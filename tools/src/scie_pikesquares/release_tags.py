@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import bisect
+import functools
+import importlib.resources
+import json
+import struct
+import sys
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, NoReturn
+
+from scie_pikesquares.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from packaging.version import Version
+
+packaging_version = lazy_import("packaging.version")
+
+INDEX_NAME = "pikesquares_release_tags.idx"
+
+# The index is a header followed by fixed-width records sorted by version; so lookups can bisect
+# straight over the raw bytes without decoding the whole table first.
+MAGIC = b"PSRT"
+HEADER = struct.Struct("<4sI")  # magic, record count
+RECORD = struct.Struct("<III20s")  # major, minor, micro, commit sha
+
+ReleaseKey = tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class ReleaseTag:
+    version: Version
+    commit_sha: str
+
+
+def _release_key(version: Version) -> ReleaseKey:
+    release = version.release
+    if len(release) > 3:
+        raise ValueError(f"Release tags must be of the form X.Y.Z, given: {version}")
+    major, minor, micro = release + (0,) * (3 - len(release))
+    return major, minor, micro
+
+
+class ReleaseTagIndex:
+    def __init__(self, data: bytes) -> None:
+        magic, count = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"Not a release tag index; found magic {magic!r}.")
+        if len(data) != HEADER.size + count * RECORD.size:
+            raise ValueError(f"The release tag index is truncated; expected {count} records.")
+        self._data = memoryview(data)
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, index: int) -> ReleaseKey:
+        major, minor, micro, _ = RECORD.unpack_from(self._data, HEADER.size + index * RECORD.size)
+        return major, minor, micro
+
+    def _tag(self, index: int) -> ReleaseTag:
+        major, minor, micro, sha = RECORD.unpack_from(self._data, HEADER.size + index * RECORD.size)
+        return ReleaseTag(
+            version=packaging_version.Version(f"{major}.{minor}.{micro}"), commit_sha=sha.hex()
+        )
+
+    def __iter__(self) -> Iterator[ReleaseTag]:
+        return (self._tag(index) for index in range(self._count))
+
+    def get(self, version: Version) -> str | None:
+        """Returns the commit sha of the release tag for exactly `version`, if any."""
+        if version.is_prerelease or version.is_postrelease or version.local:
+            return None
+        key = _release_key(version)
+        index = bisect.bisect_left(range(self._count), key, key=self._key)
+        if index < self._count and self._key(index) == key:
+            return self._tag(index).commit_sha
+        return None
+
+    def floor(self, version: Version) -> ReleaseTag | None:
+        """Returns the highest release tag less than or equal to `version`, if any."""
+        key = _release_key(version)
+        # N.B.: Pre-releases and dev releases sort before the final release they lead up to.
+        search = bisect.bisect_left if version.is_prerelease else bisect.bisect_right
+        index = search(range(self._count), key, key=self._key)
+        return self._tag(index - 1) if index > 0 else None
+
+
+def compile_index(tags: dict[str, str]) -> bytes:
+    records = sorted(
+        (_release_key(packaging_version.Version(tag)), bytes.fromhex(sha))
+        for tag, sha in tags.items()
+    )
+    return HEADER.pack(MAGIC, len(records)) + b"".join(
+        RECORD.pack(*key, sha) for key, sha in records
+    )
+
+
+@functools.cache
+def load() -> ReleaseTagIndex:
+    return ReleaseTagIndex(
+        importlib.resources.files("scie_pikesquares").joinpath(INDEX_NAME).read_bytes()
+    )
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description="Compiles the release tag database into its lookup index.")
+    parser.add_argument("tags_json", type=Path, help="The release tags JSON database.")
+    parser.add_argument("index", type=Path, help="The path to write the compiled index to.")
+    options = parser.parse_args()
+
+    options.index.write_bytes(compile_index(json.loads(options.tags_json.read_text())))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
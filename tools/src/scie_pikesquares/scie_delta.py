@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import lzma
+import os
+import struct
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import IO, Iterator, NoReturn
+
+from scie_pikesquares.ptex import CHUNK_SIZE, file_sha256
+
+# A delta is an uncompressed header, so the base can be checked before anything is decompressed,
+# followed by an lzma stream of copy and insert ops that rebuild the target from the base.
+MAGIC = b"PSDL"
+HEADER = struct.Struct("<4s32s32sQ")  # magic, base sha256, target sha256, target size
+COPY = struct.Struct("<QQ")  # base offset, length
+INSERT = struct.Struct("<Q")  # length, followed by that many literal bytes
+_COPY_OP = b"C"
+_INSERT_OP = b"I"
+
+# Chunks end just before an occurrence of the marker, so the same content is cut into the same
+# chunks wherever it sits in a file; a scie is its scie-jump followed by its lift files end to end,
+# and a lift file shared by two releases is usually found at a different offset in each. In
+# compressed data, like the PEXes and interpreters that make up most of a scie, the marker occurs
+# every 64KiB on average; the bounds keep chunks reasonable where it occurs much more or less often.
+MARKER = b"\x9e\x37"
+MIN_CHUNK = 4 << 10
+MAX_CHUNK = 1 << 20
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def _chunks(data: bytes) -> Iterator[tuple[int, int]]:
+    start = 0
+    while start < len(data):
+        cut = data.find(MARKER, start + MIN_CHUNK, start + MAX_CHUNK)
+        end = cut if cut != -1 else min(start + MAX_CHUNK, len(data))
+        yield start, end
+        start = end
+
+
+def _digest(chunk: bytes) -> bytes:
+    return hashlib.blake2b(chunk, digest_size=16).digest()
+
+
+def _ops(base: bytes, target: bytes) -> Iterator[tuple[bytes, int, int]]:
+    """Yields `(op, offset, length)` with copy offsets into `base` and insert offsets into `target`.
+
+    Adjacent ops of the same kind are merged.
+    """
+    index: dict[bytes, int] = {}
+    for start, end in _chunks(base):
+        index.setdefault(_digest(base[start:end]), start)
+
+    op, offset, length = _INSERT_OP, 0, 0
+    for start, end in _chunks(target):
+        chunk = target[start:end]
+        size = end - start
+        # N.B.: Checking whether the previous copy simply continues catches matches the chunking
+        # missed, e.g.: where the same content was cut differently near the edge of a change.
+        if op == _COPY_OP and base[offset + length : offset + length + size] == chunk:
+            length += size
+            continue
+        match = index.get(_digest(chunk))
+        if match is not None and base[match : match + size] == chunk:
+            if length:
+                yield op, offset, length
+            op, offset, length = _COPY_OP, match, size
+        elif op == _INSERT_OP:
+            length += size
+        else:
+            if length:
+                yield op, offset, length
+            op, offset, length = _INSERT_OP, start, size
+    if length:
+        yield op, offset, length
+
+
+def create(base: Path, target: Path, delta: Path) -> int:
+    """Writes a delta that rebuilds `target` from `base` to `delta` and returns its size."""
+    base_data = base.read_bytes()
+    target_data = target.read_bytes()
+    header = HEADER.pack(
+        MAGIC,
+        hashlib.sha256(base_data).digest(),
+        hashlib.sha256(target_data).digest(),
+        len(target_data),
+    )
+    with delta.open("wb") as fp:
+        fp.write(header)
+        with lzma.open(fp, "wb") as ops_fp:
+            for op, offset, length in _ops(base_data, target_data):
+                if op == _COPY_OP:
+                    ops_fp.write(_COPY_OP + COPY.pack(offset, length))
+                else:
+                    ops_fp.write(_INSERT_OP + INSERT.pack(length))
+                    ops_fp.write(target_data[offset : offset + length])
+    return delta.stat().st_size
+
+
+def _read_exactly(fp: IO[bytes], size: int) -> bytes:
+    data = fp.read(size)
+    if len(data) != size:
+        raise DeltaError("The delta is truncated.")
+    return data
+
+
+def _read_range(fp: IO[bytes], length: int) -> Iterator[bytes]:
+    remaining = length
+    while remaining:
+        chunk = fp.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise DeltaError("The delta is truncated or does not match its base.")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def apply(base: Path, delta: Path, out: Path) -> str:
+    """Rebuilds the target of `delta` from `base` into `out` and returns the target's sha256.
+
+    Raises `DeltaError` if `delta` was not made against `base` or the result is not the target the
+    delta was made for.
+    """
+    with delta.open("rb") as delta_fp:
+        magic, base_sha256, target_sha256, target_size = HEADER.unpack(
+            _read_exactly(delta_fp, HEADER.size)
+        )
+        if magic != MAGIC:
+            raise DeltaError(f"Not a scie delta; found magic {magic!r}.")
+        if file_sha256(base) != base_sha256.hex():
+            raise DeltaError(f"The delta was not made against {base}.")
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with (
+                base.open("rb") as base_fp,
+                out.open("wb") as out_fp,
+                lzma.open(delta_fp, "rb") as ops_fp,
+            ):
+                while op := ops_fp.read(1):
+                    if op == _COPY_OP:
+                        offset, length = COPY.unpack(_read_exactly(ops_fp, COPY.size))
+                        base_fp.seek(offset)
+                        chunks = _read_range(base_fp, length)
+                    elif op == _INSERT_OP:
+                        (length,) = INSERT.unpack(_read_exactly(ops_fp, INSERT.size))
+                        chunks = _read_range(ops_fp, length)
+                    else:
+                        raise DeltaError(f"The delta has an unknown op {op!r}.")
+                    size += length
+                    if size > target_size:
+                        raise DeltaError("The delta builds more than its target.")
+                    for chunk in chunks:
+                        out_fp.write(chunk)
+                        digest.update(chunk)
+                out_fp.flush()
+                os.fsync(out_fp.fileno())
+        except (lzma.LZMAError, EOFError) as e:
+            raise DeltaError(f"The delta is corrupt: {e}")
+
+    sha256 = digest.hexdigest()
+    if size != target_size or sha256 != target_sha256.hex():
+        raise DeltaError(f"The delta rebuilt {size} bytes with sha256 {sha256}, not its target.")
+    return sha256
+
+
+def main() -> NoReturn:
+    parser = ArgumentParser(description="Creates and applies deltas between scie binaries.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    create_parser = subparsers.add_parser("create", help="Create a delta from BASE to TARGET.")
+    create_parser.add_argument("base", type=Path, help="The scie the delta applies to.")
+    create_parser.add_argument("target", type=Path, help="The scie the delta rebuilds.")
+    create_parser.add_argument("delta", type=Path, help="The path to write the delta to.")
+    apply_parser = subparsers.add_parser("apply", help="Rebuild a delta's target from BASE.")
+    apply_parser.add_argument("base", type=Path, help="The scie the delta applies to.")
+    apply_parser.add_argument("delta", type=Path, help="The delta to apply.")
+    apply_parser.add_argument("out", type=Path, help="The path to write the rebuilt scie to.")
+    options = parser.parse_args()
+
+    if options.command == "create":
+        size = create(options.base, options.target, options.delta)
+        target_size = options.target.stat().st_size
+        print(f"Wrote a {size} byte delta for the {target_size} byte {options.target}.")
+    else:
+        print(apply(options.base, options.delta, options.out))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import subprocess
+import sys
+from collections import deque
+from pathlib import Path
+from typing import IO, Mapping, Sequence
+
+log = logging.getLogger(__name__)
+
+# The lines of output kept to explain a failure; verbose tools emit far more than is useful here.
+DEFAULT_TAIL_LINES = 50
+
+_READ_SIZE = 1 << 16
+
+
+def run_streaming(
+    args: Sequence[str],
+    *,
+    env: Mapping[str, str] | None = None,
+    cwd: Path | str | None = None,
+    label: str | None = None,
+    echo: bool = True,
+    tail_lines: int = DEFAULT_TAIL_LINES,
+    check: bool = True,
+) -> subprocess.CompletedProcess[bytes]:
+    """Runs a process, streaming its stdout and stderr line by line to the log and console.
+
+    Only the last `tail_lines` lines of output are retained; these are returned as the `stderr` of
+    the result (and of the `CalledProcessError` raised when `check` is set and the process fails)
+    so callers can explain failures without buffering all output in memory. N.B.: The tail merges
+    stdout and stderr lines in the order they were read, since build tools commonly report the error
+    that failed them on stdout; the result's `stdout` is always `None`.
+
+    If streaming is interrupted, e.g.: by a `KeyboardInterrupt`, the process is killed and reaped
+    before the exception propagates.
+    """
+    prefix = f"[{label}] " if label else ""
+    name = label or os.path.basename(args[0])
+    tail: deque[bytes] = deque(maxlen=tail_lines)
+
+    process = subprocess.Popen(
+        args=args, env=env, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    assert process.stdout is not None and process.stderr is not None
+    consoles: dict[int, IO[str]] = {
+        process.stdout.fileno(): sys.stdout,
+        process.stderr.fileno(): sys.stderr,
+    }
+    pending = dict.fromkeys(consoles, b"")
+
+    def emit(fd: int, line: bytes) -> None:
+        tail.append(line)
+        text = line.decode(errors="replace")
+        log.debug(f"{name}: {text}")
+        if echo:
+            print(f"{prefix}{text}", file=consoles[fd], flush=True)
+
+    try:
+        with selectors.DefaultSelector() as selector:
+            for fd in pending:
+                selector.register(fd, selectors.EVENT_READ)
+            while pending:
+                for key, _ in selector.select():
+                    fd = key.fd
+                    chunk = os.read(fd, _READ_SIZE)
+                    if not chunk:
+                        selector.unregister(fd)
+                        if pending[fd]:
+                            emit(fd, pending[fd])
+                        del pending[fd]
+                        continue
+                    *lines, pending[fd] = (pending[fd] + chunk).split(b"\n")
+                    for line in lines:
+                        emit(fd, line)
+                    # N.B.: Progress bars redraw a single line with carriage returns; so never let
+                    # one line grow without bound either.
+                    if len(pending[fd]) > _READ_SIZE:
+                        emit(fd, pending[fd])
+                        pending[fd] = b""
+
+        returncode = process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+    output_tail = b"\n".join(tail)
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, list(args), stderr=output_tail)
+    return subprocess.CompletedProcess(list(args), returncode, stderr=output_tail)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from scie_pikesquares.log import span
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Task:
+    """A named step whose `func` is called with the results of the tasks it `requires`.
+
+    Results are passed as keyword arguments named after the required tasks.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    requires: tuple[str, ...] = ()
+
+
+def _timed(task: Task, **kwargs: Any) -> Any:
+    start = time.perf_counter()
+    try:
+        with span(task.name):
+            return task.func(**kwargs)
+    finally:
+        log.info(f"Task {task.name} took {time.perf_counter() - start:.3f}s")
+
+
+def run_tasks(tasks: Iterable[Task], max_workers: int | None = None) -> dict[str, Any]:
+    """Runs each task as soon as all the tasks it requires have completed.
+
+    Returns a mapping of task name to result. The first task to fail cancels all tasks not yet
+    started and its exception is re-raised.
+    """
+    pending = {task.name: task for task in tasks}
+    for task in pending.values():
+        unknown = [name for name in task.requires if name not in pending]
+        if unknown:
+            raise ValueError(f"Task {task.name} requires unknown tasks: {', '.join(unknown)}")
+
+    results: dict[str, Any] = {}
+    running: dict[Future, Task] = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task") as executor:
+        while pending or running:
+            ready = [
+                task for task in pending.values() if all(name in results for name in task.requires)
+            ]
+            if not ready and not running:
+                raise ValueError(f"Tasks have circular requirements: {', '.join(pending)}")
+            for task in ready:
+                del pending[task.name]
+                kwargs = {name: results[name] for name in task.requires}
+                running[executor.submit(_timed, task, **kwargs)] = task
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    results[task.name] = future.result()
+                except BaseException:
+                    for other in running:
+                        other.cancel()
+                    raise
+    log.info(f"Ran {len(results)} tasks in {time.perf_counter() - start:.3f}s")
+    return results
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from scie_pikesquares.log import spans_file
+
+
+@dataclass(frozen=True)
+class Span:
+    run: str
+    tool: str
+    span: str
+    start: float
+    secs: float
+    ok: bool
+
+
+@dataclass(frozen=True)
+class PhaseStats:
+    tool: str
+    span: str
+    count: int
+    failed: int
+    mean: float
+    median: float
+    max: float
+    last: float
+
+
+def load_spans(base_dir: Path) -> Iterator[Span]:
+    """Yields the spans recorded under `base_dir`, oldest first."""
+    current = spans_file(base_dir)
+    for path in (current.with_suffix(".jsonl.1"), current):
+        try:
+            with path.open() as fp:
+                for line in fp:
+                    try:
+                        yield Span(**json.loads(line))
+                    except (TypeError, ValueError):
+                        # A line torn by a killed process or written by a future version.
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def summarize(spans: Iterable[Span], last_runs: int | None = None) -> list[PhaseStats]:
+    """Aggregates spans into per tool and phase statistics across runs.
+
+    When `last_runs` is given, only the most recent that many runs of each tool are considered.
+    """
+    runs_by_tool: dict[str, list[str]] = defaultdict(list)
+    by_phase: dict[tuple[str, str], list[Span]] = defaultdict(list)
+    for span in spans:
+        if span.run not in runs_by_tool[span.tool]:
+            runs_by_tool[span.tool].append(span.run)
+        by_phase[(span.tool, span.span)].append(span)
+
+    stats = []
+    for (tool, phase), phase_spans in by_phase.items():
+        if last_runs is not None:
+            recent = set(runs_by_tool[tool][-last_runs:])
+            phase_spans = [span for span in phase_spans if span.run in recent]
+            if not phase_spans:
+                continue
+        secs = [span.secs for span in phase_spans]
+        stats.append(
+            PhaseStats(
+                tool=tool,
+                span=phase,
+                count=len(phase_spans),
+                failed=sum(1 for span in phase_spans if not span.ok),
+                mean=statistics.fmean(secs),
+                median=statistics.median(secs),
+                max=max(secs),
+                last=secs[-1],
+            )
+        )
+    # N.B.: The total span of each tool sorts first since it always takes the longest.
+    return sorted(stats, key=lambda s: (s.tool, -s.mean))
+
+
+def render(stats: Iterable[PhaseStats]) -> Iterator[str]:
+    header = (
+        f"    {'phase':<24} {'runs':>5} {'failed':>6} {'mean':>8} {'median':>8} {'max':>8} "
+        f"{'last':>8}"
+    )
+    tool = None
+    for s in stats:
+        if s.tool != tool:
+            tool = s.tool
+            yield f"{tool}:"
+            yield header
+        yield (
+            f"    {s.span:<24} {s.count:>5} {s.failed:>6} {s.mean:>7.3f}s {s.median:>7.3f}s "
+            f"{s.max:>7.3f}s {s.last:>7.3f}s"
+        )
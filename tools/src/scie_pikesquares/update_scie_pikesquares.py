@@ -1,38 +1,76 @@
 from __future__ import annotations
 
 import argparse
-import atexit
-import hashlib
-import io
+import errno
 import json
 import logging
 import os
+import random
 import re
 import shutil
 import subprocess
 import sys
 import sysconfig
-import tempfile
+import time
 from argparse import ArgumentParser
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path, PurePath
 from subprocess import CalledProcessError
-from typing import Any, Dict, List, NoReturn, cast
-
-from packaging.version import Version
-
-from scie_pikesquares.log import fatal, info, init_logging, warn
-from scie_pikesquares.ptex import Ptex
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, NoReturn, TypeVar, cast
+
+from scie_pikesquares.artifact_cache import ArtifactCache
+from scie_pikesquares.lazy import lazy_import
+from scie_pikesquares.log import fatal, info, init_logging, span, warn
+from scie_pikesquares.metadata_cache import MetadataCache
+from scie_pikesquares.ptex import (
+    Fetch,
+    FetchResult,
+    FingerprintMismatchError,
+    HTTPStatusError,
+    Ptex,
+)
+
+if TYPE_CHECKING:
+    from packaging.version import Version
+
+packaging_version = lazy_import("packaging.version")
+scie_delta = lazy_import("scie_pikesquares.scie_delta")
 
 log = logging.getLogger(__name__)
 
 
 RELEASE_TAG_MATCHER = re.compile(r"^v(?P<version>\d+\.\d+\.\d+)$")
+SHA256_MATCHER = re.compile(r"^[0-9a-fA-F]{64}$")
 EXE_EXTENSION = sysconfig.get_config_var("EXE") or ""
 
 GITHUB_API_BASE_URL = "https://api.github.com/repos/pantsbuild/scie-pants"
 BINARY_NAME = "scie-pants"
 
+# The maximum page size the GitHub API allows.
+RELEASES_PER_PAGE = 100
+
+# Release metadata fetches that fail in a way a retry may fix (e.g.: rate limiting) are tried this
+# many times in all, backing off exponentially with full jitter so that a fleet of hosts that failed
+# together doesn't retry together.
+FETCH_ATTEMPTS = 4
+
+# A ptex binary failure doesn't tell a missing URL or bad credentials from an overloaded server; so
+# it gets fewer tries, and a permanent failure is not delayed by minutes.
+PTEX_FETCH_ATTEMPTS = 2
+
+# A server asking us to wait longer than this before retrying is treated as a failure.
+MAX_RETRY_AFTER_SECS = 120
+
+_T = TypeVar("_T")
+
+
+def delta_name(binary_name: str, base_version: Version) -> str:
+    """The name of the release asset that rebuilds `binary_name` from its `base_version` release.
+
+    See `scie_delta` for the format; the release workflow publishes one against the prior release.
+    """
+    return f"{binary_name}.from-{base_version}.scie-delta"
+
 
 @dataclass(frozen=True)
 class Release:
@@ -40,23 +78,36 @@ class Release:
     file_name: str
     binary_url: str
     binary_sha256_url: str
+    binary_size: int | None = None
+    # A delta that rebuilds the binary from the currently installed one, if the release has one.
+    delta_url: str | None = None
+    delta_size: int | None = None
 
     @classmethod
     def from_api_response(
-        cls, version: Version, platform: str, release_data: dict[str, Any]
+        cls,
+        version: Version,
+        platform: str,
+        release_data: dict[str, Any],
+        delta_from: Version | None = None,
     ) -> Release | None:
         binary_name = f"{BINARY_NAME}-{platform}{EXE_EXTENSION}"
         binary_sha256_name = f"{binary_name}.sha256"
-        binary_url = None
-        binary_sha256_url = None
-        for asset in release_data.get("assets", []):
-            name = asset.get("name")
-            if binary_name == name:
-                binary_url = asset.get("browser_download_url")
-            elif binary_sha256_name == name:
-                binary_sha256_url = asset.get("browser_download_url")
-            if binary_url and binary_sha256_url:
-                return cls(version, binary_name, binary_url, binary_sha256_url)
+        binary_delta_name = delta_name(binary_name, delta_from) if delta_from else None
+        assets = {asset.get("name"): asset for asset in release_data.get("assets", [])}
+        binary = assets.get(binary_name)
+        binary_sha256 = assets.get(binary_sha256_name)
+        if binary and binary_sha256:
+            delta = assets.get(binary_delta_name) if binary_delta_name else None
+            return cls(
+                version,
+                binary_name,
+                binary_url=binary.get("browser_download_url"),
+                binary_sha256_url=binary_sha256.get("browser_download_url"),
+                binary_size=binary.get("size"),
+                delta_url=delta.get("browser_download_url") if delta else None,
+                delta_size=delta.get("size") if delta else None,
+            )
         log.debug(
             f"No release for {BINARY_NAME} {version} compatible with {platform} was found in: "
             f"{json.dumps(release_data, indent=2)}"
@@ -64,11 +115,87 @@ class Release:
         return None
 
 
-def fetch_github_api(ptex: Ptex, path: str, github_api_bearer_token: str | None = None) -> Any:
+def fetch_github_api(
+    ptex: Ptex,
+    path: str,
+    github_api_bearer_token: str | None = None,
+    metadata_cache: MetadataCache | None = None,
+) -> Any:
     headers = (
         {"Authorization": f"Bearer {github_api_bearer_token}"} if github_api_bearer_token else {}
     )
-    return ptex.fetch_json(f"{GITHUB_API_BASE_URL}/{path}", **headers)
+    url = f"{GITHUB_API_BASE_URL}/{path}"
+    if metadata_cache:
+        return fetch_with_retries(url, lambda: metadata_cache.fetch_json(ptex, url, **headers))
+    return fetch_with_retries(url, lambda: ptex.fetch_json(url, **headers))
+
+
+def fetch_with_retries(url: str, fetch: Callable[[], _T]) -> _T:
+    for attempt in range(1, FETCH_ATTEMPTS + 1):
+        try:
+            return fetch()
+        except CalledProcessError as e:
+            # N.B.: The ptex binary is used whenever a proxy is configured; so its failures are
+            # as likely to be transient as those of the in-process client.
+            if attempt >= PTEX_FETCH_ATTEMPTS:
+                raise
+            delay = random.uniform(0, 2**attempt)
+            warn(f"Fetching {url} failed (ptex exited {e.returncode}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+        except OSError as e:
+            http_error = e if isinstance(e, HTTPStatusError) else None
+            if attempt == FETCH_ATTEMPTS or (http_error and not http_error.transient):
+                raise
+            retry_after = http_error.retry_after if http_error else None
+            if retry_after is not None and retry_after > MAX_RETRY_AFTER_SECS:
+                raise
+            delay = retry_after or random.uniform(0, 2**attempt)
+            reason = f"HTTP {http_error.status}" if http_error else str(e)
+            warn(f"Fetching {url} failed ({reason}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+    raise AssertionError("Unreachable")
+
+
+@dataclass(frozen=True)
+class Mirror:
+    """A mirror of the releases, so a fleet of hosts can update without all querying GitHub.
+
+    The mirror is a static tree; so any web server or a shared filesystem (via `file://`) will do:
+
+      releases.json                 The releases, as listed by the GitHub API `releases` endpoint.
+      download/<tag>/<asset name>   The assets of each release.
+
+    Asset URLs in `releases.json` are ignored in favor of the mirror's `download/` tree.
+    """
+
+    base_url: str
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url.rstrip('/')}/{path}"
+
+    def _localize(self, release_data: dict[str, Any]) -> dict[str, Any]:
+        tag_name = release_data.get("tag_name")
+        return {
+            **release_data,
+            "assets": [
+                {
+                    **asset,
+                    "browser_download_url": self._url(f"download/{tag_name}/{asset.get('name')}"),
+                }
+                for asset in release_data.get("assets", [])
+            ],
+        }
+
+    def fetch_releases(
+        self, ptex: Ptex, metadata_cache: MetadataCache | None = None
+    ) -> list[dict[str, Any]]:
+        url = self._url("releases.json")
+        # N.B.: Re-reading a local file is as cheap as checking the cache.
+        if metadata_cache and not url.startswith("file:"):
+            releases = fetch_with_retries(url, lambda: metadata_cache.fetch_json(ptex, url))
+        else:
+            releases = fetch_with_retries(url, lambda: ptex.fetch_json(url))
+        return [self._localize(release_data) for release_data in releases]
 
 
 class ReleaseNotFoundError(Exception):
@@ -76,34 +203,72 @@ class ReleaseNotFoundError(Exception):
 
 
 def get_release(
-    ptex: Ptex, platform: str, version: str, github_api_bearer_token: str | None = None
+    ptex: Ptex,
+    platform: str,
+    version: str,
+    github_api_bearer_token: str | None = None,
+    metadata_cache: MetadataCache | None = None,
+    delta_from: Version | None = None,
+    mirror: Mirror | None = None,
 ) -> Release:
     try:
-        release_data = cast(
-            dict[str, Any],
-            fetch_github_api(
-                ptex, f"releases/tags/v{version}", github_api_bearer_token=github_api_bearer_token
-            ),
-        )
+        if mirror:
+            tag_name = f"v{version}"
+            maybe_release_data = next(
+                (
+                    release_data
+                    for release_data in mirror.fetch_releases(ptex, metadata_cache=metadata_cache)
+                    if release_data.get("tag_name") == tag_name
+                ),
+                None,
+            )
+            if maybe_release_data is None:
+                raise ReleaseNotFoundError(f"{mirror.base_url} has no {tag_name} release.")
+            release_data = maybe_release_data
+        else:
+            release_data = cast(
+                dict[str, Any],
+                fetch_github_api(
+                    ptex,
+                    f"releases/tags/v{version}",
+                    github_api_bearer_token=github_api_bearer_token,
+                    metadata_cache=metadata_cache,
+                ),
+            )
     except (CalledProcessError, OSError) as e:
         raise ReleaseNotFoundError(str(e))
 
-    release = Release.from_api_response(Version(version), platform, release_data)
+    release = Release.from_api_response(
+        packaging_version.Version(version), platform, release_data, delta_from=delta_from
+    )
     if release is None:
         raise ReleaseNotFoundError(f"There were no compatible artifacts for {platform}.")
 
     return release
 
 
-def find_latest_production_release(
-    ptex: Ptex, platform: str, github_api_bearer_token: str | None = None
-) -> Release | None:
-    releases = cast(
-        list[dict[str, Any]],
-        fetch_github_api(ptex, "releases", github_api_bearer_token=github_api_bearer_token),
-    )
-
-    latest_releases = []
+def iter_production_release_pages(
+    ptex: Ptex,
+    github_api_bearer_token: str | None = None,
+    metadata_cache: MetadataCache | None = None,
+    mirror: Mirror | None = None,
+) -> Iterator[list[tuple[Version, dict[str, Any]]]]:
+    """Yields the stable releases on each page of releases in the order they are listed.
+
+    Pages are only fetched as iteration reaches them.
+    """
+    for releases in _iter_release_pages(
+        ptex,
+        github_api_bearer_token=github_api_bearer_token,
+        metadata_cache=metadata_cache,
+        mirror=mirror,
+    ):
+        yield list(_production_releases(releases))
+
+
+def _production_releases(
+    releases: list[dict[str, Any]],
+) -> Iterator[tuple[Version, dict[str, Any]]]:
     for release_data in releases:
         if release_data.get("draft") or release_data.get("prerelease"):
             continue
@@ -116,64 +281,240 @@ def find_latest_production_release(
                 f"Skipping tag {tag_name} since it does not match {RELEASE_TAG_MATCHER.pattern}"
             )
             continue
-        version = Version(match["version"])
-        release = Release.from_api_response(version, platform, release_data)
-        if release:
-            latest_releases.append(release)
+        yield packaging_version.Version(match["version"]), release_data
+
+
+def _iter_release_pages(
+    ptex: Ptex,
+    github_api_bearer_token: str | None = None,
+    metadata_cache: MetadataCache | None = None,
+    mirror: Mirror | None = None,
+) -> Iterator[list[dict[str, Any]]]:
+    if mirror:
+        yield mirror.fetch_releases(ptex, metadata_cache=metadata_cache)
+        return
+    page = 1
+    while True:
+        releases = cast(
+            list[dict[str, Any]],
+            fetch_github_api(
+                ptex,
+                f"releases?per_page={RELEASES_PER_PAGE}&page={page}",
+                github_api_bearer_token=github_api_bearer_token,
+                metadata_cache=metadata_cache,
+            ),
+        )
+        yield releases
+        if len(releases) < RELEASES_PER_PAGE:
+            return
+        page += 1
 
-    if not latest_releases:
+
+def find_latest_production_release(
+    ptex: Ptex,
+    platform: str,
+    github_api_bearer_token: str | None = None,
+    metadata_cache: MetadataCache | None = None,
+    newer_than: Version | None = None,
+    mirror: Mirror | None = None,
+) -> Release | None:
+    """Finds the highest versioned stable release with an artifact for `platform`.
+
+    If `newer_than` is given, only releases above it are considered and paging stops after the
+    first page whose releases are all at or below it. GitHub lists releases by creation date, not
+    version; so a backport (e.g.: 0.9.5 published after 1.1.0) can sit among newer releases on a
+    page, but a whole page of older versions means the pages after it hold no newer ones. It is
+    also the version the release's delta, if any, is looked for against.
+    """
+    latest: Release | None = None
+    for releases in iter_production_release_pages(
+        ptex,
+        github_api_bearer_token=github_api_bearer_token,
+        metadata_cache=metadata_cache,
+        mirror=mirror,
+    ):
+        newer_releases = [
+            (version, release_data)
+            for version, release_data in releases
+            if newer_than is None or version > newer_than
+        ]
+        if releases and not newer_releases:
+            break
+        for version, release_data in newer_releases:
+            if latest is not None and version <= latest.version:
+                continue
+            release = Release.from_api_response(
+                version, platform, release_data, delta_from=newer_than
+            )
+            if release:
+                latest = release
+
+    if latest is None:
         log.debug(
-            f"No releases for {BINARY_NAME} compatible with {platform} found in: "
-            f"{json.dumps(releases, indent=2)}"
+            f"No releases for {BINARY_NAME}"
+            + (f" newer than {newer_than}" if newer_than is not None else "")
+            + f" compatible with {platform} were found."
         )
-        return None
+    return latest
+
+
+def _rebuild_from_delta(
+    release: Release,
+    delta_result: FetchResult,
+    scie: Path,
+    expected_sha256: str,
+    dest: Path,
+    artifact_cache: ArtifactCache,
+) -> bool:
+    """Rebuilds the release binary at `dest` from the running `scie` and the release's delta.
+
+    Returns `False` if that fails, in which case the full binary should be downloaded instead.
+    """
+    assert release.delta_url is not None
+    try:
+        delta = delta_result.result().path
+        assert delta is not None
+        actual_sha256 = scie_delta.apply(base=scie, delta=delta, out=dest)
+    except (CalledProcessError, OSError, ValueError) as e:
+        log.info(f"Could not update using the delta {release.delta_url}: {e}")
+        artifact_cache.discard(release.delta_url)
+        return False
+    if actual_sha256 != expected_sha256:
+        log.warning(
+            f"The binary rebuilt from {release.delta_url} has sha256 {actual_sha256} but "
+            f"{release.binary_sha256_url} expects {expected_sha256}."
+        )
+        artifact_cache.discard(release.delta_url)
+        return False
+    log.debug(f"Rebuilt {release.file_name} from the delta {release.delta_url}.")
+    return True
+
+
+def staged_path(scie: Path) -> Path:
+    """Where a new binary is assembled and verified before it replaces `scie`.
+
+    N.B.: It lives beside `scie` so that the final rename is on one filesystem and thus atomic.
+    """
+    return scie.with_name(f".{scie.name}.{os.getpid()}.update")
+
 
-    # We want the highest version; so this needs to be a reverse sort.
-    latest_releases.sort(reverse=True, key=lambda rel: rel.version)
-    return latest_releases[0]
+def install_release(
+    ptex: Ptex, release: Release, scie: Path, artifact_cache: ArtifactCache | None = None
+) -> str:
+    """Installs `release` over `scie` and returns the version the installed binary reports.
 
+    The new binary is staged beside `scie`, made durable and verified to run and report the release
+    version before it atomically replaces `scie`; so however an update fails or is interrupted,
+    `scie` is either the old binary or the new one, never missing or partially written.
+    """
+    binary = staged_path(scie)
+    try:
+        _stage_release(release, scie, artifact_cache or ArtifactCache.from_env(ptex), dest=binary)
+        with span("verify_release"):
+            try:
+                version = verify_release(binary)
+            except (CalledProcessError, OSError):
+                warn(f"Failed to verify {BINARY_NAME} {release.version} staged at {binary}.")
+                raise
+        if release.version != packaging_version.Version(version):
+            raise ValueError(
+                f"The {BINARY_NAME} {release.version} binary from {release.binary_url} reports "
+                f"version {version}; leaving {scie} as it was."
+            )
+        os.replace(binary, scie)
+    finally:
+        binary.unlink(missing_ok=True)
+    _fsync_dir(scie.parent)
+    return version
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _stage_release(release: Release, scie: Path, artifact_cache: ArtifactCache, dest: Path) -> None:
+    """Writes the `release` binary to `dest`, verified against its published sha256."""
+    # N.B.: The checksum and the binary (or the delta that rebuilds it from the running scie) are
+    # fetched concurrently; so the binary is verified once both have arrived rather than as it
+    # downloads. All are release assets, which never change; so they are cached by URL, and an
+    # interrupted download resumes where it left off on the next update attempt.
+    binary_fetch = Fetch(release.binary_url, expected_size=release.binary_size)
+    checksum_result, artifact_result = artifact_cache.fetch_many(
+        [
+            Fetch(release.binary_sha256_url),
+            (
+                Fetch(release.delta_url, expected_size=release.delta_size)
+                if release.delta_url
+                else binary_fetch
+            ),
+        ]
+    )
 
-def install_release(ptex: Ptex, release: Release, scie: Path) -> Path:
     # The `.sha256` checksum file format is a single line with two fields, space separated.
     # The 1st field is the hexadecimal checksum and the second field the name of the file it applies
     # to. See: https://man7.org/linux/man-pages/man1/sha256sum.1.html
-    expected_sha256, _ = ptex.fetch_text(release.binary_sha256_url).strip().split(" ", maxsplit=1)
-
-    download_dir = Path(tempfile.mkdtemp())
-    atexit.register(shutil.rmtree, download_dir, ignore_errors=True)
-
-    binary = download_dir / release.file_name
-    with open(binary, "wb") as fp:
-        ptex.fetch_to_fp(release.binary_url, fp)
-
-    # TODO(John Sirois): Ideally this would not be 2-pass and we'd hash the download stream inline.
-    digest = hashlib.sha256()
-    with open(binary, "rb") as fp:
-        for chunk in iter(lambda: fp.read(io.DEFAULT_BUFFER_SIZE), b""):
-            digest.update(chunk)
-    actual_sha256 = digest.hexdigest()
-    if expected_sha256 != actual_sha256:
-        eol = os.linesep
+    checksum_path = checksum_result.result().path
+    assert checksum_path is not None
+    expected_sha256 = checksum_path.read_text(errors="replace").strip().split(" ", maxsplit=1)[0]
+    if not SHA256_MATCHER.match(expected_sha256):
+        # N.B.: The checksum file is cached by URL alone; so a bad one must not outlive this
+        # attempt.
+        artifact_cache.discard(release.binary_sha256_url)
         raise ValueError(
-            f"The binary downloaded from {release.binary_url} is invalid.{eol}"
-            f"The expected fingerprint from {release.binary_sha256_url} was:{eol}"
-            f"  {expected_sha256}{eol}"
-            f"The actual fingerprint of the downloaded file is:{eol}"
-            f"  {actual_sha256}",
+            f"The checksum file downloaded from {release.binary_sha256_url} is invalid; it does "
+            f"not start with a hexadecimal sha256."
         )
+    expected_sha256 = expected_sha256.lower()
 
-    # Mark the binary as executable. This is needed on Unix but not on Windows, where its harmless.
-    binary.chmod(0o755)
+    if not release.delta_url or not _rebuild_from_delta(
+        release, artifact_result, scie, expected_sha256, dest=dest, artifact_cache=artifact_cache
+    ):
+        binary_result = (
+            artifact_cache.fetch_many([binary_fetch])[0] if release.delta_url else artifact_result
+        )
+        cached_binary = None
+        try:
+            cached_binary = binary_result.result().path
+            actual_sha256 = binary_result.sha256
+        except FingerprintMismatchError as e:
+            actual_sha256 = e.actual_sha256
+        if cached_binary is None or actual_sha256 != expected_sha256:
+            # N.B.: Either could be the bad one; so the next update attempt fetches both afresh.
+            artifact_cache.discard(release.binary_sha256_url)
+            artifact_cache.discard(release.binary_url)
+            eol = os.linesep
+            raise ValueError(
+                f"The binary downloaded from {release.binary_url} is invalid.{eol}"
+                f"The expected fingerprint from {release.binary_sha256_url} was:{eol}"
+                f"  {expected_sha256}{eol}"
+                f"The actual fingerprint of the downloaded file is:{eol}"
+                f"  {actual_sha256 or f'<aborted after exceeding {release.binary_size} bytes>'}",
+            )
 
-    # We first move the running scie before replacing it. This satisfies Windows constraints
-    # surrounding manipulation of running binaries.
-    backup = scie.rename(scie.with_suffix(".bak"))
+        _link_or_copy(cached_binary, dest)
+
+    # N.B.: The rename over `scie` must not land before the content it points at does.
+    dest.chmod(0o755)
+    with dest.open("rb") as fp:
+        os.fsync(fp.fileno())
+
+
+def _link_or_copy(cached_binary: Path, dest: Path) -> None:
+    # N.B.: A failed delta rebuild may have left a partial `dest` behind.
+    dest.unlink(missing_ok=True)
     try:
-        shutil.move(str(binary), str(scie))
-    except OSError:
-        warn(f"A backup is saved in {backup}")
-        raise
-    return backup
+        # N.B.: Cache entries are only ever replaced, never written in place; so sharing the inode
+        # with the cache is safe and saves reading and writing the whole binary again.
+        os.link(cached_binary, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        log.debug(f"{cached_binary} is on another filesystem than {dest}; copying it.")
+        shutil.copyfile(cached_binary, dest)
 
 
 def verify_release(scie: PurePath) -> str:
@@ -214,7 +555,7 @@ def main() -> NoReturn:
     )
     parser.add_argument(
         "--current-version",
-        type=Version,
+        type=packaging_version.Version,
         required=True,
         # The version of the current scie executable.
         help=argparse.SUPPRESS,
@@ -231,53 +572,103 @@ def main() -> NoReturn:
         default=None,
         help="The version of scie-pikesquares to update to; defaults to the latest stable version",
     )
+    parser.add_argument(
+        "--mirror-url",
+        default=os.environ.get("PIKESQUARES_UPDATE_MIRROR_URL") or None,
+        help=(
+            "Read releases and their artifacts from this mirror instead of GitHub; it may be a "
+            "file:// URL. The mirror holds a releases.json listing releases as the GitHub API "
+            "does and their assets under download/<tag>/. Defaults to "
+            "$PIKESQUARES_UPDATE_MIRROR_URL."
+        ),
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=os.environ.get("PIKESQUARES_UPDATE_JITTER") or "0",
+        metavar="SECONDS",
+        help=(
+            "Wait a random time of up to this many seconds before checking for an update; so a "
+            "fleet of hosts updating on the same schedule spreads its load on the release host. "
+            "Defaults to $PIKESQUARES_UPDATE_JITTER or 0."
+        ),
+    )
+    parser.add_argument(
+        "--check-only",
+        action="store_true",
+        help=(
+            "Only check whether an update is available and report the release that would be "
+            "installed as JSON on stdout."
+        ),
+    )
     options = parser.parse_args()
 
     # N.B.: This installs an excepthook that gracefully handles uncaught exceptions; so any raises
     # or uncaught exceptions below here are clean ways to exit non-zero with useful console output.
     init_logging(base_dir=options.base_dir, log_name="update")
 
+    if options.jitter > 0:
+        delay = random.uniform(0, options.jitter)
+        log.debug(f"Waiting {delay:.1f}s before checking for an update.")
+        with span("jitter"):
+            time.sleep(delay)
+
     ptex = get_ptex(options)
-    if options.version is not None:
-        try:
-            release = get_release(
+    metadata_cache = MetadataCache.from_base_dir(options.base_dir)
+    mirror = Mirror(options.mirror_url) if options.mirror_url else None
+    release: Release | None
+    with span("resolve_release"):
+        if options.version is not None:
+            try:
+                release = get_release(
+                    ptex,
+                    version=options.version,
+                    platform=options.platform,
+                    github_api_bearer_token=options.github_api_bearer_token,
+                    metadata_cache=metadata_cache,
+                    delta_from=options.current_version,
+                    mirror=mirror,
+                )
+            except ReleaseNotFoundError as e:
+                fatal(f"Failed to find {BINARY_NAME} release for version {options.version}: {e}")
+        else:
+            maybe_release = find_latest_production_release(
                 ptex,
-                version=options.version,
                 platform=options.platform,
                 github_api_bearer_token=options.github_api_bearer_token,
+                metadata_cache=metadata_cache,
+                newer_than=options.current_version,
+                mirror=mirror,
+            )
+            if maybe_release and maybe_release.version > options.current_version:
+                release = maybe_release
+            else:
+                release = None
+
+    if options.check_only:
+        print(
+            json.dumps(
+                {
+                    "current_version": str(options.current_version),
+                    "update_available": (
+                        release is not None and release.version != options.current_version
+                    ),
+                    "release": (
+                        {**asdict(release), "version": str(release.version)} if release else None
+                    ),
+                },
+                indent=2,
             )
-        except ReleaseNotFoundError as e:
-            fatal(f"Failed to find {BINARY_NAME} release for version {options.version}: {e}")
-    else:
-        maybe_release = find_latest_production_release(
-            ptex, platform=options.platform, github_api_bearer_token=options.github_api_bearer_token
         )
-        if not maybe_release or maybe_release.version <= options.current_version:
-            info(f"No new releases of {BINARY_NAME} were found.")
-            sys.exit(0)
-        release = maybe_release
+        sys.exit(0)
+    if release is None:
+        info(f"No new releases of {BINARY_NAME} were found.")
+        sys.exit(0)
 
     scie = options.scie
-    backup = install_release(ptex, release, scie)
-    try:
-        version = verify_release(scie)
-    except (CalledProcessError, OSError):
-        warn(f"Failed to verify {BINARY_NAME} {release.version} installation at {scie}.")
-        warn(f"A backup is saved in {backup}")
-        raise
-
-    if release.version != Version(version):
-        warn(f"A backup is saved in {backup}")
-        fatal(
-            f"Installed {BINARY_NAME} {release.version} to {scie} but the installation reports "
-            f"version {version}."
-        )
-
+    with span("install_release"):
+        version = install_release(ptex, release, scie)
     info(f"Successfully installed {BINARY_NAME} {version} to {scie}")
-    try:
-        backup.unlink(missing_ok=True)
-    except OSError as e:
-        warn(f"Failed to remove old version of {BINARY_NAME} at {backup}: {e}")
     sys.exit(0)
 
 
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from scie_pikesquares.ptex import CHUNK_SIZE
+from scie_pikesquares.streaming import run_streaming
+from scie_pikesquares.task_graph import Task, run_tasks
+
+log = logging.getLogger(__name__)
+
+BUILDCONF = "pikesquares"
+PLUGINS = ("corerouter", "http", "python", "logfile")
+
+# The uwsgi checkout paths (besides a plugin's own directory) that feed into the core binary and
+# every plugin.
+CORE_SOURCES = ("core", "proto", "lib", "buildconf", "uwsgi.h", "uwsgiconfig.py")
+PLUGIN_SOURCES = ("buildconf", "uwsgi.h", "uwsgiconfig.py")
+
+# Files a build writes into the source tree; hashing them would make every build look stale.
+_BUILD_OUTPUT_SUFFIXES = (".o", ".so", ".a", ".pyc", ".fingerprint")
+# N.B.: uwsgiconfig.py generates these sources from uwsgi.h and itself on every core build.
+_BUILD_OUTPUT_PATHS = frozenset(("core/dot_h.c", "core/config_py.c"))
+
+
+class UWSGIBuildError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class BuildPython:
+    """The facts about the Python uwsgiconfig.py runs under that uwsgi builds depend on."""
+
+    @classmethod
+    def probe(cls, python_bin: Path) -> BuildPython:
+        result = subprocess.run(
+            args=[
+                str(python_bin),
+                "-c",
+                "import json, sys, sysconfig; "
+                "print(json.dumps({"
+                "'version': f'{sys.version_info[0]}{sys.version_info[1]}', "
+                "'soabi': sysconfig.get_config_var('SOABI') or '', "
+                "'cc': sysconfig.get_config_var('CC') or ''}))",
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+            text=True,
+        )
+        data = json.loads(result.stdout)
+        # N.B.: This is the same precedence uwsgiconfig.py uses to pick its compiler.
+        cc = os.environ.get("CC") or data["cc"] or "gcc"
+        return cls(bin=python_bin, version=data["version"], soabi=data["soabi"], cc=cc)
+
+    bin: Path
+    # The `{major}{minor}` version uwsgi suffixes its python plugin with, e.g.: `312`.
+    version: str
+    soabi: str
+    cc: str
+
+    def compiler_id(self) -> str:
+        try:
+            result = subprocess.run(
+                args=[*self.cc.split(), "--version"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except OSError as e:
+            raise UWSGIBuildError(f"Failed to run the uWSGI compiler `{self.cc}`: {e}")
+        return f"{self.cc}\0{result.stdout}"
+
+
+def fingerprint(uwsgi_dir: Path, sources: Iterable[str], python: BuildPython) -> str:
+    """Returns a hash of the source trees, buildconf and Python version a build depends on."""
+    digest = hashlib.sha256(f"{BUILDCONF}\0{python.version}\0".encode())
+    for source in sorted(sources):
+        root = uwsgi_dir / source
+        paths = [root] if root.is_file() else sorted(root.rglob("*"))
+        for path in paths:
+            if not path.is_file() or path.name.endswith(_BUILD_OUTPUT_SUFFIXES):
+                continue
+            relpath = path.relative_to(uwsgi_dir).as_posix()
+            if relpath in _BUILD_OUTPUT_PATHS:
+                continue
+            # N.B.: Including the relative path catches renames and moves, not just edits.
+            digest.update(f"{relpath}\0".encode())
+            with path.open("rb") as fp:
+                for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _submodule_commit(uwsgi_dir: Path) -> str | None:
+    """Returns the commit the uwsgi checkout is at, or `None` if it has local modifications."""
+    try:
+        head = subprocess.run(
+            args=["git", "rev-parse", "HEAD"],
+            cwd=uwsgi_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            args=["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=uwsgi_dir,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return None if status.strip() else head
+
+
+@dataclass(frozen=True)
+class BuildCache:
+    """A cache of built uwsgi binaries and plugins shared by all checkouts and versions on a host.
+
+    Entries are keyed by the uwsgi submodule commit, buildconf contents, compiler and Python ABI;
+    so a checkout with local modifications to uwsgi is never served from (or stored in) the cache.
+    """
+
+    cache_dir: Path
+
+    def key(self, uwsgi_dir: Path, python: BuildPython) -> str | None:
+        commit = _submodule_commit(uwsgi_dir)
+        if commit is None:
+            log.info(f"The uWSGI checkout at {uwsgi_dir} is not a clean commit; not caching.")
+            return None
+        buildconf = (uwsgi_dir / "buildconf" / f"{BUILDCONF}.ini").read_bytes()
+        digest = hashlib.sha256(f"{commit}\0{python.soabi}\0{python.compiler_id()}\0".encode())
+        digest.update(buildconf)
+        return digest.hexdigest()
+
+    def get(self, key: str, name: str) -> Path | None:
+        entry = self.cache_dir / key / name
+        return entry if entry.exists() else None
+
+    def put(self, key: str, output: Path) -> Path:
+        entry_dir = self.cache_dir / key
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        entry = entry_dir / output.name
+        with tempfile.NamedTemporaryFile(
+            dir=entry_dir, prefix=f".{output.name}.", delete=False
+        ) as fp:
+            try:
+                with output.open("rb") as src:
+                    shutil.copyfileobj(src, fp)
+                shutil.copymode(output, fp.name)
+            except BaseException:
+                os.unlink(fp.name)
+                raise
+        # Concurrent builders of the same key race harmlessly; the outputs are interchangeable.
+        os.replace(fp.name, entry)
+        return entry
+
+
+def _fingerprint_file(output: Path) -> Path:
+    return output.with_name(f"{output.name}.fingerprint")
+
+
+def _up_to_date(output: Path, expected_fingerprint: str) -> bool:
+    try:
+        return output.exists() and _fingerprint_file(output).read_text() == expected_fingerprint
+    except FileNotFoundError:
+        return False
+
+
+def _uwsgiconfig(uwsgi_dir: Path, python_bin: Path, *args: str, label: str, **env: str) -> None:
+    result = run_streaming(
+        args=[str(python_bin.resolve()), "./uwsgiconfig.py", *args],
+        env={**os.environ, **env},
+        cwd=uwsgi_dir,
+        # N.B.: Plugins build concurrently; so their interleaved output needs telling apart.
+        label=label,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise UWSGIBuildError(
+            f"`uwsgiconfig.py {' '.join(args)}` failed with exit code {result.returncode}:\n"
+            f"{result.stderr.decode()}"
+        )
+
+
+def build_core(uwsgi_dir: Path, python: BuildPython) -> Path:
+    """Builds the uwsgi core binary unless its current build already matches its sources."""
+    binary = uwsgi_dir / "uwsgi"
+    expected_fingerprint = fingerprint(uwsgi_dir, CORE_SOURCES, python)
+    if _up_to_date(binary, expected_fingerprint):
+        log.info(f"The uWSGI binary at {binary} is up to date.")
+        return binary
+
+    # N.B.: A build that fails part way must not be mistaken for up to date should its sources
+    # later revert to match the prior fingerprint.
+    _fingerprint_file(binary).unlink(missing_ok=True)
+    # N.B.: uwsgiconfig.py compiles the core's objects in parallel using CPUCOUNT jobs.
+    _uwsgiconfig(
+        uwsgi_dir,
+        python.bin,
+        "--build",
+        BUILDCONF,
+        label="uwsgi",
+        CPUCOUNT=str(os.cpu_count() or 1),
+    )
+    _fingerprint_file(binary).write_text(expected_fingerprint)
+    return binary
+
+
+def build_plugin(plugin: str, uwsgi_dir: Path, python: BuildPython) -> Path:
+    """Builds a uwsgi plugin unless its current build already matches its sources."""
+    plugin_name = f"python{python.version}" if plugin == "python" else plugin
+    so = uwsgi_dir / f"{plugin_name}_plugin.so"
+    expected_fingerprint = fingerprint(uwsgi_dir, (*PLUGIN_SOURCES, f"plugins/{plugin}"), python)
+    if _up_to_date(so, expected_fingerprint):
+        log.info(f"The uWSGI {plugin} plugin at {so} is up to date.")
+        return so
+
+    _fingerprint_file(so).unlink(missing_ok=True)
+    _uwsgiconfig(
+        uwsgi_dir,
+        python.bin,
+        "--plugin",
+        f"plugins/{plugin}",
+        BUILDCONF,
+        plugin_name,
+        label=plugin_name,
+    )
+    _fingerprint_file(so).write_text(expected_fingerprint)
+    return so
+
+
+def _cached(
+    cache: BuildCache | None, key: str | None, name: str, build: Callable[[], Path]
+) -> Path:
+    if cache is None or key is None:
+        return build()
+    entry = cache.get(key, name)
+    if entry:
+        log.info(f"Using the cached uWSGI build {entry}.")
+        return entry
+    return cache.put(key, build())
+
+
+def _link_plugin(so: Path, plugins_dir: Path) -> None:
+    link = plugins_dir / so.name
+    # N.B.: Re-point existing links too; they may refer to a checkout that has since moved on.
+    tmp_link = link.with_name(f".{link.name}.{os.getpid()}")
+    tmp_link.unlink(missing_ok=True)
+    tmp_link.symlink_to(so.resolve())
+    os.replace(tmp_link, link)
+
+
+def build_uwsgi(
+    uwsgi_dir: Path,
+    python_bin: Path,
+    buildconf: Path,
+    plugins_dir: Path,
+    plugins: Iterable[str] = PLUGINS,
+    cache: BuildCache | None = None,
+    max_workers: int | None = None,
+) -> dict[str, Path]:
+    """Builds the uwsgi binary and then all of `plugins` concurrently.
+
+    Builds found in `cache` are used as-is and new builds are added to it. Each plugin is linked
+    into `plugins_dir`. Returns a mapping of "uwsgi" and each plugin to its build output.
+    """
+    # N.B.: Only copy a changed buildconf so that an unchanged one leaves the tree as it was.
+    installed_buildconf = uwsgi_dir / "buildconf" / f"{BUILDCONF}.ini"
+    if not (
+        installed_buildconf.exists() and buildconf.read_bytes() == installed_buildconf.read_bytes()
+    ):
+        shutil.copy(buildconf, installed_buildconf)
+    python = BuildPython.probe(python_bin)
+    key = cache.key(uwsgi_dir, python) if cache else None
+
+    def plugin_task(plugin: str) -> Task:
+        plugin_name = f"python{python.version}" if plugin == "python" else plugin
+
+        def build(uwsgi: Path) -> Path:
+            so = _cached(
+                cache,
+                key,
+                f"{plugin_name}_plugin.so",
+                lambda: build_plugin(plugin, uwsgi_dir, python),
+            )
+            _link_plugin(so, plugins_dir)
+            return so
+
+        return Task(plugin, build, requires=("uwsgi",))
+
+    tasks = [
+        Task("uwsgi", lambda: _cached(cache, key, "uwsgi", lambda: build_core(uwsgi_dir, python))),
+        *(plugin_task(plugin) for plugin in plugins),
+    ]
+    return run_tasks(tasks, max_workers=max_workers or os.cpu_count())
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from scie_pikesquares.ptex import CHUNK_SIZE
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LinkStats:
+    files: int
+    linked: int
+    bytes_saved: int
+
+
+def _site_packages_files(venv_dir: Path) -> Iterator[Path]:
+    for site_packages in venv_dir.glob("lib/python*/site-packages"):
+        for root, _, files in os.walk(site_packages):
+            for file in files:
+                path = Path(root) / file
+                if path.is_file() and not path.is_symlink():
+                    yield path
+
+
+def _object_key(path: Path) -> tuple[Path, os.stat_result]:
+    st = path.stat()
+    digest = hashlib.sha256()
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    # N.B.: Permissions belong to the inode all links share; so files only differing in their
+    # executable bit must not be merged.
+    executable = "x" if st.st_mode & stat.S_IXUSR else "f"
+    hexdigest = digest.hexdigest()
+    return Path(hexdigest[:2]) / f"{hexdigest}.{executable}", st
+
+
+def _link(path: Path, store_dir: Path) -> int:
+    key, st = _object_key(path)
+    obj = store_dir / key
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        try:
+            os.link(path, obj)
+            return 0
+        except FileExistsError:
+            pass
+
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.link")
+        try:
+            obj_st = obj.stat()
+            if (obj_st.st_dev, obj_st.st_ino) == (st.st_dev, st.st_ino):
+                return 0
+            os.link(obj, tmp)
+        except FileNotFoundError:
+            # A concurrent garbage collection removed the object; so adopt ours instead.
+            continue
+        os.replace(tmp, path)
+        return st.st_size
+
+
+def link_into_store(venv_dir: Path, store_dir: Path, max_workers: int | None = None) -> LinkStats:
+    """Replaces venv site-packages files with hard links into a content-addressed store.
+
+    Files with identical content across venvs (i.e.: the same wheel installed into several
+    PikeSquares versions) then share a single copy on disk.
+    """
+    files = list(_site_packages_files(venv_dir))
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        saved = list(executor.map(lambda path: _link(path, store_dir), files))
+    return LinkStats(
+        files=len(files),
+        linked=sum(1 for size in saved if size),
+        bytes_saved=sum(saved),
+    )
+
+
+def collect_garbage(store_dir: Path) -> int:
+    """Removes store objects no venv links to anymore and returns the number of bytes freed."""
+    freed = 0
+    for obj in store_dir.glob("??/*"):
+        try:
+            st = obj.stat()
+        except FileNotFoundError:
+            continue
+        # The store's own link is the only one left.
+        if st.st_nlink == 1:
+            log.debug(f"Removing unreferenced venv store object {obj}")
+            obj.unlink(missing_ok=True)
+            freed += st.st_size
+    return freed
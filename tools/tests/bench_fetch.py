@@ -0,0 +1,83 @@
+"""Times the per-fetch overhead of the Ptex backends against a local server.
+
+Run from the tools dir with `PYTHONPATH=src python tests/bench_fetch.py`, or via `just bench-fetch`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import time
+from typing import Callable
+
+from local_server import serve
+
+from scie_pikesquares.ptex import Fetch, Ptex
+from scie_pikesquares.ptex_http import HttpPtex
+
+
+def best_per_call_ms(func: Callable[[], object], calls: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200, help="Fetches per timing run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported.")
+    parser.add_argument(
+        "--ptex-path",
+        help="A ptex binary to time the subprocess backend with; spawning `true` is timed instead.",
+    )
+    options = parser.parse_args()
+
+    with serve() as server:
+        # A document the size of a page of the GitHub releases listing, trimmed.
+        body = json.dumps([{"tag_name": f"v0.1.{i}", "assets": []} for i in range(100)]).encode()
+        server.content["/releases.json"] = body
+        url = server.url("releases.json")
+
+        def timed(func: Callable[[], object]) -> float:
+            return best_per_call_ms(func, calls=options.calls, repeat=options.repeat)
+
+        keep_alive = HttpPtex("ptex")
+        rows = [
+            ("keep-alive", timed(lambda: keep_alive.fetch_json(url))),
+            ("new connection", timed(lambda: HttpPtex("ptex").fetch_json(url))),
+        ]
+        if options.ptex_path:
+            subprocess_ptex = Ptex(options.ptex_path)
+            rows.append(("ptex subprocess", timed(lambda: subprocess_ptex.fetch_json(url))))
+        else:
+            # N.B.: A lower bound for the subprocess backend; ptex itself does more than `true`.
+            true = shutil.which("true") or "/bin/true"
+            rows.append(("spawn `true`", timed(lambda: subprocess.run([true], check=True))))
+
+        fetches = [Fetch(url=url) for _ in range(16)]
+        for workers in (1, 4):
+            rows.append(
+                (
+                    f"fetch_many x16, {workers} worker(s)",
+                    best_per_call_ms(
+                        lambda: keep_alive.fetch_many(fetches, max_workers=workers),
+                        calls=max(1, options.calls // 16),
+                        repeat=options.repeat,
+                    )
+                    / len(fetches),
+                )
+            )
+
+    print(f"Per-fetch time of a {len(body)} byte JSON document (best of {options.repeat}):")
+    for label, ms in rows:
+        print(f"  {label:<32} {ms:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Times finding the latest release in a synthetic 5,000 release listing.
+
+Run from the tools dir with `PYTHONPATH=src python tests/bench_releases.py`, or via
+`just bench-releases`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable
+
+from packaging.version import Version
+from release_fixture import PagedPtex, synthetic_releases
+
+from scie_pikesquares.update_scie_pikesquares import (
+    Release,
+    find_latest_production_release,
+    iter_production_release_pages,
+)
+
+PLATFORM = "linux-x86_64"
+
+
+def sort_all(ptex: PagedPtex) -> Release | None:
+    """The approach the scan replaced: build a Release for every stable release and sort them."""
+    releases = [
+        release
+        for page in iter_production_release_pages(ptex)
+        for version, release_data in page
+        if (release := Release.from_api_response(version, PLATFORM, release_data))
+    ]
+    releases.sort(key=lambda release: release.version)
+    return releases[-1] if releases else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=5000, help="The number of releases listed.")
+    parser.add_argument("--repeat", type=int, default=7, help="Timing runs; the best is reported.")
+    options = parser.parse_args()
+
+    releases = synthetic_releases(options.count)
+    latest = sort_all(PagedPtex("ptex", releases=releases))
+    assert latest is not None
+
+    cases: list[tuple[str, Callable[[PagedPtex], Release | None]]] = [
+        ("sort every release", sort_all),
+        ("scan, no current version", lambda ptex: find_latest_production_release(ptex, PLATFORM)),
+    ]
+    for behind in (10, 150):
+        minor = latest.version.minor - behind // 10
+        current = Version(f"{latest.version.major}.{minor}.{latest.version.micro}")
+        cases.append(
+            (
+                f"scan from {current}",
+                lambda ptex, current=current: find_latest_production_release(
+                    ptex, PLATFORM, newer_than=current
+                ),
+            )
+        )
+    cases.append(
+        (
+            "scan when up to date",
+            lambda ptex: find_latest_production_release(ptex, PLATFORM, newer_than=latest.version),
+        )
+    )
+
+    print(f"Finding the latest of {options.count} releases (best of {options.repeat}):")
+    for label, find in cases:
+        best = float("inf")
+        for _ in range(options.repeat):
+            ptex = PagedPtex("ptex", releases=releases)
+            start = time.perf_counter()
+            find(ptex)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {label:<28} {best * 1000:7.2f} ms  {len(ptex.pages):3} page(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Checks how long each tools entry point takes to import against its budget.
+
+The entry points run on every uncached scie boot. Each is imported in a fresh interpreter under
+`-X importtime` several times and its best time is compared to its budget below; the script exits
+non-zero if any is over.
+
+Run from the tools dir with `PYTHONPATH=src python tests/bench_startup.py`, or via
+`just bench-startup`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from scie_pikesquares import ENTRY_POINTS
+from scie_pikesquares.import_profile import profile_imports
+
+# Roughly 1.5x the best times measured on a single core; budgets guard against regressions like an
+# eagerly imported third party module, not against a slow machine.
+BUDGETS_MS = {
+    "bootstrap-tools": 60,
+    "configure-pikesquares": 65,
+    "install-pikesquares": 75,
+    "update-scie-pikesquares": 65,
+    "record-scie-pikesquares-info": 40,
+}
+
+
+def import_ms(module: str) -> float:
+    for import_time in profile_imports(module):
+        if import_time.module == module and import_time.depth == 0:
+            return import_time.cumulative_us / 1000
+    raise AssertionError(f"No import time was reported for {module}.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=7, help="Imports per entry point.")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply the budgets by this; e.g.: for a machine much slower than a dev box.",
+    )
+    options = parser.parse_args()
+
+    missing = sorted(set(ENTRY_POINTS) - set(BUDGETS_MS))
+    if missing:
+        sys.exit(f"No import budget is set for: {', '.join(missing)}")
+
+    over_budget = []
+    for entry_point, budget_ms in BUDGETS_MS.items():
+        module = ENTRY_POINTS[entry_point].split(":", 1)[0]
+        best_ms = min(import_ms(module) for _ in range(options.repeat))
+        budget_ms *= options.scale
+        status = "ok" if best_ms <= budget_ms else "OVER BUDGET"
+        print(f"  {entry_point:<30} {best_ms:6.1f} ms of {budget_ms:6.1f} ms  {status}")
+        if best_ms > budget_ms:
+            over_budget.append(entry_point)
+
+    if over_budget:
+        sys.exit(f"Over their import budget: {', '.join(over_budget)}")
+
+
+if __name__ == "__main__":
+    main()
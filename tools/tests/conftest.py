@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Iterator
+
+import pytest
+from local_server import Server, serve
+
+from scie_pikesquares.ptex_http import HttpPtex
+
+
+@pytest.fixture
+def server() -> Iterator[Server]:
+    with serve() as server:
+        yield server
+
+
+@pytest.fixture
+def ptex() -> HttpPtex:
+    # N.B.: The ptex binary is only used for hosts that can't be reached directly; a local server
+    # always can.
+    return HttpPtex("ptex")
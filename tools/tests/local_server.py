@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+_RANGE = re.compile(r"bytes=(?P<start>\d+)-(?P<end>\d*)")
+
+
+@dataclass
+class Server:
+    """A local HTTP server whose misbehavior tests can script."""
+
+    base_url: str
+    content: dict[str, bytes] = field(default_factory=dict)
+    # The Range header of each request, in the order they arrived; `None` for whole requests.
+    ranges: list[str | None] = field(default_factory=list)
+    # When set, the next response is cut off after this many body bytes.
+    drop_after: int | None = None
+    # When set, Range headers are ignored and the whole content is sent with a 200.
+    ignore_range: bool = False
+    # The number of connections accepted so far.
+    connections: int = 0
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+
+def _handler(server: Server) -> type[BaseHTTPRequestHandler]:
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # N.B.: Headers and body go out in separate writes; with Nagle's algorithm on, the body
+        # of a response on a kept-alive connection waits out the client's delayed ACK (~40ms).
+        disable_nagle_algorithm = True
+
+        def setup(self) -> None:
+            super().setup()
+            with lock:
+                server.connections += 1
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            body = server.content.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            range_header = self.headers.get("Range")
+            with lock:
+                server.ranges.append(range_header)
+                drop_after, server.drop_after = server.drop_after, None
+            match = _RANGE.fullmatch(range_header or "")
+            if match and not server.ignore_range:
+                start = int(match["start"])
+                end = int(match["end"]) if match["end"] else len(body) - 1
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+                body = body[start : end + 1]
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if drop_after is not None:
+                self.wfile.write(body[:drop_after])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return Handler
+
+
+@contextmanager
+def serve() -> Iterator[Server]:
+    """Runs a `Server` on an ephemeral local port for the duration of the context."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    host, port = httpd.server_address[:2]
+    state = Server(base_url=f"http://{host}:{port}")
+    httpd.RequestHandlerClass = _handler(state)
+    # N.B.: Shutdown waits out the poll interval; the default of 0.5s would dominate the tests.
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    try:
+        yield state
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
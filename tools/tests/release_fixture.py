@@ -0,0 +1,79 @@
+"""A synthetic GitHub releases listing, served page by page like the releases API."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from scie_pikesquares.ptex import Ptex
+from scie_pikesquares.update_scie_pikesquares import (
+    BINARY_NAME,
+    GITHUB_API_BASE_URL,
+    RELEASES_PER_PAGE,
+)
+
+PLATFORMS = (
+    "linux-aarch64",
+    "linux-x86_64",
+    "macos-aarch64",
+    "macos-x86_64",
+    "windows-x86_64.exe",
+)
+
+
+def _release(tag: str, draft: bool = False, prerelease: bool = False) -> dict[str, Any]:
+    assets = []
+    for platform in PLATFORMS:
+        for name in (f"{BINARY_NAME}-{platform}", f"{BINARY_NAME}-{platform}.sha256"):
+            assets.append(
+                {
+                    "name": name,
+                    "size": 1 << 20,
+                    "browser_download_url": f"https://example.com/download/{tag}/{name}",
+                }
+            )
+    return {"tag_name": tag, "draft": draft, "prerelease": prerelease, "assets": assets}
+
+
+def synthetic_releases(count: int) -> list[dict[str, Any]]:
+    """Returns `count` releases in the order GitHub lists them: most recently published first.
+
+    Mainline releases are `v1.<minor>.<patch>`, ten patches per minor. Mixed in are backports to
+    older lines published after newer releases (`v0.<n>.1`), prereleases and drafts.
+    """
+    releases = []
+    mainline = 0
+    for index in range(count):
+        if index % 20 == 19:
+            releases.append(_release(f"v0.{index}.1"))
+        elif index % 50 == 48:
+            releases.append(_release(f"v2.0.0-rc{index}", prerelease=True))
+        elif index % 100 == 97:
+            releases.append(_release(f"v2.0.{index}", draft=True))
+        else:
+            releases.append(_release(f"v1.{mainline // 10}.{mainline % 10}"))
+            mainline += 1
+    releases.reverse()
+    return releases
+
+
+@dataclass(frozen=True)
+class PagedPtex(Ptex):
+    """Serves `releases` from memory as the GitHub API pages them, recording each page fetched."""
+
+    releases: list[dict[str, Any]] = field(default_factory=list)
+    pages: list[int] = field(default_factory=list)
+
+    def fetch_json(self, url: str, **headers: str) -> Any:
+        parts = urlsplit(url)
+        assert f"{parts.scheme}://{parts.netloc}{parts.path}" == f"{GITHUB_API_BASE_URL}/releases"
+        query = parse_qs(parts.query)
+        per_page = int(query["per_page"][0])
+        assert RELEASES_PER_PAGE == per_page
+        page = int(query["page"][0])
+        self.pages.append(page)
+        start = (page - 1) * per_page
+        # N.B.: Round-tripped like a real response; so callers can't share state with the fixture.
+        return json.loads(json.dumps(self.releases[start : start + per_page]))
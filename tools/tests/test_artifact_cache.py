@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from scie_pikesquares.artifact_cache import DIGEST_SUFFIX, ArtifactCache
+from scie_pikesquares.ptex import Fetch
+from scie_pikesquares.ptex_http import HttpPtex
+
+
+def artifact(tmp_path: Path, name: str, content: bytes) -> str:
+    path = tmp_path / "artifacts" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path.as_uri()
+
+
+def sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def age(path: Path, secs: float) -> None:
+    then = time.time() - secs
+    os.utime(path, (then, then))
+
+
+def test_miss(tmp_path: Path, ptex: HttpPtex) -> None:
+    cache = ArtifactCache(ptex, tmp_path / "cache")
+    url = artifact(tmp_path, "a", b"spam")
+
+    entry = cache.fetch(url)
+    assert b"spam" == entry.read_bytes()
+    assert entry.is_relative_to(cache.cache_dir)
+    assert sha256(b"spam") == entry.with_name(f"{entry.name}{DIGEST_SUFFIX}").read_text()
+
+
+def test_hit(tmp_path: Path, ptex: HttpPtex) -> None:
+    cache = ArtifactCache(ptex, tmp_path / "cache")
+    url = artifact(tmp_path, "a", b"spam")
+    entry = cache.fetch(url, expected_sha256=sha256(b"spam"))
+    age(entry, 60)
+
+    # N.B.: A hit never touches the original; so changing it shows whether it was re-fetched.
+    artifact(tmp_path, "a", b"eggs")
+    assert entry == cache.fetch(url, expected_sha256=sha256(b"spam"))
+    assert b"spam" == entry.read_bytes()
+    assert time.time() - entry.stat().st_mtime < 60
+
+    (result,) = cache.fetch_many([Fetch(url=url, expected_sha256=sha256(b"spam"))])
+    assert entry == result.path
+    assert sha256(b"spam") == result.sha256
+
+
+def test_fetch_many(tmp_path: Path, ptex: HttpPtex) -> None:
+    cache = ArtifactCache(ptex, tmp_path / "cache")
+    hit = artifact(tmp_path, "hit", b"spam")
+    miss = artifact(tmp_path, "miss", b"eggs")
+    cache.fetch(hit)
+
+    results = cache.fetch_many([Fetch(url=hit), Fetch(url=miss)])
+    assert [sha256(b"spam"), sha256(b"eggs")] == [result.sha256 for result in results]
+    assert [b"spam", b"eggs"] == [result.result().path.read_bytes() for result in results]
+
+
+def test_lru_eviction(tmp_path: Path, ptex: HttpPtex) -> None:
+    cache = ArtifactCache(ptex, tmp_path / "cache", max_bytes=8)
+    a_url = artifact(tmp_path, "a", b"aaaa")
+    a = cache.fetch(a_url)
+    b = cache.fetch(artifact(tmp_path, "b", b"bbbb"))
+    age(a, 120)
+    age(b, 60)
+
+    # Using `a` makes `b` the least recently used entry; so it goes first, not the oldest.
+    assert a == cache.fetch(a_url)
+    c = cache.fetch(artifact(tmp_path, "c", b"cccc"))
+
+    assert a.exists()
+    assert not b.exists()
+    assert not b.with_name(f"{b.name}{DIGEST_SUFFIX}").exists()
+    assert c.exists()
+
+
+def test_eviction_keeps_the_new_entry(tmp_path: Path, ptex: HttpPtex) -> None:
+    cache = ArtifactCache(ptex, tmp_path / "cache", max_bytes=2)
+    a = cache.fetch(artifact(tmp_path, "a", b"aaaa"))
+    assert a.exists()
+    b = cache.fetch(artifact(tmp_path, "b", b"bbbb"))
+    assert not a.exists()
+    assert b.exists()
+
+
+def test_discard(tmp_path: Path, ptex: HttpPtex) -> None:
+    cache = ArtifactCache(ptex, tmp_path / "cache")
+    url = artifact(tmp_path, "a", b"spam")
+    entry = cache.fetch(url)
+
+    cache.discard(url)
+    assert not entry.exists()
+    assert not entry.with_name(f"{entry.name}{DIGEST_SUFFIX}").exists()
+
+    artifact(tmp_path, "a", b"eggs")
+    assert b"eggs" == cache.fetch(url).read_bytes()
+
+
+def test_from_env(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, ptex: HttpPtex) -> None:
+    monkeypatch.setenv("PIKESQUARES_ARTIFACT_CACHE", str(tmp_path))
+    monkeypatch.setenv("PIKESQUARES_ARTIFACT_CACHE_MAX_BYTES", "512M")
+    monkeypatch.setenv("PIKESQUARES_DOWNLOAD_SEGMENTS", "4")
+    cache = ArtifactCache.from_env(ptex)
+    assert (tmp_path, 512 << 20, 4) == (cache.cache_dir, cache.max_bytes, cache.segments)
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("PIKESQUARES_ARTIFACT_CACHE_MAX_BYTES", "lots"),
+        ("PIKESQUARES_DOWNLOAD_SEGMENTS", "many"),
+        ("PIKESQUARES_DOWNLOAD_SEGMENTS", "0"),
+    ],
+)
+def test_from_env_invalid(
+    monkeypatch: pytest.MonkeyPatch, ptex: HttpPtex, name: str, value: str
+) -> None:
+    monkeypatch.setenv(name, value)
+    with pytest.raises(SystemExit, match=name):
+        ArtifactCache.from_env(ptex)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from scie_pikesquares import bindings_daemon
+
+
+@pytest.fixture
+def runtime_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    return tmp_path / f"scie-pikesquares-{os.getuid()}"
+
+
+def test_socket_in_private_dir(runtime_dir: Path) -> None:
+    path = bindings_daemon._socket_path()
+    assert path is not None
+    assert runtime_dir == path.parent
+    assert 0o700 == runtime_dir.stat().st_mode & 0o777
+
+
+def test_shared_dir_refused(runtime_dir: Path) -> None:
+    runtime_dir.mkdir()
+    runtime_dir.chmod(0o777)
+    assert bindings_daemon._socket_path() is None
+
+
+def test_symlinked_dir_refused(runtime_dir: Path, tmp_path: Path) -> None:
+    target = tmp_path / "elsewhere"
+    target.mkdir(mode=0o700)
+    runtime_dir.symlink_to(target)
+    assert bindings_daemon._socket_path() is None
+
+
+def test_planted_lock_refused(runtime_dir: Path, tmp_path: Path) -> None:
+    path = bindings_daemon._socket_path()
+    assert path is not None
+    victim = tmp_path / "victim"
+    victim.write_text("precious")
+    path.with_suffix(".lock").symlink_to(victim)
+    with pytest.raises(OSError):
+        bindings_daemon.serve(path, idle_timeout=0.1)
+    assert "precious" == victim.read_text()
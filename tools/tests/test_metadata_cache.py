@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from scie_pikesquares.metadata_cache import DEFAULT_TTL_SECS, MetadataCache
+
+
+@pytest.mark.parametrize(
+    "value, ttl", [(None, DEFAULT_TTL_SECS), ("", DEFAULT_TTL_SECS), ("0", 0), ("90.5", 90.5)]
+)
+def test_ttl(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, value: str | None, ttl: float
+) -> None:
+    if value is None:
+        monkeypatch.delenv("PIKESQUARES_METADATA_TTL", raising=False)
+    else:
+        monkeypatch.setenv("PIKESQUARES_METADATA_TTL", value)
+    assert ttl == MetadataCache.from_base_dir(tmp_path).ttl
+
+
+@pytest.mark.parametrize("value", ["5m", "-1", "nan", "inf"])
+def test_ttl_invalid(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    tmp_path: Path,
+    value: str,
+) -> None:
+    monkeypatch.setenv("PIKESQUARES_METADATA_TTL", value)
+    assert DEFAULT_TTL_SECS == MetadataCache.from_base_dir(tmp_path).ttl
+    assert "Ignoring PIKESQUARES_METADATA_TTL" in capsys.readouterr().err
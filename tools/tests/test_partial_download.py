@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import random
+from pathlib import Path
+
+import pytest
+from local_server import Server
+
+from scie_pikesquares import partial_download
+from scie_pikesquares.partial_download import RESUME_OVERLAP, PartialDownload
+from scie_pikesquares.ptex import FingerprintMismatchError
+from scie_pikesquares.ptex_http import HttpPtex
+
+SIZE = 4 * RESUME_OVERLAP
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(partial_download.time, "sleep", lambda _: None)
+
+
+def content(seed: int, size: int = SIZE) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def requested_bytes(byte_range: str | None) -> int:
+    assert byte_range is not None
+    start, end = byte_range.removeprefix("bytes=").split("-")
+    return int(end) + 1 - int(start)
+
+
+def download(tmp_path: Path, server: Server, body: bytes) -> PartialDownload:
+    server.content["/artifact"] = body
+    return PartialDownload(
+        dest=tmp_path / "artifact",
+        url=server.url("artifact"),
+        expected_sha256=hashlib.sha256(body).hexdigest(),
+        expected_size=len(body),
+    )
+
+
+def test_fetch(tmp_path: Path, server: Server, ptex: HttpPtex) -> None:
+    body = content(0)
+    dl = download(tmp_path, server, body)
+
+    assert dl.expected_sha256 == dl.fetch(ptex)
+    assert body == dl.dest.read_bytes()
+    assert [None] == server.ranges
+    assert not dl.path.exists()
+
+
+def test_resume_after_truncated_body(tmp_path: Path, server: Server, ptex: HttpPtex) -> None:
+    body = content(0)
+    dl = download(tmp_path, server, body)
+    cut = 3 * RESUME_OVERLAP
+
+    server.drop_after = cut
+    with pytest.raises(OSError):
+        dl.fetch(ptex, attempts=1)
+    assert not dl.dest.exists()
+    assert body[:cut] == dl.path.read_bytes()
+
+    assert dl.expected_sha256 == dl.fetch(ptex, attempts=1)
+    assert body == dl.dest.read_bytes()
+    # The resume re-fetches the overlap it already has to check the content is unchanged.
+    assert [None, f"bytes={cut - RESUME_OVERLAP}-"] == server.ranges
+
+
+def test_resume_within_a_fetch(tmp_path: Path, server: Server, ptex: HttpPtex) -> None:
+    body = content(0)
+    dl = download(tmp_path, server, body)
+
+    server.drop_after = 2 * RESUME_OVERLAP
+    assert dl.expected_sha256 == dl.fetch(ptex, attempts=2)
+    assert body == dl.dest.read_bytes()
+    assert [None, f"bytes={RESUME_OVERLAP}-"] == server.ranges
+
+
+def test_server_ignores_range(tmp_path: Path, server: Server, ptex: HttpPtex) -> None:
+    body = content(0)
+    dl = download(tmp_path, server, body)
+
+    server.drop_after = 3 * RESUME_OVERLAP
+    with pytest.raises(OSError):
+        dl.fetch(ptex, attempts=1)
+
+    server.ignore_range = True
+    assert dl.expected_sha256 == dl.fetch(ptex, attempts=1)
+    assert body == dl.dest.read_bytes()
+    assert [None, f"bytes={2 * RESUME_OVERLAP}-"] == server.ranges
+
+
+def test_content_changed_mid_resume(tmp_path: Path, server: Server, ptex: HttpPtex) -> None:
+    old = content(0)
+    dl = download(tmp_path, server, old)
+
+    server.drop_after = 3 * RESUME_OVERLAP
+    with pytest.raises(OSError):
+        dl.fetch(ptex, attempts=1)
+
+    new = content(1)
+    server.content["/artifact"] = new
+    with pytest.raises(OSError, match="changed since its download started"):
+        dl.fetch(ptex, attempts=1)
+    assert not dl.dest.exists()
+    assert b"" == dl.path.read_bytes()
+
+    # With a retry, the download starts over; and content other than that expected is discarded.
+    server.drop_after = 3 * RESUME_OVERLAP
+    with pytest.raises(OSError):
+        dl.fetch(ptex, attempts=1)
+    server.content["/artifact"] = content(2)
+    with pytest.raises(FingerprintMismatchError):
+        dl.fetch(ptex, attempts=2)
+    assert not dl.dest.exists()
+    assert not dl.path.exists()
+
+
+def test_segmented(
+    tmp_path: Path, server: Server, ptex: HttpPtex, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(partial_download, "SEGMENTED_MIN_BYTES", SIZE)
+    body = content(0)
+    dl = download(tmp_path, server, body)
+
+    assert dl.expected_sha256 == dl.fetch(ptex, segments=4)
+    assert body == dl.dest.read_bytes()
+    step = SIZE // 4
+    assert sorted(f"bytes={start}-{start + step - 1}" for start in range(0, SIZE, step)) == sorted(
+        server.ranges
+    )
+
+
+def test_segmented_resume(
+    tmp_path: Path, server: Server, ptex: HttpPtex, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(partial_download, "SEGMENTED_MIN_BYTES", SIZE)
+    body = content(0)
+    dl = download(tmp_path, server, body)
+
+    server.drop_after = 100
+    with pytest.raises(OSError):
+        dl.fetch(ptex, segments=2, attempts=1)
+    # N.B.: The other segment is either completed or, if it had yet to start, cancelled.
+    other_done = SIZE // 2 if len(server.ranges) == 2 else 0
+    server.ranges.clear()
+
+    assert dl.expected_sha256 == dl.fetch(ptex, segments=2, attempts=1)
+    assert body == dl.dest.read_bytes()
+    # Only what is missing is fetched again; the cut off segment resumes where it stopped.
+    assert SIZE - 100 - other_done == sum(
+        requested_bytes(byte_range) for byte_range in server.ranges
+    )
+
+
+def test_segmented_server_ignores_range(
+    tmp_path: Path, server: Server, ptex: HttpPtex, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(partial_download, "SEGMENTED_MIN_BYTES", SIZE)
+    body = content(0)
+    dl = download(tmp_path, server, body)
+
+    server.ignore_range = True
+    assert dl.expected_sha256 == dl.fetch(ptex, segments=4)
+    assert body == dl.dest.read_bytes()
+    # The whole content is fetched once more after a segment request got all of it.
+    assert server.ranges[-1] is None
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import json
+
+from local_server import Server
+
+from scie_pikesquares.ptex import Fetch
+from scie_pikesquares.ptex_http import HttpPtex
+
+
+def test_keep_alive(server: Server, ptex: HttpPtex) -> None:
+    server.content["/releases.json"] = json.dumps([{"tag_name": "v0.1.0"}]).encode()
+    url = server.url("releases.json")
+
+    for _ in range(10):
+        assert [{"tag_name": "v0.1.0"}] == ptex.fetch_json(url)
+    assert 1 == server.connections
+
+
+def test_fetch_many(server: Server, ptex: HttpPtex) -> None:
+    for i in range(16):
+        server.content[f"/{i}"] = str(i).encode()
+
+    results = ptex.fetch_many([Fetch(url=server.url(str(i))) for i in range(16)], max_workers=4)
+    assert [str(i).encode() for i in range(16)] == [result.result().content for result in results]
+    # N.B.: Connections are pooled; so the concurrent fetches need at most one per worker.
+    assert server.connections <= 4
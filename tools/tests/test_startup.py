@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from scie_pikesquares import ENTRY_POINTS
+
+# Modules only some code paths need; importing an entry point must not load them. Those bound
+# with `lazy_import` may be present in `sys.modules`, but only as lazy placeholders.
+DEFERRED = (
+    "colors",
+    "http.client",
+    "logging.handlers",
+    "packaging.version",
+    "platformdirs",
+    "questionary",
+    "ssl",
+    "tinydb",
+)
+
+_LOADED = """
+import importlib, json, sys
+importlib.import_module(sys.argv[1])
+print(json.dumps([
+    name
+    for name in sys.argv[2:]
+    if name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"
+]))
+"""
+
+
+@pytest.mark.parametrize("entry_point", sorted(ENTRY_POINTS))
+def test_deferred_imports(entry_point: str) -> None:
+    module = ENTRY_POINTS[entry_point].split(":", 1)[0]
+    result = subprocess.run(
+        args=[sys.executable, "-c", _LOADED, module, *DEFERRED],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    assert [] == json.loads(result.stdout)
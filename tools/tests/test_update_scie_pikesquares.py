@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+from packaging.version import Version
+from release_fixture import PagedPtex, synthetic_releases
+
+from scie_pikesquares.update_scie_pikesquares import find_latest_production_release
+
+PLATFORM = "linux-x86_64"
+
+
+@pytest.fixture(scope="module")
+def releases() -> list[dict]:
+    return synthetic_releases(5000)
+
+
+def test_full_scan(releases: list[dict]) -> None:
+    ptex = PagedPtex("ptex", releases=releases)
+    release = find_latest_production_release(ptex, PLATFORM)
+    assert release is not None
+    assert Version("1.459.9") == release.version
+    assert release.binary_url.endswith(f"/v1.459.9/scie-pants-{PLATFORM}")
+    # N.B.: A full last page means another, empty, page must be fetched to know it was the last.
+    assert list(range(1, 52)) == ptex.pages
+
+
+def test_newer_than_stops_paging(releases: list[dict]) -> None:
+    ptex = PagedPtex("ptex", releases=releases)
+    release = find_latest_production_release(ptex, PLATFORM, newer_than=Version("1.445.0"))
+    assert release is not None
+    assert Version("1.459.9") == release.version
+    # Pages 1 and 2 hold the releases newer than 1.445.0, each led by an older backport; page 3
+    # holds none, so paging stops.
+    assert [1, 2, 3] == ptex.pages
+
+
+def test_up_to_date(releases: list[dict]) -> None:
+    ptex = PagedPtex("ptex", releases=releases)
+    assert find_latest_production_release(ptex, PLATFORM, newer_than=Version("1.459.9")) is None
+    assert [1] == ptex.pages
+
+
+def test_no_release_for_platform(releases: list[dict]) -> None:
+    ptex = PagedPtex("ptex", releases=releases)
+    assert find_latest_production_release(ptex, "no-such-platform") is None
+    assert list(range(1, 52)) == ptex.pages